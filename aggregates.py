@@ -0,0 +1,192 @@
+"""Incrementally maintained cohort aggregates for the admin dashboard.
+
+Every stored submission bumps a handful of counters in a small SQLite file
+next to the submissions archive. The dashboard only ever reads these
+counters, so its cost depends on the number of days shown, not on the number
+of rows in ``submissions.csv``.
+"""
+import csv
+import os
+import sqlite3
+
+import pandas as pd
+
+from storage import SUBMISSIONS_DIR, CSV_PATH, archive_paths, is_tombstone
+
+AGGREGATES_PATH = os.path.join(SUBMISSIONS_DIR, 'aggregates.db')
+
+RISK_CATEGORIES = ['metabolic_lifestyle', 'cvd_stroke', 'diabetes', 'cancer']
+CSV_RISK_COLUMNS = {
+    'metabolic_lifestyle': 'metabolic_risk',
+    'cvd_stroke': 'cvd_risk',
+    'diabetes': 'diabetes_risk',
+    'cancer': 'cancer_risk',
+}
+AGE_GROUPS = ['<30', '30-39', '40-49', '50-59', '60-69', '70+']
+BANDS = ['low', 'moderate', 'high', 'na']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS risk_histogram (
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    band TEXT NOT NULL,
+    age_group TEXT NOT NULL,
+    sex TEXT NOT NULL,
+    bin INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (day, category, band, age_group, sex, bin)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS daily_volume (
+    day TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def risk_band(score):
+    """Map a 0-1 risk score to the band shown on the results page"""
+    if score is None:
+        return 'na'
+    if score < 0.3:
+        return 'low'
+    if score < 0.5:
+        return 'moderate'
+    return 'high'
+
+
+def age_group(age):
+    """Bucket an age in years into a dashboard age group"""
+    if age < 30:
+        return '<30'
+    if age >= 70:
+        return '70+'
+    decade = int(age) // 10 * 10
+    return f"{decade}-{decade + 9}"
+
+
+def normalize_sex(sex):
+    """Map the sex option of either language to 'male'/'female'"""
+    return 'male' if sex in ('Male', 'Laki-laki') else 'female'
+
+
+def connect(path=AGGREGATES_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _increments(day, age, sex, risk_scores):
+    demo = (age_group(age), normalize_sex(sex))
+    for category in RISK_CATEGORIES:
+        score = risk_scores.get(category)
+        # 10 bins of 10 percentage points; bin -1 holds N/A (condition present)
+        bin_ = -1 if score is None else min(int(score * 10), 9)
+        yield (day, category, risk_band(score)) + demo + (bin_,)
+
+
+def record_submissions(items, path=AGGREGATES_PATH):
+    """Add ``(timestamp, age, sex, risk_scores)`` tuples to the aggregates in one transaction"""
+    hist_rows = []
+    volume = {}
+    for timestamp, age, sex, risk_scores in items:
+        day = timestamp[:10]
+        volume[day] = volume.get(day, 0) + 1
+        hist_rows.extend(_increments(day, age, sex, risk_scores))
+    if not volume:
+        return
+    conn = connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO risk_histogram VALUES (?, ?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT (day, category, band, age_group, sex, bin) DO UPDATE SET n = n + 1",
+                hist_rows,
+            )
+            conn.executemany(
+                "INSERT INTO daily_volume VALUES (?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET n = n + excluded.n",
+                volume.items(),
+            )
+    finally:
+        conn.close()
+
+
+def record_submission(questionnaire_data, risk_scores, path=AGGREGATES_PATH):
+    """Add one stored submission to the aggregates"""
+    personal = questionnaire_data['personal']
+    record_submissions(
+        [(questionnaire_data['timestamp'], personal['age'], personal['sex'], risk_scores)],
+        path,
+    )
+
+
+def _query(sql, params, path):
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def daily_volume(start_day, end_day, path=AGGREGATES_PATH):
+    """Submissions per day between two ISO dates (inclusive)"""
+    return _query(
+        "SELECT day, n FROM daily_volume WHERE day BETWEEN ? AND ? ORDER BY day",
+        (start_day, end_day), path,
+    )
+
+
+def band_counts(start_day, end_day, by=(), path=AGGREGATES_PATH):
+    """Risk-band counts per category, optionally split by day/age_group/sex"""
+    group_cols = ['category', 'band'] + [c for c in by if c in ('day', 'age_group', 'sex')]
+    cols = ', '.join(group_cols)
+    return _query(
+        f"SELECT {cols}, SUM(n) AS n FROM risk_histogram "
+        f"WHERE day BETWEEN ? AND ? GROUP BY {cols} ORDER BY {cols}",
+        (start_day, end_day), path,
+    )
+
+
+def score_histogram(start_day, end_day, category, path=AGGREGATES_PATH):
+    """Score distribution of one category in 10-point bins"""
+    return _query(
+        "SELECT bin, SUM(n) AS n FROM risk_histogram "
+        "WHERE day BETWEEN ? AND ? AND category = ? AND bin >= 0 GROUP BY bin ORDER BY bin",
+        (start_day, end_day, category), path,
+    )
+
+
+def iter_archive_scores(csv_path=CSV_PATH):
+    """Yield ``(timestamp, age, sex, risk_scores)`` for every row of a submissions CSV and its rotated archives"""
+    for archive_path in archive_paths(csv_path):
+        with open(archive_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if is_tombstone(row):
+                    continue
+                risk_scores = {
+                    category: float(row[column]) / 100
+                    for category, column in CSV_RISK_COLUMNS.items()
+                    if row[column] not in ('', 'N/A')
+                }
+                yield row['timestamp'], float(row['age']), row['sex'], risk_scores
+
+
+def rebuild_from_csv(csv_path=CSV_PATH, path=AGGREGATES_PATH, chunk_size=5000):
+    """Recreate the aggregates from the submissions CSV and its rotated archives (one-off backfill)"""
+    for stale in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    batch = []
+    for item in iter_archive_scores(csv_path):
+        batch.append(item)
+        if len(batch) >= chunk_size:
+            record_submissions(batch, path)
+            batch = []
+    record_submissions(batch, path)
+
+
+if __name__ == "__main__":
+    rebuild_from_csv()
+    print(f"Rebuilt {AGGREGATES_PATH} from {CSV_PATH} and its rotated archives")
@@ -0,0 +1,278 @@
+"""JSON scoring service for partner integrations.
+
+Runs beside the Streamlit UI (the ``scoring-api`` service in
+``docker-compose.yml``) and reuses the app's validation, scoring and
+recommendation code:
+
+    POST /v1/score?lang=en        one questionnaire -> risk scores + recommendations
+    POST /v1/score/batch?lang=en  {"records": [...]} -> one result or error per record
+    POST /v1/submit?lang=en&clinic=<id>  store a submission of the static calculator
+    GET  /calculator/             the static calculator (build_static.py)
+    GET  /metrics                 latency histograms (Prometheus text format, per worker)
+    GET  /health
+
+Batches are validated in one pydantic-core call and scored with the
+vectorized ``calculate_risk_scores_batch``. Run locally with
+``uvicorn api:app --port 8000``; set ``SCORING_API_KEYS`` (comma-separated)
+to require an ``X-API-Key`` header (not for ``/v1/submit``: it is posted
+by respondents' browsers and rate limited per client address instead).
+The client address is taken from nginx's ``X-Real-IP`` only when the
+request comes from one of TRUSTED_PROXIES (host names, IPs or networks,
+default ``nginx``); callers reaching port 8000 directly are limited by
+their own address, whatever headers they send. Each uvicorn worker counts
+on its own, so an address may submit up to ``API_WORKERS`` times the limit.
+"""
+import bisect
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import time
+from datetime import datetime
+
+from pydantic import ValidationError
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import ratelimit
+import sharelinks
+import sinks
+import tenants
+
+from aggregates import risk_band
+from i18n import languages
+from model_registry import active_model
+from models import Questionnaire, format_error, validate_questionnaires
+from recommendations import generate_recommendations
+from records import featurize
+from scoring import process_questionnaire_data, calculate_risk_scores, calculate_risk_scores_batch, risk_scores_at
+from storage import flatten_submission
+
+API_KEYS = [key.strip() for key in os.getenv('SCORING_API_KEYS', '').split(',') if key.strip()]
+MAX_BATCH_RECORDS = int(os.getenv('SCORING_API_MAX_BATCH', '10000'))
+LANGUAGES = tuple(languages())
+CALCULATOR_BUILD_DIR = os.getenv('CALCULATOR_BUILD_DIR', 'build/calculator')
+TRUSTED_PROXIES = [entry.strip() for entry in os.getenv('TRUSTED_PROXIES', 'nginx').split(',') if entry.strip()]
+PROXY_RESOLVE_SECONDS = 60  # proxy containers may come back with a new address
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+_proxy_networks = {'resolved_at': None, 'networks': []}
+
+
+def _trusted_networks():
+    now = time.monotonic()
+    if _proxy_networks['resolved_at'] is None or now - _proxy_networks['resolved_at'] > PROXY_RESOLVE_SECONDS:
+        networks = []
+        for entry in TRUSTED_PROXIES:
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+                continue
+            except ValueError:
+                pass
+            try:
+                networks.extend(ipaddress.ip_network(info[4][0]) for info in socket.getaddrinfo(entry, None))
+            except OSError:  # proxy not running (yet), or a local run without it
+                continue
+        _proxy_networks.update(resolved_at=now, networks=networks)
+    return _proxy_networks['networks']
+
+
+def client_address(request):
+    """The client's address: nginx's X-Real-IP from a trusted proxy, the peer's address otherwise"""
+    peer = request.client.host if request.client else ''
+    try:
+        from_proxy = any(ipaddress.ip_address(peer) in network for network in _trusted_networks())
+    except ValueError:  # no peer address (e.g. test clients)
+        from_proxy = False
+    if from_proxy:
+        return request.headers.get('x-real-ip') or peer
+    return peer
+
+
+class LatencyHistogram:
+    """Fixed-bucket request latency histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.sum_ms += ms
+
+    def render(self, name, route):
+        lines, cumulative = [], 0
+        for le, count in zip([str(b) for b in self.buckets] + ['+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{route="{route}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{route="{route}"}} {self.sum_ms:.3f}')
+        lines.append(f'{name}_count{{route="{route}"}} {cumulative}')
+        return lines
+
+
+LATENCY = {}
+RECORDS_SCORED = {'count': 0}
+
+
+def timed(route):
+    """Record the latency of every call to an endpoint"""
+    histogram = LATENCY.setdefault(route, LatencyHistogram())
+
+    def decorator(handler):
+        async def wrapper(request):
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                histogram.observe((time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+
+def _result(risk_scores, features, lang, model):
+    return {
+        'model_version': model.version,
+        'risk_scores': risk_scores,
+        'risk_bands': {key: risk_band(score) for key, score in risk_scores.items()},
+        'recommendations': [
+            {'category': rec['risk_key'], 'recommendations': rec['recommendations']}
+            for rec in generate_recommendations(risk_scores, features, lang, model)
+        ],
+    }
+
+
+def score_records(records, lang):
+    """Validate and score a batch; returns one result dict (or ``{'errors': [...]}``) per record"""
+    valid, errors = validate_questionnaires(records)
+    model = active_model()
+    results = [None] * len(records)
+    if valid:
+        features = featurize((questionnaire.model_dump() for _, questionnaire in valid), len(valid))
+        batch_scores = calculate_risk_scores_batch(features, model)
+        for row, (index, _) in enumerate(valid):
+            results[index] = _result(risk_scores_at(batch_scores, row), features[row], lang, model)
+    for index, messages in errors.items():
+        results[index] = {'errors': messages}
+    RECORDS_SCORED['count'] += len(valid)
+    return results
+
+
+def _check_request(request):
+    """Return an error response for a bad API key or language, else None"""
+    if API_KEYS:
+        key = request.headers.get('x-api-key', '')
+        if not any(hmac.compare_digest(key, allowed) for allowed in API_KEYS):
+            return JSONResponse({'error': 'invalid or missing X-API-Key'}, status_code=401)
+    return _check_lang(request)
+
+
+def _check_lang(request):
+    if request.query_params.get('lang', 'en') not in LANGUAGES:
+        return JSONResponse({'error': f"lang must be one of {', '.join(LANGUAGES)}"}, status_code=400)
+    return None
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+@timed('/v1/score')
+async def score(request):
+    error = _check_request(request)
+    if error is not None:
+        return error
+    payload = await _json_body(request)
+    if not isinstance(payload, dict):
+        return JSONResponse({'error': 'body must be a JSON questionnaire object'}, status_code=400)
+    try:
+        questionnaire = Questionnaire.model_validate(payload)
+    except ValidationError as e:
+        return JSONResponse({'errors': [format_error(err) for err in e.errors()]}, status_code=422)
+    model = active_model()
+    features = process_questionnaire_data(questionnaire.model_dump())
+    risk_scores = calculate_risk_scores(features, model)
+    RECORDS_SCORED['count'] += 1
+    return JSONResponse(_result(risk_scores, features, request.query_params.get('lang', 'en'), model))
+
+
+@timed('/v1/score/batch')
+async def score_batch(request):
+    error = _check_request(request)
+    if error is not None:
+        return error
+    payload = await _json_body(request)
+    records = payload.get('records') if isinstance(payload, dict) else None
+    if not isinstance(records, list):
+        return JSONResponse({'error': 'body must be {"records": [...]}'}, status_code=400)
+    if len(records) > MAX_BATCH_RECORDS:
+        return JSONResponse({'error': f'at most {MAX_BATCH_RECORDS} records per request'}, status_code=413)
+    # Large batches take tens of milliseconds; keep the event loop free for other requests
+    results = await run_in_threadpool(score_records, records, request.query_params.get('lang', 'en'))
+    rejected = sum(1 for r in results if 'errors' in r)
+    return JSONResponse({'scored': len(results) - rejected, 'rejected': rejected, 'results': results})
+
+
+@timed('/v1/submit')
+async def submit(request):
+    """Validate, re-score and store a questionnaire posted by the static calculator"""
+    error = _check_lang(request)
+    if error is not None:
+        return error
+    payload = await _json_body(request)
+    if not isinstance(payload, dict):
+        return JSONResponse({'error': 'body must be a JSON questionnaire object'}, status_code=400)
+    # Stored submissions are timestamped and identified by the server, as in the app
+    payload['timestamp'] = datetime.now().isoformat()
+    payload.pop('submission_id', None)
+    try:
+        questionnaire = Questionnaire.model_validate(payload)
+    except ValidationError as e:
+        return JSONResponse({'errors': [format_error(err) for err in e.errors()]}, status_code=422)
+    # As in the app, only valid submissions count
+    address = client_address(request)
+    if address and not ratelimit.ADDRESS_LIMITER.allow(address):
+        print(f"DEBUG: Rate limited address {address}.")
+        return JSONResponse({'error': 'too many submissions, try again later'}, status_code=429)
+    questionnaire_data = questionnaire.model_dump()
+    model = active_model()
+    features = process_questionnaire_data(questionnaire_data)
+    risk_scores = calculate_risk_scores(features, model)
+    tenant = tenants.get(request.query_params.get('clinic'))
+    flat_data = flatten_submission(questionnaire_data, risk_scores, model.version, tenant['id'])
+    # File locks and fsyncs: off the event loop
+    await run_in_threadpool(sinks.store_submissions, [(questionnaire_data, flat_data, risk_scores)], tenant)
+    RECORDS_SCORED['count'] += 1
+    return JSONResponse({'model_version': model.version, 'risk_scores': risk_scores,
+                         'share': sharelinks.encode(features, model.version)})
+
+
+async def metrics(request):
+    lines = ['# TYPE scoring_api_request_duration_ms histogram']
+    for route, histogram in LATENCY.items():
+        lines.extend(histogram.render('scoring_api_request_duration_ms', route))
+    lines.append('# TYPE scoring_api_records_scored_total counter')
+    lines.append(f"scoring_api_records_scored_total {RECORDS_SCORED['count']}")
+    return PlainTextResponse('\n'.join(lines) + '\n')
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok'})
+
+
+app = Starlette(routes=[
+    Route('/v1/score', score, methods=['POST']),
+    Route('/v1/score/batch', score_batch, methods=['POST']),
+    Route('/v1/submit', submit, methods=['POST']),
+    Route('/metrics', metrics),
+    Route('/health', health),
+    Mount('/calculator', StaticFiles(directory=CALCULATOR_BUILD_DIR, html=True, check_dir=False)),
+])
@@ -1,5 +1,5 @@
 import streamlit as st
-# from pydantic import BaseModel - This import is not used
+from pydantic import ValidationError
 from typing import List, Optional
 import pandas as pd
 import numpy as np
@@ -7,18 +7,49 @@ import math
 import csv
 import json
 import os
-from datetime import datetime
+import hmac
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 # Removed unused pydrive2 and io imports
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from storage import CSV_PATH, flatten_submission
+from options import (
+    sleep_map, sleep_map_help, stress_map, stress_map_help, cholesterol_map,
+    cholesterol_map_help, bp_map, bp_map_help, smoking_map, smoking_map_help,
+    alcohol_map, alcohol_map_help, hba1c_map, hba1c_map_help, glucose_map,
+    glucose_map_help, symptom_scale, health_conditions_map, family_history_map,
+    genetic_test_map, exercise_freq_map, exercise_freq_help, duration_map,
+    duration_map_help, intensity_map, intensity_map_help, DISPLAYED_VALUE_LANGUAGES
+)
+import i18n
+from i18n import CatalogSection
+import aggregates
+import erasure
+import export
+import history
+import intake
+from models import Questionnaire, format_error
+from recommendations import generate_recommendations
+import ratelimit
+import reports
+import sessions
+import sharelinks
+import sinks
+import sheet_mirror
+import tenants
+from model_registry import REGISTRY
+from scoring import (
+    process_questionnaire_data, calculate_risk_scores, calculate_risk_scores_batch,
+    calculate_met_hours, calculate_smoking_risk
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Get credentials from environment variables or Streamlit secrets
 DRIVE_FOLDER_ID = os.getenv('DRIVE_FOLDER_ID') or st.secrets.get('DRIVE_FOLDER_ID', '')
-GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID') or st.secrets.get('GOOGLE_SHEET_ID', '')
+ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD') or st.secrets.get('ADMIN_PASSWORD', '')
 
 
 # Set page config
@@ -29,582 +60,9 @@ st.set_page_config(
 )
 
 # --- LANGUAGE DICTIONARY ---
-LANG = {
-    'en': {
-        # UI Header Titles
-        'title': "🧬 Disease Risk Prediction",
-        'subtitle': "Find out how your lifestyle and health conditions can be used to predict disease risks.",
-        'form_title': "📝 Health Risk Assessment Questionnaire",
-        'results_title': "📊 Your Health Risk Assessment Results",
-        'back_button': "🔙 Back to Questionnaire",
-        'success_msg': "✅ Risk scores calculated successfully!",
-        'personal_info': "Personal Information",
-        'exercise_header': "Exercise Frequencies",
-        'lifestyle_header': "Lifestyle Factors",
-        'health_header': "Health Status",
-        'family_history': "Family History",
-        'genetic_header': "Previous Genetic Testing",
-        'recommendation_header': "Your Personalized Health Recommendations",
-        'take_action_header': "Contact Us",
-        'result_header': "Your Health Risk Assessment",
-        'result_subtext': "Risk scores are categorized as: Low (< 30%), Moderate (30-50%), High (> 50%)",
-
-        # Personal
-        'name': "Name",
-        'phone': "Phone Number",
-        'age': "Age",
-        'height': "Height (cm)",
-        'weight': "Weight (kg)",
-        'waist': "Waist Circumference (cm)",
-        'occupation': "Occupation",
-        'sex': "Sex",
-        'sex_options': ["Male", "Female"],
-        'activity_level': "Work Activity Level",
-        'activity_options': ["Sedentary", "Lightly active", "Moderately active", "Very active"],
-
-        # Exercise
-        'exercise_freq': "Exercise frequency (combined cardio and strength)",
-        'exercise_duration': "Average exercise duration",
-        'exercise_intensity': "Typical exercise intensity",
-
-        # Lifestyle
-        'sleep_hours': "Average hours of sleep per night",
-        'stress_level': "Overall stress level",
-        'cholesterol_level': "Total Cholesterol Level",
-        'bp_meds': "Use of blood pressure lowering medications",
-        'smoking_status': "Smoking status",
-        'alcohol_use': "Alcohol consumption",
-        'hba1c_label': "HbA1c level",
-        'fasting_glucose': "Fasting glucose level",
-
-        # Symptoms
-        'symptoms_header': "Other Symptoms",
-        'frequent_hunger': "Frequent hunger",
-        'frequent_thirst': "Frequent thirst",
-        'frequent_urination': "Frequent urination",
-
-        # Health
-        'conditions_label': "Current health conditions",
-        'medications_label': "Current medications (if any)",
-        'diabetes_label': "Diabetes History",
-        'cancer_label': "Cancer History",
-        'cvd_label': "CVD History",
-        'diabetes_history': "Family history of diabetes",
-        'cancer_history': "Family history of cancer",
-        'cvd_history': "Family history of cardiovascular disease",
-
-        # Well & Fit
-        'wellfit_header': "Well & Fit Assessment",
-        'symptom_fatigue': "Fatigue",
-        'symptom_joint_pain': "Joint pain",
-        'symptom_digestive': "Digestive discomfort",
-        'symptom_skin_issues': "Skin issues",
-        'symptom_headaches': "Headaches",
-        'symptom_mood': "Mood fluctuations",
-        'symptom_cognitive': "Cognitive difficulties",
-        'symptom_sleep': "Sleep disturbances",
-
-        # Genetic
-        'had_testing': "Have you had genetic testing before?",
-        'findings': "Please describe any significant findings",
-
-        # Results
-        'risk_level_low': "Risk Level: Low",
-        'risk_level_moderate': "Risk Level: Moderate",
-        'risk_level_high': "Risk Level: High",
-        'risk_na': "Risk Level: N/A (Condition present)",
-        'recommendations_label': "Recommendations:",
-        'recommended_product': "Recommended Product:",
-        'no_recommendation': "Follow your healthcare provider's treatment plan",
-
-        #st_info
-        'none_removed_info': "ℹ️ 'None' has been automatically removed since you selected other conditions.",
-
-        #submit
-        'submit_button': "Calculate Risk Scores",
-        
-        #recommendation
-        'category_metabolic': "Metabolic & Lifestyle Risk",
-        'category_cvd': "CVD & Stroke Risk",
-        'category_diabetes': "Diabetes Risk",
-        'category_cancer': "Cancer Risk",
-
-        # Contact buttons
-        'promo_button': "🎁 Promo",
-        'inquiry_button': "📞 Inquiry",
-        'contact_whatsapp': "[WhatsApp Customer Relations](https://wa.me/your_whatsapp_number)",
-        'check_promo': "✨ More Information ✨",
-
-        # Success message for low risk
-        'low_risk_success': "🎉 Great news! All your risk levels are in the low range. Keep maintaining your healthy lifestyle!",
-        'general_maintenance': "General Health Maintenance:",
-        'maintain_habits': "Continue your current healthy habits",
-        'regular_checkups': "Regular preventive health check-ups",
-        'stay_active': "Stay active and maintain balanced nutrition",
-        'monitor_changes': "Monitor any changes in your health status",
-
-        # Mandatory changes and fields
-        'monitor_changes': "Monitor any changes in your health status",
-        'mandatory_fields_error': "Please fill in the following mandatory fields: {fields}"
-    },
-
-    'id': {
-        # UI Header Titles
-        'title': "🧬 Prediksi Risiko Penyakit",
-        'subtitle': "Cari tahu bagaimana gaya hidup dan kondisi kesehatan Anda dapat digunakan untuk memprediksi risiko penyakit.",
-        'form_title': "📝 Kuesioner Penilaian Risiko Kesehatan",
-        'results_title': "📊 Hasil Penilaian Risiko Kesehatan Anda",
-        'back_button': "🔙 Kembali ke Kuesioner",
-        'success_msg': "✅ Skor risiko berhasil dihitung!",
-        'personal_info': "Informasi Pribadi",
-        'exercise_header': "Frekuensi Olahraga",
-        'lifestyle_header': "Faktor Gaya Hidup",
-        'health_header': "Kondisi Kesehatan",
-        'family_history': "Riwayat Keluarga",
-        'genetic_header': "Pemeriksaan Genetik Sebelumnya",
-        'recommendation_header': "Rekomendasi Kesehatan Pribadi Anda",
-        'take_action_header': "Hubungi Kami",
-        'result_header': "Penilaian Risiko Kesehatan Anda",
-        'result_subtext': "Skor risiko dikategorikan sebagai: Rendah (< 30%), Sedang (30-50%), Tinggi (> 50%)",
-
-        # Personal
-        'name': "Nama",
-        'phone': "Nomor Telepon",
-        'age': "Usia",
-        'height': "Tinggi Badan (cm)",
-        'weight': "Berat Badan (kg)",
-        'waist': "Lingkar Pinggang (cm)",
-        'occupation': "Pekerjaan",
-        'sex': "Jenis Kelamin",
-        'sex_options': ["Laki-laki", "Perempuan"],
-        'activity_level': "Tingkat Aktivitas Pekerjaan",
-        'activity_options': ["Duduk terus-menerus", "Sedikit aktif", "Cukup aktif", "Sangat aktif"],
-
-        # Exercise
-        'exercise_freq': "Frekuensi olahraga (gabungan kardio & kekuatan)",
-        'exercise_duration': "Durasi rata-rata olahraga",
-        'exercise_intensity': "Intensitas olahraga",
-
-        # Lifestyle
-        'sleep_hours': "Rata-rata jam tidur per malam",
-        'stress_level': "Tingkat stres",
-        'cholesterol_level': "Kadar Kolesterol Total",
-        'bp_meds': "Penggunaan obat penurun tekanan darah",
-        'smoking_status': "Status merokok",
-        'alcohol_use': "Konsumsi alkohol",
-        'hba1c_label': "Kadar HbA1c",
-        'fasting_glucose': "Kadar glukosa puasa",
-
-        # Symptoms
-        'symptoms_header': "Gejala Lainnya",
-        'frequent_hunger': "Frekuensi rasa lapar",
-        'frequent_thirst': "Frekuensi rasa haus",
-        'frequent_urination': "Frekuensi buang air kecil",
-
-        # Health
-        'conditions_label': "Kondisi kesehatan saat ini",
-        'medications_label': "Obat yang sedang dikonsumsi (jika ada)",
-        'diabetes_label': "Riwayat Diabetes",
-        'cancer_label': "Riwayat Kanker",
-        'cvd_label': "Riwayat Penyakit Jantung",
-        'diabetes_history': "Riwayat keluarga diabetes",
-        'cancer_history': "Riwayat keluarga kanker",
-        'cvd_history': "Riwayat keluarga penyakit jantung",
-
-        # Well & Fit
-        'wellfit_header': "Penilaian Kesehatan & Kebugaran",
-        'symptom_fatigue': "Kelelahan",
-        'symptom_joint_pain': "Nyeri sendi",
-        'symptom_digestive': "Gangguan pencernaan",
-        'symptom_skin_issues': "Masalah kulit",
-        'symptom_headaches': "Sakit kepala",
-        'symptom_mood': "Fluktuasi mood",
-        'symptom_cognitive': "Kesulitan kognitif",
-        'symptom_sleep': "Gangguan tidur",
-
-        # Genetic
-        'had_testing': "Apakah Anda pernah melakukan tes genetik sebelumnya?",
-        'findings': "Jelaskan hasil temuan yang signifikan",
-
-        # Results
-        'risk_level_low': "Tingkat Risiko: Rendah",
-        'risk_level_moderate': "Tingkat Risiko: Sedang",
-        'risk_level_high': "Tingkat Risiko: Tinggi",
-        'risk_na': "Tingkat Risiko: N/A (Kondisi sudah ada)",
-        'recommendations_label': "Rekomendasi:",
-        'recommended_product': "Produk Rekomendasi:",
-        'no_recommendation': "Ikuti rencana pengobatan dari penyedia layanan kesehatan Anda",
-
-        #st_info
-        'none_removed_info': "ℹ️ 'Tidak ada' dihapus secara otomatis karena Anda memilih kondisi lainnya.",
-
-        #submit
-        'submit_button': "Hitung Skor Risiko",
+# UI strings per language (translation catalogs, see i18n.py)
+LANG = CatalogSection('ui')
 
-        #recommendation
-        'category_metabolic': "Risiko Metabolik & Gaya Hidup",
-        'category_cvd': "Risiko Penyakit Jantung & Stroke",
-        'category_diabetes': "Risiko Diabetes",
-        'category_cancer': "Risiko Kanker",
-
-        # Contact buttons
-        'promo_button': "🎁 Promo",
-        'inquiry_button': "📞 Tanya",
-        'contact_whatsapp': "[WhatsApp Customer Relations](https://wa.me/your_whatsapp_number)",
-        'check_promo': "✨ Informasi Lebih Lanjut ✨",
-
-        # Success message for low risk
-        'low_risk_success': "🎉 Kabar baik! Semua tingkat risiko Anda dalam kategori rendah. Terus pertahankan gaya hidup sehat Anda!",
-        'general_maintenance': "Pemeliharaan Kesehatan Umum:",
-        'maintain_habits': "Lanjutkan kebiasaan sehat Anda saat ini",
-        'regular_checkups': "Pemeriksaan kesehatan preventif secara rutin",
-        'stay_active': "Tetap aktif dan jaga nutrisi seimbang",
-        'monitor_changes': "Pantau perubahan pada status kesehatan Anda",
-
-        # Mandatory changes and mandatory fields
-        'monitor_changes': "Pantau perubahan pada status kesehatan Anda",
-        'mandatory_fields_error': "Harap isi bidang wajib berikut: {fields}"
-    }
-}
-
-# Translation mappings
-sleep_map = {
-    "en": {
-        "< 5 hours (insufficient)": "< 5 hours (insufficient)",
-        "5-7 hours (below optimal)": "5-7 hours (below optimal)",
-        "7-9 hours (optimal)": "7-9 hours (optimal)",
-        "9+ hours (excessive)": "9+ hours (excessive)"
-    },
-    "id": {
-        "< 5 hours (insufficient)": "< 5 jam (tidak cukup)",
-        "5-7 hours (below optimal)": "5–7 jam (kurang optimal)",
-        "7-9 hours (optimal)": "7–9 jam (optimal)",
-        "9+ hours (excessive)": "> 9 jam (berlebihan)"
-    }
-}
-
-sleep_map_help = {
-    "en": "Total sleep duration including naps",
-    "id": "Total durasi tidur termasuk tidur siang"
-}
-
-stress_map = {
-    "en": {
-        "Low": "Low", "Moderate": "Moderate", "High": "High", "Very high": "Very high"
-    },
-    "id": {
-        "Low": "Rendah", "Moderate": "Sedang", "High": "Tinggi", "Very high": "Sangat tinggi"
-    }
-}
-
-stress_map_help = {
-    "en": "Low: Rarely stressed; Moderate: Sometimes stressed; High: Frequently stressed; Very high: Constantly overwhelmed",
-    "id": "Rendah: Jarang stres; Sedang: Kadang-kadang stres; Tinggi: Sering stres; Sangat tinggi: Terus-menerus merasa kewalahan"
-}
-
-cholesterol_map = {
-    "en": {
-        "Low (<200 mg/dL)": "Low (<200 mg/dL)",
-        "Medium (200-239 mg/dL)": "Medium (200–239 mg/dL)",
-        "High (≥240 mg/dL)": "High (≥240 mg/dL)",
-        "Unknown": "Unknown"
-    },
-    "id": {
-        "Low (<200 mg/dL)": "Rendah (<200 mg/dL)",
-        "Medium (200-239 mg/dL)": "Sedang (200–239 mg/dL)",
-        "High (≥240 mg/dL)": "Tinggi (≥240 mg/dL)",
-        "Unknown": "Tidak diketahui"
-    }
-}
-
-cholesterol_map_help = {
-    "en": "Total cholesterol level from blood test",
-    "id": "Total kadar kolesterol dari tes darah"
-}
-
-bp_map = {
-    "en": {"No": "No", "Not routine": "Not routine", "Yes routinely": "Yes routinely"},
-    "id": {"No": "Tidak", "Not routine": "Tidak rutin", "Yes routinely": "Ya (rutin)"}
-}
-
-bp_map_help = {
-    "en": "Regular use of antihypertensive medications",
-    "id": "Penggunaan rutin obat anti hipertensi"
-}
-
-smoking_map = {
-    "en": {"Non-smoker": "Non-smoker", "Passive smoker": "Passive smoker", "Active smoker": "Active smoker"},
-    "id": {"Non-smoker": "Tidak merokok", "Passive smoker": "Perokok pasif", "Active smoker": "Perokok aktif"}
-}
-
-smoking_map_help = {
-    "en": "Non-smoker: Never smoked; Passive: Exposed to secondhand smoke; Active: Current smoker",
-    "id": "Tidak merokok: Tidak pernah merokok; Perokok pasif: Terpapar asap rokok orang lain; Perokok aktif: Saat ini merokok"
-}
-
-alcohol_map = {
-    "en": {"No": "No", "Yes": "Yes"},
-    "id": {"No": "Tidak", "Yes": "Ya"}
-}
-
-alcohol_map_help = {
-    "en": "Regular alcohol consumption (weekly or more frequent)",
-    "id": "Konsumsi alkohol secara teratur (mingguan atau lebih sering)"
-}
-
-hba1c_map = {
-    "en": {
-        "<5.7% (normal)": "<5.7% (normal)",
-        "5.7-6.4% (prediabetes)": "5.7-6.4% (prediabetes)",
-        ">6.5% (diabetes)": ">6.5% (diabetes)",
-        "Unknown": "Unknown"
-    },
-    "id": {
-        "<5.7% (normal)": "<5.7% (normal)",
-        "5.7-6.4% (prediabetes)": "5.7-6.4% (prediabetes)",
-        ">6.5% (diabetes)": ">6.5% (diabetes)",
-        "Unknown": "Tidak diketahui"
-    }
-}
-
-hba1c_map_help = {
-    "en": "HbA1c level from blood test",
-    "id": "HbA1c dari tes darah"
-}
-
-glucose_map = {
-    "en": {
-        "Normal: <100 mg/dL (5.6 mmol/L)": "Normal: <100 mg/dL (5.6 mmol/L)",
-        "Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)": "Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)",
-        "Diabetes: ≥126 mg/dL (7.0 mmol/L)": "Diabetes: ≥126 mg/dL (7.0 mmol/L)",
-        "Unknown": "Unknown"
-    },
-    "id": {
-        "Normal: <100 mg/dL (5.6 mmol/L)": "Normal: <100 mg/dL (5.6 mmol/L)",
-        "Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)": "Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)",
-        "Diabetes: ≥126 mg/dL (7.0 mmol/L)": "Diabetes: ≥126 mg/dL (7.0 mmol/L)",
-        "Unknown": "Tidak diketahui"
-    }
-}
-
-glucose_map_help = {
-    "en": "Fasting glucose level from blood test",
-    "id": "Kadar glukosa puasa dari tes darah"
-}
-
-symptom_scale = {
-    "en": {
-        "Never": "Never", 
-        "Sometimes": "Sometimes", 
-        "Often": "Often", 
-        "Always": "Always"
-    },
-    "id": {
-        "Never": "Tidak pernah", 
-        "Sometimes": "Kadang-kadang", 
-        "Often": "Sering", 
-        "Always": "Selalu"
-    }
-}
-
-health_conditions_map = {
-    "en": {
-        "Hypertension": "Hypertension",
-        "High cholesterol": "High cholesterol",
-        "Diabetes": "Diabetes",
-        "Cardiovascular disease": "Cardiovascular disease",
-        "Cancer": "Cancer",
-        "Autoimmune condition": "Autoimmune condition",
-        "Inflammatory condition": "Inflammatory condition",
-        "Digestive disorders": "Digestive disorders",
-        "Skin conditions": "Skin conditions",
-        "None": "None"
-    },
-    "id": {
-        "Hypertension": "Hipertensi",
-        "High cholesterol": "Kolesterol tinggi",
-        "Diabetes": "Diabetes",
-        "Cardiovascular disease": "Penyakit kardiovaskular",
-        "Cancer": "Kanker",
-        "Autoimmune condition": "Kondisi autoimun",
-        "Inflammatory condition": "Kondisi peradangan",
-        "Digestive disorders": "Gangguan pencernaan",
-        "Skin conditions": "Masalah kulit",
-        "None": "Tidak ada"
-    }
-}
-
-family_history_map = {
-    "en": {
-        "None": "None",
-        "Grandparent": "Grandparent",
-        "Parent": "Parent",
-        "Sibling": "Sibling"
-    },
-    "id": {
-        "None": "Tidak ada",
-        "Grandparent": "Kakek/nenek",
-        "Parent": "Orang tua",
-        "Sibling": "Saudara kandung"
-    }
-}
-
-genetic_test_map = {
-    "en": {"No": "No", "Yes": "Yes"},
-    "id": {"No": "Tidak", "Yes": "Ya"}
-}
-
-exercise_freq_map = {
-    "en": {
-        "Never": "Never",
-        "1-2 times per week": "1-2 times per week",
-        "3-4 times per week": "3-4 times per week",
-        "5+ times per week": "5+ times per week"
-    },
-    "id": {
-        "Never": "Tidak pernah",
-        "1-2 times per week": "1-2 kali/minggu",
-        "3-4 times per week": "3-4 kali/minggu",
-        "5+ times per week": "Lebih dari 5 kali/minggu"
-    }
-}
-
-exercise_freq_help = {
-    "en": "Include all types of structured exercise and sports activities, excluding daily activities like walking or household chores",
-    "id": "Termasuk semua jenis olahraga terstruktur dan aktivitas olahraga, tidak termasuk aktivitas sehari-hari seperti berjalan kaki atau pekerjaan rumah tangga"
-}
-
-duration_map = {
-    "en": {
-        "<15 minutes": "<15 minutes",
-        "15-30 minutes": "15-30 minutes",
-        "30-45 minutes": "30-45 minutes",
-        "45-60 minutes": "45-60 minutes",
-        "60+ minutes": "60+ minutes"
-    },
-    "id": {
-        "<15 minutes": "<15 menit",
-        "15-30 minutes": "15–30 menit",
-        "30-45 minutes": "30–45 menit",
-        "45-60 minutes": "45–60 menit",
-        "60+ minutes": ">60 menit"
-    }
-}
-
-duration_map_help = {
-    "en": "Duration per exercise session",
-    "id": "Durasi per sesi latihan"
-}
-
-intensity_map = {
-    "en": {
-        "Light": "Light",
-        "Medium": "Medium",
-        "Vigorous": "Vigorous",
-        "Very vigorous": "Very vigorous"
-    },
-    "id": {
-        "Light": "Ringan",
-        "Medium": "Sedang",
-        "Vigorous": "Berat",
-        "Very vigorous": "Sangat berat"
-    }
-}
-intensity_map_help = {
-    "en": "Light: Can talk and manage breathing easily; Medium: Can talk but breathing is elevated; Vigorous: Difficult to talk; Very vigorous: Cannot maintain conversation",
-    "id": "Ringan: Dapat berbicara dan mengatur pernapasan dengan mudah; Sedang: Dapat berbicara tetapi pernapasan meningkat; Berat: Sulit berbicara; Sangat berat: Tidak dapat mempertahankan percakapan"
-}
-
-WHATSAPP_LINKS = {
-    "metabolic": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20atau%20menengah%20untuk%20penyakit%20metabolik%20dan%20gaya%20hidup.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20Genme%20Life%3F",
-    "diabetes": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20atau%20menengah%20untuk%20penyakit%20diabetes.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20Medical%20Check%20Up%3F",
-    "cvd": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20atau%20menengah%20untuk%20penyakit%20kardiovaskular.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20StrokeGENME%3F",
-    "cancer": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20menengah%20untuk%20penyakit%20kanker.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20KalScreen%3F",
-    "cancer_high_risk": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20%20untuk%20penyakit%20kanker.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20Spot-Mas%3F"
-}
-
-
-
-RECOMMENDATIONS = {
-    "metabolic": {
-        "en": [
-            "Follow Genme Life health recommendations for metabolic optimization",
-            "Increase physical activity to a minimum of 150 minutes of moderate exercise per week",
-            "Implement stress management techniques like meditation or yoga",
-            "Maintain consistent sleep schedule for 7-9 hours per night",
-            "Medical Check-Up Recommended",
-            "Focus on gradual, sustainable weight management",
-            "Consider avoiding smoking and alcohol consumption"
-        ],
-        "id": [
-            "Ikuti rekomendasi kesehatan Genme Life untuk optimasi metabolik",
-            "Tingkatkan aktivitas fisik hingga minimal 150 menit dengan intensitas sedang per minggu",
-            "Lakukan manajemen stres seperti meditasi atau yoga",
-            "Tidur teratur selama 7–9 jam per malam",
-            "Lakukan medical check up rutin",
-            "Fokus pada pengelolaan berat badan yang bertahap dan berkelanjutan",
-            "Hindari merokok dan minuman beralkohol"
-        ]
-    },
-    "cvd": {
-        "en": [
-            "Follow Strokegenme guidance for cardiovascular health",
-            "Schedule regular lipid panel blood checkups",
-            "Monitor blood pressure regularly",
-            "Increase aerobic exercise frequency",
-            "Medical Check-Up Recommended",
-            "Smoking cessation is critical for heart health",
-            "Implement cardiovascular-protective stress management"
-        ],
-        "id": [
-            "Ikuti panduan Strokegenme untuk kesehatan jantung",
-            "Jadwalkan pemeriksaan darah panel lipid secara rutin",
-            "Pantau tekanan darah secara teratur",
-            "Tingkatkan frekuensi olahraga aerobik",
-            "Pemeriksaan Medis Direkomendasikan",
-            "Berhenti merokok sangat penting untuk kesehatan jantung",
-            "Kelola stres dengan pendekatan yang melindungi kesehatan jantung"
-        ]
-    },
-    "diabetes": {
-        "en": [
-            "Schedule immediate medical checkup with HbA1c and fasting glucose tests",
-            "Monitor blood glucose levels regularly",
-            "Follow diabetes prevention dietary guidelines",
-            "Increase physical activity to improve insulin sensitivity",
-            "Medical Check-Up Recommended",
-            "Weight management is crucial for diabetes prevention",
-            "Discuss diabetes symptoms with healthcare provider immediately"
-        ],
-        "id": [
-            "Segera jadwalkan pemeriksaan medis dengan tes HbA1c dan glukosa puasa",
-            "Pantau kadar gula darah secara rutin",
-            "Ikuti panduan diet pencegahan diabetes",
-            "Tingkatkan aktivitas fisik untuk meningkatkan sensitivitas insulin",
-            "Pemeriksaan Medis Direkomendasikan",
-            "Pengelolaan berat badan penting untuk pencegahan diabetes",
-            "Diskusikan gejala diabetes dengan tenaga medis sesegera mungkin"
-        ]
-    },
-    "cancer": {
-        "en": [
-            "Consider Spot-Mas or Kalscreen 69 screening for early cancer detection ",
-            "Maintain regular cancer screening as per age guidelines",
-            "Adopt cancer-preventive lifestyle modifications",
-            "Medical Check-Up Recommended",
-            "Smoking cessation significantly reduces cancer risk",
-            "Consider reducing alcohol consumption"
-        ],
-        "id": [
-            "Pertimbangkan pemeriksaan SpotMas untuk deteksi dini kanker atau Kalscreen 69 untuk mengetahui risiko kanker",
-            "Lakukan skrining kanker secara rutin sesuai usia",
-            "Terapkan gaya hidup pencegahan kanker",
-            "Pemeriksaan Medis Direkomendasikan",
-            "Berhenti merokok dapat secara signifikan menurunkan risiko kanker",
-            "Pertimbangkan untuk mengurangi konsumsi alkohol"
-        ]
-    }
-}
 
 def map_selectbox(label, options_map, key=None, help=None):
     lang = st.session_state.lang
@@ -622,8 +80,8 @@ def map_radio(label, options_map, key=None, help=None):
 if 'lang' not in st.session_state:
     st.session_state.lang = 'en'
 
-lang_choice = st.selectbox("🌐 Language / Bahasa", ["English", "Bahasa Indonesia"])
-st.session_state.lang = 'en' if lang_choice == 'English' else 'id'
+LANGUAGES = i18n.languages()
+st.session_state.lang = st.selectbox("🌐 Language / Bahasa", list(LANGUAGES), format_func=LANGUAGES.get)
 T = LANG[st.session_state.lang]
 
 st.image("https://www.kalgeninnolab.co.id/frontend/web/images/kalgen-logo-home.png", width=120)
@@ -632,6 +90,12 @@ st.title(T['title'])
 st.write(T['subtitle'])
 
 # Create sections
+def stored_choice(options_key, selected):
+    """Stored value of a plain-label select: the label itself in en/id, the English label otherwise"""
+    if st.session_state.lang in DISPLAYED_VALUE_LANGUAGES:
+        return selected
+    return LANG['en'][options_key][T[options_key].index(selected)]
+
 def personal_info_section():
     st.header(T['personal_info'])
     col1, col2 = st.columns(2)
@@ -653,11 +117,11 @@ def personal_info_section():
         "name": name,
         "phone": phone,
         "age": age,
-        "sex": sex,
+        "sex": stored_choice('sex_options', sex),
         "height": height,
         "weight": weight,
         "occupation": occupation,
-        "activity_level": activity_level,
+        "activity_level": stored_choice('activity_options', activity_level),
         "waist_circumference": waist_circumference
     }
 
@@ -794,378 +258,12 @@ def genetic_testing_section():
         "findings": findings
     }
 
-def process_questionnaire_data(data):
-    """Process questionnaire responses into numerical features"""
-    features = {}
-    
-    # Process demographic features
-    features['age'] = data['personal']['age']
-    features['bmi'] = data['personal']['weight'] / ((data['personal']['height']/100) ** 2)
-    features['gender_male'] = 1 if data['personal']['sex'] in ['Male', 'Laki-laki'] else 0
-    features['waist_circumference'] = data['personal']['waist_circumference']
-    
-    # Process activity features
-    features['met_hours'] = calculate_met_hours(data['activity'])
-    
-    # Process lifestyle features
-    features['sleep_score'] = calculate_sleep_score(data['lifestyle'])
-    features['stress_score'] = calculate_stress_score(data['lifestyle'])
-    features['smoking_risk'] = calculate_smoking_risk(data['lifestyle'])
-    features['alcohol_risk'] = 1 if data['lifestyle']['alcohol'] == 'Yes' else 0
-    features['total_cholesterol'] = map_cholesterol_level(data['lifestyle']['total_cholesterol'])
-    features['bp_medication'] = map_bp_medication(data['lifestyle']['blood_pressure_medication'])
-    # features['hba1c'] = map_hba1c_level(data['lifestyle']['hba1c'])  # Removed from calculations
-    features['fasting_glucose'] = map_fasting_glucose_level(data['lifestyle']['fasting_glucose'])
-    features['diabetes_symptoms'] = calculate_diabetes_symptoms(data['lifestyle'])
-    
-    # Process health features
-    features['health_condition_score'] = calculate_health_condition_score(data['health'])
-    features['symptom_severity'] = calculate_symptom_severity(data['health'])
-    features['diabetes_family_history'] = map_family_history(data['health']['diabetes_history'])
-    features['cancer_family_history'] = map_family_history(data['health']['cancer_history'])
-    features['cvd_family_history'] = map_family_history(data['health']['cvd_history'])
-    
-    # Current conditions flags
-    features['has_diabetes'] = 'Diabetes' in data['health']['conditions']
-    features['has_diabetes'] = 'Diabetes' in data['health']['conditions']
-    features['has_cvd'] = 'Cardiovascular disease' in data['health']['conditions']
-    features['has_cancer'] = 'Cancer' in data['health']['conditions']
-    
-    return features
-
-def calculate_met_hours(activity_data):
-    """Calculate MET hours based on exercise frequency, duration and intensity"""
-    intensity_to_met = {
-        'Light': 2.5,
-        'Medium': 4.5,
-        'Vigorous': 7.0,
-        'Very vigorous': 10.0
-    }
-    
-    freq_to_num = {
-        'Never': 0,
-        '1-2 times per week': 1.5,
-        '3-4 times per week': 3.5,
-        '5+ times per week': 5.5
-    }
-    
-    duration_to_hours = {
-        '<15 minutes': 0.25,
-        '15-30 minutes': 0.375,
-        '30-45 minutes': 0.625,
-        '45-60 minutes': 0.875,
-        '60+ minutes': 1.25
-    }
-    
-    met_value = intensity_to_met[activity_data['intensity']]
-    exercise_times = freq_to_num[activity_data['exercise_frequency']]
-    hours = duration_to_hours[activity_data['duration']]
-    
-    return met_value * exercise_times * hours
-
-def calculate_sleep_score(lifestyle_data):
-    """Calculate sleep score (0-1)"""
-    sleep_hours_map = {
-        '< 5 hours (insufficient)': 0.2,
-        '5-7 hours (below optimal)': 0.6,
-        '7-9 hours (optimal)': 1.0,
-        '9+ hours (excessive)': 0.6
-    }
-    return sleep_hours_map[lifestyle_data['sleep_hours']]
-
-def calculate_stress_score(lifestyle_data):
-    """Calculate stress score (0-1, higher is worse)"""
-    stress_map_calc = {
-        'Low': 0.2,
-        'Moderate': 0.4,
-        'High': 0.7,
-        'Very high': 1.0
-    }
-    return stress_map_calc[lifestyle_data['stress_level']]
-
-def calculate_smoking_risk(lifestyle_data):
-    """Calculate smoking risk score (0-1)"""
-    smoking_map_calc = {
-        'Non-smoker': 0.0,
-        'Passive smoker': 0.3,
-        'Active smoker': 1.0
-    }
-    return smoking_map_calc[lifestyle_data['smoking']]
-
-def map_cholesterol_level(cholesterol_str):
-    """Map cholesterol level to numerical value"""
-    cholesterol_map_calc = {
-        'Low (<200 mg/dL)': 180,
-        'Medium (200-239 mg/dL)': 220,
-        'High (≥240 mg/dL)': 260,
-        'Unknown': 200  # Use average value
-    }
-    return cholesterol_map_calc[cholesterol_str]
-
-def map_bp_medication(bp_med_str):
-    """Map BP medication to numerical value"""
-    bp_map_calc = {
-        'No': 0,
-        'Not routine': 0.5,
-        'Yes routinely': 1
-    }
-    return bp_map_calc[bp_med_str]
-
-# def map_hba1c_level(hba1c_str):
-#     """Map HbA1c dropdown to numerical value - DISABLED: Not used in calculations"""
-#     hba1c_map_calc = {
-#         '<5.7% (normal)': 5.4,  # Average normal value
-#         '5.7-6.4% (prediabetes)': 6.0,  # Midpoint
-#         '>6.5% (diabetes)': 7.5,  # Typical diabetic value
-#         'Unknown': 5.7  # Use threshold value
-#     }
-#     return hba1c_map_calc[hba1c_str]
-
-def map_fasting_glucose_level(glucose_str):
-    """Map fasting glucose dropdown to numerical value"""
-    glucose_map_calc = {
-        'Normal: <100 mg/dL (5.6 mmol/L)': 90,  # Average normal
-        'Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)': 112,  # Midpoint
-        'Diabetes: ≥126 mg/dL (7.0 mmol/L)': 140,  # Typical diabetic
-        'Unknown': 100  # Use threshold value
-    }
-    return glucose_map_calc[glucose_str]
-
-def calculate_diabetes_symptoms(lifestyle_data):
-    """Calculate diabetes symptoms score"""
-    symptom_map_calc = {
-        'Never': 0,
-        'Sometimes': 0.5,
-        'Often': 0.75,
-        'Always': 1.0
-    }
-    
-    hunger_score = symptom_map_calc[lifestyle_data['frequent_hunger']]
-    thirst_score = symptom_map_calc[lifestyle_data['frequent_thirst']]
-    urination_score = symptom_map_calc[lifestyle_data['frequent_urination']]
-    
-    return (hunger_score + thirst_score + urination_score) / 3
-
-def map_family_history(history_str):
-    """Map family history to weighted score"""
-    history_map_calc = {
-        'None': 0,
-        'Grandparent': 1,
-        'Parent': 2,
-        'Sibling': 3
-    }
-    return history_map_calc[history_str]
-
-def calculate_health_condition_score(health_data):
-    """Calculate health condition risk score (0-1)"""
-    if 'None' in health_data['conditions']:
-        return 0.1
-    
-    condition_weights = {
-        'Hypertension': 0.7,
-        'High cholesterol': 0.6,
-        'Diabetes': 0.8,
-        'Cardiovascular disease': 0.9,
-        'Cancer': 0.9,
-        'Autoimmune condition': 0.7,
-        'Inflammatory condition': 0.6,
-        'Digestive disorders': 0.5,
-        'Skin conditions': 0.4
-    }
-    
-    total_weight = sum(condition_weights[c] for c in health_data['conditions'] if c != 'None')
-    return min(total_weight / 3, 1.0)
-
-def calculate_symptom_severity(health_data):
-    """Calculate symptom severity score (0-1)"""
-    severity_map_calc = {
-        'Never': 0,
-        'Sometimes': 0.5,
-        'Often': 0.75,
-        'Always': 1.0
-    }
-    
-    symptoms = health_data['symptoms']
-    total_severity = sum(severity_map_calc[v] for v in symptoms.values())
-    return total_severity / len(symptoms)
-
-def calculate_framingham_risk_score(features):
-    age = features['age']
-    is_male = features['gender_male']
-    total_chol = features['total_cholesterol']
-    treated_bp = features['bp_medication'] > 0  # Treated if on meds (routine or not)
-    smoking = features['smoking_risk'] > 0.5  # Active smoker
-    diabetes = (features['fasting_glucose'] >= 126 or features['has_diabetes'])  # Removed HbA1c from diabetes detection
-
-    # Points system adapted from Framingham (simplified; no SBP/HDL; use BP meds as proxy)
-    points = 0
-
-    # Age points (male/female specific) - Slightly increased to compensate for no SBP
-    if is_male:
-        if age < 35: points += -8
-        elif age <= 39: points += -3
-        elif age <= 44: points += 1
-        elif age <= 49: points += 4
-        elif age <= 54: points += 7
-        elif age <= 49: points += 4
-        elif age <= 54: points += 7
-        elif age <= 59: points += 9
-        elif age <= 64: points += 11
-        elif age <= 69: points += 12
-        elif age <= 74: points += 13
-        else: points += 14
-    else:
-        if age < 35: points += -6
-        elif age <= 39: points += -2
-        elif age <= 44: points += 1
-        elif age <= 49: points += 4
-        elif age <= 54: points += 7
-        elif age <= 59: points += 9
-        elif age <= 64: points += 11
-        elif age <= 69: points += 13
-        elif age <= 74: points += 15
-        else: points += 17
-
-    # Total Cholesterol points (age-adjusted, simplified) - Slightly increased
-    if total_chol < 160: chol_points = 0
-    elif total_chol < 200: chol_points = 2
-    elif total_chol < 240: chol_points = 3
-    elif total_chol < 280: chol_points = 4
-    else: chol_points = 5
-    if age >= 70: chol_points -= 1  # Adjust for older age
-    points += chol_points
-
-    # BP meds as proxy for hypertension (increased weight without direct SBP)
-    if treated_bp:
-        points += 4  # Higher penalty assuming treatment indicates elevated BP
-
-    # Smoking: +3 if smoker (increased from 2 to compensate)
-    if smoking: points += 3
-
-    # Diabetes: +3 if present (increased from 2)
-    if diabetes: points += 3
-
-    # Convert points to approximate 10-year risk % (using exponential approximation for realism)
-    import math
-    risk = 1 - math.exp(-0.06 * (points + 8))  # Adjusted to give ~3-7% base for young/healthy, caps at ~80%
-    return max(0.01, min(risk, 0.99))  # Ensure no 0% or 100%
-
-def calculate_risk_scores(features):
-    """Calculate risk scores for different health aspects with adjusted cutoffs"""
-    risk_scores = {}
-    
-    # Metabolic and Lifestyle Risk - Adjusted to reduce default to ~46%
-    metabolic_risk = (
-        0.22 * max(0, (features['bmi'] - 18.5) / (32 - 18.5)) +  # Slightly lowered weight
-        0.18 * (1 - min(features['met_hours'] / 35, 1)) +  # Slightly lowered
-        0.18 * features['stress_score'] +  # Slightly lowered
-        0.15 * features['smoking_risk'] +
-        0.1 * features['alcohol_risk'] +
-        0.1 * (1 - features['sleep_score'])
-    )
-    # Reduced multiplier
-    metabolic_risk = min(metabolic_risk * 1.15, 1.0)
-    risk_scores['metabolic_lifestyle'] = max(0.01, min(0.99, metabolic_risk))  # Avoid extremes
-    
-    # CVD & Stroke Risk (Revamped Framingham-based without SBP)
-    if not features['has_cvd']:
-        cvd_risk = calculate_framingham_risk_score(features)
-        # Add family history
-        cvd_risk += features['cvd_family_history'] * 0.08
-        # Apply multiplier
-        cvd_risk = min(cvd_risk * 1.2, 1.0)
-        risk_scores['cvd_stroke'] = max(0.01, min(0.99, cvd_risk))
-    
-    if not features['has_diabetes']:
-        # Adjust waist circumference if zero
-        waist_adj = features['waist_circumference'] if features['waist_circumference'] > 0 else 80
-        
-        diabetes_risk = (
-            0.3 * max(0, (features['bmi'] - 18.5) / (32 - 18.5)) +  # Increased weight from 0.25 to 0.3
-            0.25 * max(0, (waist_adj - 65) / (110 - 65)) +  # Increased weight from 0.2 to 0.25
-            # Removed HbA1c component (was 0.15)
-            0.25 * min(max( (features['fasting_glucose'] - 70) / (126 - 70), 0), 1) +  # Increased weight from 0.15 to 0.25
-            0.1 * (1 - min(features['met_hours'] / 35, 1)) +
-            0.05 * features['diabetes_family_history'] * 0.1 +
-            0.05 * features['diabetes_symptoms']  # Reduced from 0.1 to 0.05 to maintain balance
-        )
-        # Apply multiplier to increase scores
-        diabetes_risk = min(diabetes_risk * 1.25, 1.0)
-        risk_scores['diabetes'] = max(0.01, min(0.99, diabetes_risk))
-    
-    # Cancer Risk - Minor adjustment to avoid 0%
-    if not features['has_cancer']:
-        cancer_risk = (
-            0.3 * (features['age'] - 18) / (75 - 18) +  # Lower age threshold
-            0.25 * features['smoking_risk'] +
-            0.2 * features['alcohol_risk'] +
-            0.15 * max(0, (features['bmi'] - 18.5) / (32 - 18.5)) +  # Lower BMI threshold
-            0.1 * features['cancer_family_history'] * 0.1
-        )
-        # Apply multiplier to increase scores
-        cancer_risk = min(cancer_risk * 1.2, 1.0)
-        risk_scores['cancer'] = max(0.01, min(0.99, cancer_risk))
-    
-    return risk_scores
-
+def percentile_store():
+    """Population percentile sketches shared by all sessions of this process"""
+    return sinks.percentile_store()
 
-def generate_recommendations(risk_scores, features):
-    """Generate personalized recommendations based on risk assessment"""
-    lang = st.session_state.lang
-    recommendations = []
-    
-    # Metabolic & Lifestyle recommendations - Lower threshold for recommendations
-    if 'metabolic_lifestyle' in risk_scores and risk_scores['metabolic_lifestyle'] >= 0.3:  # Lowered from 0.4
-        recs = RECOMMENDATIONS["metabolic"][lang][:5]  # First 5 recommendations
-        if features['bmi'] > 25:
-            recs.append(RECOMMENDATIONS["metabolic"][lang][5])
-        if features['smoking_risk'] > 0.5:
-            recs.append(RECOMMENDATIONS["metabolic"][lang][6])
-        recommendations.append({
-            'category': T['category_metabolic'],
-            'recommendations': recs
-        })
-    
-    # CVD & Stroke recommendations - Lower threshold
-    if 'cvd_stroke' in risk_scores and risk_scores['cvd_stroke'] >= 0.25:  # Lowered from 0.3
-        recs = RECOMMENDATIONS["cvd"][lang][:5]  # First 5 recommendations
-        if features['smoking_risk'] > 0.5:
-            recs.append(RECOMMENDATIONS["cvd"][lang][5])
-        if features['stress_score'] > 0.6:
-            recs.append(RECOMMENDATIONS["cvd"][lang][6])
-        recommendations.append({
-            'category': T['category_cvd'],
-            'recommendations': recs
-        })
-    
-    # Diabetes recommendations - Lower threshold
-    if 'diabetes' in risk_scores and risk_scores['diabetes'] >= 0.3:  # Lowered from 0.4
-        recs = RECOMMENDATIONS["diabetes"][lang][:5]  # First 5 recommendations
-        if features['bmi'] > 25:
-            recs.append(RECOMMENDATIONS["diabetes"][lang][5])
-        if features['diabetes_symptoms'] > 0.5:
-            recs.append(RECOMMENDATIONS["diabetes"][lang][6])
-        recommendations.append({
-            'category': T['category_diabetes'],
-            'recommendations': recs
-        })
-    
-    # Cancer recommendations - Lower threshold
-    if 'cancer' in risk_scores and risk_scores['cancer'] >= 0.25:  # Lowered from 0.3
-        recs = RECOMMENDATIONS["cancer"][lang][:5]  # First 5 recommendations
-        if features['smoking_risk'] > 0.5:
-            recs.append(RECOMMENDATIONS["cancer"][lang][5])
-        if features['alcohol_risk'] > 0.5:
-            recs.append(RECOMMENDATIONS["cancer"][lang][6])
-        recommendations.append({
-            'category': T['category_cancer'],
-            'recommendations': recs
-        })
-    
-    return recommendations
-
-def display_results(risk_scores, recommendations, features):
-    """Display risk scores and recommendations"""
+def display_results(risk_scores, recommendations, features, links):
+    """Display risk scores and recommendations (``links``: the clinic's WhatsApp CTA links)"""
     st.header(T['result_header'])
     st.write(T['result_subtext'])
     
@@ -1186,6 +284,9 @@ def display_results(risk_scores, recommendations, features):
             if risk_key in risk_scores:
                 value = risk_scores[risk_key]
                 st.metric(label, f"{value*100:.1f}%")
+                pct = percentile_store().percentile(risk_key, features['age'], value)
+                if pct is not None:
+                    st.caption(T['percentile_caption'].format(pct=pct))
                 # Updated thresholds
                 if value < 0.3:
                     st.success(T['risk_level_low'])
@@ -1207,7 +308,8 @@ def display_results(risk_scores, recommendations, features):
     # Create sections for each category - Only show recommendations for moderate/high risk
     if recommendations:
         for rec_cat in recommendations:
-            category_name = rec_cat['category']
+            risk_key = rec_cat['risk_key']
+            category_name = T[RISK_CATEGORY_LABEL_KEYS[risk_key]]
             category_recommendations = rec_cat['recommendations']
             
             st.subheader(f"🎯 {category_name}")
@@ -1223,53 +325,17 @@ def display_results(risk_scores, recommendations, features):
             with col2:
                 st.write(f"**{T['recommended_product']}**")
                 
-                # Determine risk key for this category
-                risk_key = None
-                for cat_name, key in all_categories:
-                    if cat_name == category_name:
-                        risk_key = key
-                        break
-                
-                # Simple logic for image display
-                 # Logic for image display and CTA link based on risk category
-                image_path = 'assets/MCU.jpg'  # Default
-                caption = "General Health Screening"
-                whatsapp_link = WHATSAPP_LINKS['metabolic'] # Default link
-                
-                if risk_key == 'diabetes':
-                    image_path = 'assets/MCU.jpg'
-                    caption = "MCU Health Screening" if st.session_state.lang == 'en' else "MCU – Pemeriksaan Kesehatan"
-                    whatsapp_link = WHATSAPP_LINKS['diabetes']
-                elif risk_key == 'cvd_stroke':
-                    image_path = 'assets/StrokeGENME.png'
-                    caption = "StrokeGENME - CVD Prevention" if st.session_state.lang == 'en' else "StrokeGENME – Pencegahan Penyakit Jantung"
-                    whatsapp_link = WHATSAPP_LINKS['cvd']
-                elif risk_key == 'cancer':
-                    # Conditional logic for cancer based on risk and age
-                    is_high_risk = risk_scores.get('cancer', 0) > 0.5
-                    is_older = features['age'] > 40
-                    if is_high_risk and is_older:
-                        image_path = 'assets/spotmas.jpeg'
-                        caption = "SpotMas - High Risk Cancer Screening" if st.session_state.lang == 'en' else "SpotMas – Skrining Kanker Risiko Tinggi"
-                        whatsapp_link = WHATSAPP_LINKS['cancer_high_risk']
-                    else:
-                        image_path = 'assets/Kalscanner69.png'
-                        caption = "Kalscanner69 - Cancer Screening" if st.session_state.lang == 'en' else "Kalscanner69 – Deteksi Kanker"
-                        whatsapp_link = WHATSAPP_LINKS['cancer']
-                elif risk_key == 'metabolic_lifestyle': 
-                    image_path = 'assets/GENME_LIFE.png'
-                    caption = "GENME Life - Metabolic Health" if st.session_state.lang == 'en' else "GENME Life – Kesehatan Metabolik"
-                    whatsapp_link = WHATSAPP_LINKS['metabolic']
-                
+                # Product image, caption and CTA link come precompiled with the recommendations
+                product = rec_cat['product']
                 try:
-                    st.image(image_path, caption=caption, use_container_width=True)
+                    st.image(product['image'], caption=product['caption'], use_container_width=True)
                 except:
-                    st.error(f"Image not found: {image_path}")
+                    st.error(f"Image not found: {product['image']}")
                 
                 # Add CTA button for each recommendation category
                 # if st.button(T['check_promo'], key=f"promo_{risk_key}", use_container_width=True):
                 #     st.markdown(T['contact_whatsapp'])
-                st.link_button(T['check_promo'], whatsapp_link, use_container_width=True)
+                st.link_button(T['check_promo'], links[product['cta']], use_container_width=True)
             
             st.divider()
     else:
@@ -1285,13 +351,413 @@ def display_results(risk_scores, recommendations, features):
     col1, col2 = st.columns(2)
 
     with col1:
-        st.link_button(T['promo_button'], "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab%2C%20apakah%20ada%20promo%20untuk%20produk%20GENME%3F%20apakah%20saya%20bisa%20mendapatkan%20informasi%20lebih%20lanjut", use_container_width=True)
+        st.link_button(T['promo_button'], links['promo'], use_container_width=True)
 
     with col2:
-        st.link_button(T['inquiry_button'], "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab%2C%20saya%20tertarik%20dengan%20produk%20GENME%2C%20apakah%20saya%20bisa%20mendapatkan%20informasi%20lebih%20lanjut%3F", use_container_width=True)
+        st.link_button(T['inquiry_button'], links['inquiry'], use_container_width=True)
+
+RISK_CATEGORY_LABEL_KEYS = {
+    'metabolic_lifestyle': 'category_metabolic',
+    'cvd_stroke': 'category_cvd',
+    'diabetes': 'category_diabetes',
+    'cancer': 'category_cancer'
+}
+
+def require_admin():
+    """Password gate for internal pages; returns True once the session is authenticated"""
+    if st.session_state.get('is_admin'):
+        return True
+    if not ADMIN_PASSWORD:
+        st.error("Admin pages are disabled: set ADMIN_PASSWORD to enable them.")
+        return False
+    password = st.text_input("Admin password", type="password")
+    if password and hmac.compare_digest(password, ADMIN_PASSWORD):
+        st.session_state.is_admin = True
+        st.rerun()
+    elif password:
+        st.error("Incorrect password")
+    return False
+
+def admin_dashboard():
+    """Internal cohort dashboard, read entirely from the incrementally maintained aggregates"""
+    st.header("📈 Cohort Dashboard")
+    
+    today = datetime.now().date()
+    date_range = st.date_input("Date range", (today - timedelta(days=30), today))
+    if len(date_range) != 2:
+        return
+    start_day, end_day = date_range[0].isoformat(), date_range[1].isoformat()
+    
+    # Submission volume
+    volume = aggregates.daily_volume(start_day, end_day)
+    st.metric("Submissions", int(volume['n'].sum()))
+    if not volume.empty:
+        st.bar_chart(volume.set_index('day')['n'])
+    
+    # Risk-band distribution per category
+    st.subheader("Risk bands per category")
+    labels = {key: T[label_key] for key, label_key in RISK_CATEGORY_LABEL_KEYS.items()}
+    counts = aggregates.band_counts(start_day, end_day)
+    if counts.empty:
+        st.info("No submissions in this date range.")
+        return
+    counts['category'] = counts['category'].map(labels)
+    bands = counts.pivot_table(index='category', columns='band', values='n', fill_value=0)
+    st.bar_chart(bands.reindex(columns=[b for b in aggregates.BANDS if b in bands.columns]))
+    
+    # Breakdown by demographics or day
+    split_options = {"Age group": 'age_group', "Sex": 'sex', "Day": 'day'}
+    split_label = st.selectbox("Split by", list(split_options))
+    split = split_options[split_label]
+    breakdown = aggregates.band_counts(start_day, end_day, by=(split,))
+    breakdown['category'] = breakdown['category'].map(labels)
+    table = breakdown.pivot_table(index=['category', split], columns='band', values='n', fill_value=0)
+    st.dataframe(table, use_container_width=True)
+    
+    # Score histograms
+    st.subheader("Score distribution")
+    for tab, category in zip(st.tabs(list(labels.values())), labels):
+        with tab:
+            hist = aggregates.score_histogram(start_day, end_day, category)
+            hist['range'] = hist['bin'].map(lambda b: f"{b * 10}-{b * 10 + 10}%")
+            st.bar_chart(hist.set_index('range')['n'])
+
+# What-if grid: every exercise frequency x smoking status x alcohol x BMI change
+WHATIF_FREQUENCIES = list(exercise_freq_map['en'])
+WHATIF_SMOKING = list(smoking_map['en'])
+WHATIF_ALCOHOL = list(alcohol_map['en'])
+WHATIF_BMI_DELTAS = np.round(np.arange(-10.0, 5.01, 0.1), 1)
+
+def session_model():
+    """The scoring model the current results were produced with (recorded at submit)"""
+    version = st.session_state.get('model_version')
+    return REGISTRY.get(version) if version else REGISTRY.active()
+
+def score_what_if_grid(questionnaire_data, features, model=None):
+    """Score all counterfactual feature vectors of the what-if grid in one vectorized call"""
+    activity = questionnaire_data['activity']
+    met_hours = np.array([calculate_met_hours({**activity, 'exercise_frequency': freq}) for freq in WHATIF_FREQUENCIES])
+    smoking_risk = np.array([calculate_smoking_risk({'smoking': status}) for status in WHATIF_SMOKING])
+    alcohol_risk = np.array([1 if answer == 'Yes' else 0 for answer in WHATIF_ALCOHOL])
+    
+    grid = dict(features)
+    grid['met_hours'] = met_hours[:, None, None, None]
+    grid['smoking_risk'] = smoking_risk[None, :, None, None]
+    grid['alcohol_risk'] = alcohol_risk[None, None, :, None]
+    grid['bmi'] = np.maximum(features['bmi'] + WHATIF_BMI_DELTAS, 10)[None, None, None, :]
+    return calculate_risk_scores_batch(grid, model)
+
+@st.fragment
+def what_if_panel(questionnaire_data, features, risk_scores):
+    """Counterfactual simulator; moving a control reruns only this fragment"""
+    lang = st.session_state.lang
+    st.header(T['whatif_header'])
+    st.caption(T['whatif_caption'])
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        bmi_delta = st.slider(T['whatif_bmi_change'], -10.0, 5.0, 0.0, 0.5, key="whatif_bmi")
+        frequency = st.select_slider(
+            T['exercise_freq'], WHATIF_FREQUENCIES,
+            value=questionnaire_data['activity']['exercise_frequency'],
+            format_func=lambda k: exercise_freq_map[lang][k], key="whatif_exercise"
+        )
+    with col2:
+        smoking = st.radio(
+            T['smoking_status'], WHATIF_SMOKING,
+            index=WHATIF_SMOKING.index(questionnaire_data['lifestyle']['smoking']),
+            format_func=lambda k: smoking_map[lang][k], horizontal=True, key="whatif_smoking"
+        )
+        alcohol = st.radio(
+            T['alcohol_use'], WHATIF_ALCOHOL,
+            index=WHATIF_ALCOHOL.index(questionnaire_data['lifestyle']['alcohol']),
+            format_func=lambda k: alcohol_map[lang][k], horizontal=True, key="whatif_alcohol"
+        )
+    
+    grid_scores = score_what_if_grid(questionnaire_data, features, session_model())
+    i, j, k = WHATIF_FREQUENCIES.index(frequency), WHATIF_SMOKING.index(smoking), WHATIF_ALCOHOL.index(alcohol)
+    b = int(np.argmin(np.abs(WHATIF_BMI_DELTAS - bmi_delta)))
+    
+    cols = st.columns(4)
+    curves = {}
+    for col, (risk_key, label_key) in zip(cols, RISK_CATEGORY_LABEL_KEYS.items()):
+        curve = grid_scores[risk_key][i, j, k]
+        with col:
+            if risk_key in risk_scores:
+                value = curve[b]
+                st.metric(T[label_key], f"{value*100:.1f}%",
+                          delta=f"{(value - risk_scores[risk_key])*100:+.1f} pp", delta_color="inverse")
+                curves[T[label_key]] = curve * 100
+            else:
+                st.metric(T[label_key], "N/A")
+    
+    if curves:
+        st.caption(T['whatif_curve_caption'])
+        st.line_chart(pd.DataFrame(curves, index=pd.Index(WHATIF_BMI_DELTAS, name=T['whatif_bmi_change'])))
+
+def history_panel(phone, name):
+    """Trend of all four risk scores over the respondent's earlier assessments (same phone number and name)"""
+    entries = history.lookup(phone, name)
+    if len(entries) < 2:
+        return
+    st.header(T['history_header'])
+    st.caption(T['history_caption'].format(n=len(entries)))
+    trend = pd.DataFrame(
+        {T[label_key]: [entry['scores'].get(risk_key) for entry in entries]
+         for risk_key, label_key in RISK_CATEGORY_LABEL_KEYS.items()},
+        index=pd.to_datetime([entry['timestamp'] for entry in entries]), dtype=float,
+    ) * 100
+    st.line_chart(trend.dropna(axis=1, how='all'))
+
+def report_panel(questionnaire_data, risk_scores, recommendations, model_version, links):
+    """Printable PDF of these results, rendered in the background and cached by content"""
+    st.header(T['report_header'])
+    lang = st.session_state.lang
+    key = reports.report_key(questionnaire_data, model_version, lang, links)
+    path = reports.cached_report(key)
+    if path is not None:
+        with open(path, 'rb') as f:
+            st.download_button(T['report_download_button'], f.read(), file_name=f"health_risk_report_{lang}.pdf",
+                               mime='application/pdf')
+        return
+    if st.session_state.get('report_requested') != key:
+        if st.button(T['report_prepare_button']):
+            st.session_state.report_requested = key
+            st.rerun()
+        return
+    # Idempotent: also restarts a report whose cached file was evicted meanwhile
+    reports.request(key, questionnaire_data, risk_scores, recommendations, model_version, lang, links)
+    report_progress(key)
+
+@st.fragment(run_every=1.0)
+def report_progress(key):
+    """Poll a report being rendered; rerun the page once it is ready"""
+    state = reports.status(key)
+    if state == 'ready':
+        st.rerun()
+    elif state == 'failed':
+        st.error(T['report_failed'])
+    else:
+        st.caption(T['report_preparing'])
+
+def page_url():
+    """URL of the app in the browser: st.context.url where Streamlit has it, else built from the Host header"""
+    url = getattr(st.context, 'url', None)
+    if url:
+        return url
+    host = st.context.headers.get('Host')
+    if not host:
+        return ''
+    return f"{st.context.headers.get('X-Forwarded-Proto', 'http')}://{host}/"
+
+def share_panel(features, model_version):
+    """A link to these results (scoring features only, no name or phone) to send to a doctor or family"""
+    st.header(T['share_header'])
+    st.caption(T['share_caption'])
+    params = {'r': sharelinks.encode(features, model_version)}
+    tenant = current_tenant()
+    if tenant['id'] != tenants.DEFAULT_TENANT:
+        params['clinic'] = tenant['id']
+    st.code(f"{page_url()}?{urlencode(params)}", language=None)
+
+@st.cache_data(max_entries=10000, ttl=3600, show_spinner=False)
+def shared_results(token, lang):
+    """Risk scores, recommendations and features of a shared link (None if invalid), computed once per link and language"""
+    try:
+        features, version = sharelinks.decode(token)
+        model = REGISTRY.get(version)
+    except (ValueError, OSError) as e:
+        print(f"DEBUG: Rejected shared results link: {e}")
+        return None
+    risk_scores = calculate_risk_scores(features, model)
+    return risk_scores, generate_recommendations(risk_scores, features, lang, model), features
+
+def shared_results_page(token):
+    """Results opened from a shared link: recomputed from the link alone, no storage or session involved"""
+    shared = shared_results(token, st.session_state.lang)
+    if shared is None:
+        st.error(T['share_invalid'])
+    else:
+        st.header(T['shared_results_title'])
+        risk_scores, recommendations, features = shared
+        display_results(risk_scores, recommendations, features, current_tenant()['whatsapp_links'])
+    if st.button(T['share_start_button']):
+        del st.query_params['r']
+        st.rerun()
+
+def client_identity():
+    """(client address, session id) of the current script run, for rate limiting"""
+    # nginx sets X-Real-IP; the replicas themselves are not reachable from outside.
+    # st.context.ip_address is missing from older Streamlit versions
+    address = st.context.headers.get('X-Real-IP') or getattr(st.context, 'ip_address', None) or ''
+    ctx = get_script_run_ctx()
+    return address, ctx.session_id if ctx else ''
+
+def current_tenant():
+    """Settings of the partner clinic in the URL (``?clinic=<id>``), or of the default tenant"""
+    return tenants.get(st.query_params.get('clinic'))
+
+def admin_bulk_intake():
+    """Upload typed-in paper questionnaires, validate and score them in chunks and store the valid rows"""
+    st.header("📥 Bulk Questionnaire Intake")
+    st.write("Upload a CSV or Excel file with the same columns as `submissions.csv`. "
+             "Option columns accept the English value or the label of any language; "
+             "`bmi` and the risk columns are recalculated. The `timestamp` column is the date on the form; "
+             "it is kept as `form_date`, and each row is stored with its own timestamp.")
+    
+    uploaded = st.file_uploader("Questionnaire file", type=['csv', 'xlsx'])
+    if uploaded is None or not st.button("Process file"):
+        return
+    
+    total = intake.count_uploaded_rows(uploaded, uploaded.name)
+    progress = st.progress(0.0, text="Starting...")
+    rows_read, stored, rejected = 0, 0, []
+    try:
+        tenant = current_tenant()
+        rows = intake.iter_uploaded_rows(uploaded, uploaded.name)
+        for accepted, chunk_rejected, chunk_rows in intake.score_chunks(rows, clinic=tenant['id']):
+            if accepted:
+                sinks.store_submissions(accepted, tenant)
+            rows_read += chunk_rows
+            stored += len(accepted)
+            rejected.extend(chunk_rejected)
+            progress.progress(min(rows_read / total, 1.0), text=f"{rows_read} rows processed, {stored} stored")
+    except Exception as e:
+        st.error(f"Stopped after {rows_read} rows ({stored} stored): {str(e)}")
+        print(f"DEBUG ERROR: {str(e)}")
+    else:
+        progress.progress(1.0, text=f"Done: {rows_read} rows processed")
+    
+    st.success(f"✅ {stored} submissions stored")
+    if rejected:
+        st.warning(f"{len(rejected)} rows rejected")
+        rejected_df = pd.DataFrame(rejected, columns=['row', 'name', 'reason'])
+        st.dataframe(rejected_df, use_container_width=True, hide_index=True)
+        st.download_button("Download rejected rows", rejected_df.to_csv(index=False), "rejected_rows.csv", "text/csv")
+
+# Form fields that can fail validation -> LANG label key shown in the error message
+FORM_FIELD_LABEL_KEYS = {
+    'name': 'name',
+    'age': 'age',
+    'waist_circumference': 'waist',
+    'height': 'height',
+    'weight': 'weight'
+}
+
+def admin_export():
+    """Filtered archive export; rows are streamed to a scratch file, never loaded as a table"""
+    st.header("📤 Export Submissions")
+    
+    today = datetime.now().date()
+    date_range = st.date_input("Date range", (today - timedelta(days=30), today), key="export_dates")
+    labels = {key: T[label_key] for key, label_key in RISK_CATEGORY_LABEL_KEYS.items()}
+    bands = {}
+    cols = st.columns(4)
+    for col, (risk_key, label) in zip(cols, labels.items()):
+        with col:
+            selected = st.multiselect(label, aggregates.BANDS, key=f"export_band_{risk_key}")
+            if selected:
+                bands[risk_key] = set(selected)
+    fmt = st.radio("Format", ['xlsx', 'csv'], horizontal=True)
+    # The Google Sheet includes edits made there by ops staff; read through its local mirror
+    tenant = current_tenant()
+    source = st.radio("Source", ["Local archive", "Google Sheet (mirror)"], horizontal=True)
+    csv_path, rotated = CSV_PATH, True
+    if source != "Local archive":
+        rotated = False  # the mirror file alone: it is never rotated
+        csv_path = sheet_mirror.mirror_path(tenant['id'])
+        synced_at = sheet_mirror.read_cursor(csv_path)['synced_at']
+        if synced_at is None:
+            st.info(f"The sheet of {tenant['id']} has not been mirrored yet; the outbox worker syncs it "
+                    "every SHEET_MIRROR_SECONDS.")
+            return
+        st.caption(f"Mirror of {tenant['id']}, synced {datetime.fromtimestamp(synced_at):%Y-%m-%d %H:%M:%S}.")
+    if len(date_range) != 2 or not st.button("Export"):
+        return
+    
+    os.makedirs(export.EXPORTS_DIR, exist_ok=True)
+    start_day, end_day = date_range[0].isoformat(), date_range[1].isoformat()
+    filename = f"submissions_{start_day}_{end_day}.{fmt}"
+    path = os.path.join(export.EXPORTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{filename}")
+    try:
+        with st.spinner("Exporting..."):
+            n = export.export(path, fmt, start_day, end_day, bands, csv_path, rotated)
+        st.success(f"{n} matching row(s).")
+        with open(path, 'rb') as f:
+            st.download_button(f"Download {filename}", f, file_name=filename)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def admin_sessions():
+    """Memory held by open browser sessions in this replica (measured once a minute)"""
+    st.header("🧠 Sessions")
+    gauge = sessions.footprint()
+    cols = st.columns(4)
+    cols[0].metric("Open sessions", gauge['sessions'])
+    cols[1].metric("Session state", f"{gauge['bytes'] / 1024:,.0f} KB")
+    cols[2].metric("Largest session", f"{gauge['largest_bytes'] / 1024:,.1f} KB")
+    cols[3].metric("Evicted (idle)", gauge['evicted'], help=f"{gauge['evictions']} evictions since start")
+    st.caption(f"Sessions idle for more than {sessions.SESSION_TTL_SECONDS / 60:.0f} minutes keep only "
+               "their language and compressed results. Each replica reports its own sessions.")
+    
+    st.subheader("Submission rate limits")
+    limits = {'session': ratelimit.SESSION_LIMITER, 'address': ratelimit.ADDRESS_LIMITER}
+    st.dataframe(pd.DataFrame([
+        {'per': per, 'limit': f"{limiter.limit} / {limiter.window:.0f}s", **limiter.stats()}
+        for per, limiter in limits.items()
+    ]), hide_index=True)
+
+def admin_erasure():
+    """Right to erasure: find a respondent's submissions by phone number and/or name and erase them everywhere"""
+    st.header("🗑️ Erase Respondent Data")
+    cols = st.columns(2)
+    phone = cols[0].text_input("Phone number", key="erasure_phone").strip()
+    name = cols[1].text_input("Full name", key="erasure_name").strip()
+    st.caption("With both, only submissions matching the phone number and the name are erased.")
+    if not phone and not name:
+        return
+    found = erasure.find(phone or None, name or None)
+    if not found:
+        st.info("No stored submissions found.")
+        return
+    st.dataframe(pd.DataFrame([
+        {'submitted': timestamp, 'stores': ', '.join(sorted({store for store, *_ in locations}))}
+        for timestamp, locations in found.values()
+    ]), hide_index=True)
+    confirmed = st.checkbox(f"Permanently erase these {len(found)} submission(s)", key="erasure_confirm")
+    if confirmed and st.button("Erase", type="primary"):
+        counts = erasure.erase(phone or None, name or None, list(found))
+        st.success(f"Erased {counts['submissions']} submission(s): {counts['csv']} archive row(s), "
+                   f"{counts['json']} JSON file(s), {counts['history']} history entr(ies), "
+                   f"{counts['report']} report(s); {counts['sheet']} sheet row(s) queued.")
+        if counts['missing']:
+            st.warning(f"{counts['missing']} archive row(s) were no longer found.")
+
+ADMIN_PAGES = {
+    'dashboard': admin_dashboard,
+    'intake': admin_bulk_intake,
+    'export': admin_export,
+    'sessions': admin_sessions,
+    'erasure': admin_erasure
+}
 
 # Main app flow
 def main():
+    sessions.touch()
+    # Internal admin pages are reached with ?page=<name>
+    admin_page = ADMIN_PAGES.get(st.query_params.get('page'))
+    if admin_page is not None:
+        if require_admin():
+            admin_page()
+        return
+    
+    # Results opened from a shared link (?r=<token>)
+    shared_token = st.query_params.get('r')
+    if shared_token:
+        shared_results_page(shared_token)
+        return
+    
     # Initialize session state
     if 'show_results' not in st.session_state:
         st.session_state.show_results = False
@@ -1309,10 +775,18 @@ def main():
             st.rerun()
         
         # Process and display results
-        features = process_questionnaire_data(st.session_state.questionnaire_data)
-        risk_scores = calculate_risk_scores(features)
-        recommendations = generate_recommendations(risk_scores, features)
-        display_results(risk_scores, recommendations, features)
+        # Score with the model version recorded at submit, even if a newer one went live since
+        model = session_model()
+        questionnaire_data = sessions.unpack_results(st.session_state.results)
+        features = process_questionnaire_data(questionnaire_data)
+        risk_scores = calculate_risk_scores(features, model)
+        recommendations = generate_recommendations(risk_scores, features, st.session_state.lang, model)
+        links = current_tenant()['whatsapp_links']
+        display_results(risk_scores, recommendations, features, links)
+        report_panel(questionnaire_data, risk_scores, recommendations, model.version, links)
+        history_panel(questionnaire_data['personal']['phone'], questionnaire_data['personal']['name'])
+        what_if_panel(questionnaire_data, features, risk_scores)
+        share_panel(features, model.version)
     
     else:
         # Show questionnaire form
@@ -1342,151 +816,52 @@ def main():
                 # st.session_state.questionnaire_data = questionnaire_data
                 # st.session_state.show_results = True
 
-                error_messages = []
-                if not personal_data['name']:
-                    error_messages.append(T['name'])
-                # For number inputs, a value <= 0 is considered empty as we removed default values.
-                if personal_data['age'] <= 0:
-                    error_messages.append(T['age'])
-                if personal_data['waist_circumference'] <= 0:
-                    error_messages.append(T['waist'])
-                if personal_data['height'] <= 0:
-                    error_messages.append(T['height'])
-                if personal_data['weight'] <= 0:
-                    error_messages.append(T['weight'])
-
-                if error_messages:
+                # Validate all sections against the shared questionnaire schema (models.py)
+                try:
+                    questionnaire = Questionnaire.model_validate({
+                        'personal': personal_data,
+                        'activity': activity_data,
+                        'lifestyle': lifestyle_data,
+                        'health': health_data,
+                        'genetic': genetic_data,
+                        'timestamp': datetime.now().isoformat()  # Add timestamp for uniqueness
+                    })
+                except ValidationError as e:
                     # Display a single error message with all missing fields.
-                    # A new translation key 'mandatory_fields_error' was added to the LANG dictionary.
+                    # For number inputs, a value <= 0 is considered empty as we removed default values.
+                    error_messages = []
+                    for err in e.errors():
+                        label = T.get(FORM_FIELD_LABEL_KEYS.get(err['loc'][-1]), format_error(err))
+                        if label not in error_messages:
+                            error_messages.append(label)
                     error_str = T['mandatory_fields_error'].format(fields=', '.join(error_messages))
                     st.error(error_str)
                     return
-                else:
-                    # If validation passes, proceed with data processing and storage.
-                    # Store the collected data
-                    questionnaire_data = {
-                    'personal': personal_data,
-                    'activity': activity_data,
-                    'lifestyle': lifestyle_data,
-                    'health': health_data,
-                    'genetic': genetic_data,
-                    'timestamp': datetime.now().isoformat()  # Add timestamp for uniqueness
-                    }
-                    st.session_state.questionnaire_data = questionnaire_data
-                    st.session_state.show_results = True
+                
+                # Throttle looping browsers and bots before anything reaches the sinks
+                if not ratelimit.allow_submission(*client_identity()):
+                    st.error(T['rate_limited_error'])
+                    return
+                
+                # If validation passes, proceed with data processing and storage.
+                questionnaire_data = questionnaire.model_dump()
+                model = REGISTRY.active()
+                st.session_state.results = sessions.pack_results(questionnaire_data)  # compact; see sessions.py
+                st.session_state.model_version = model.version
+                st.session_state.show_results = True
                 
                 # New: Save to local files
                 try:
-                    # Create submissions directory if it doesn't exist
-                    os.makedirs('submissions', exist_ok=True)
-                    
                     # Compute features and risk scores (moved here for CSV inclusion)
                     features = process_questionnaire_data(questionnaire_data)
-                    risk_scores = calculate_risk_scores(features)
+                    risk_scores = calculate_risk_scores(features, model)
                     
                     # Flatten all data for CSV
-                    flat_data = {
-                        'timestamp': questionnaire_data['timestamp'],
-                        # Personal section
-                        'name': questionnaire_data['personal']['name'],
-                        'phone': questionnaire_data['personal']['phone'],
-                        'age': questionnaire_data['personal']['age'],
-                        'sex': questionnaire_data['personal']['sex'],
-                        'height': questionnaire_data['personal']['height'],
-                        'weight': questionnaire_data['personal']['weight'],
-                        'occupation': questionnaire_data['personal']['occupation'],
-                        'activity_level': questionnaire_data['personal']['activity_level'],
-                        'waist_circumference': questionnaire_data['personal']['waist_circumference'],
-                        # Activity section
-                        'exercise_frequency': questionnaire_data['activity']['exercise_frequency'],
-                        'duration': questionnaire_data['activity']['duration'],
-                        'intensity': questionnaire_data['activity']['intensity'],
-                        # Lifestyle section
-                        'sleep_hours': questionnaire_data['lifestyle']['sleep_hours'],
-                        'stress_level': questionnaire_data['lifestyle']['stress_level'],
-                        'smoking': questionnaire_data['lifestyle']['smoking'],
-                        'alcohol': questionnaire_data['lifestyle']['alcohol'],
-                        'total_cholesterol': questionnaire_data['lifestyle']['total_cholesterol'],
-                        'blood_pressure_medication': questionnaire_data['lifestyle']['blood_pressure_medication'],
-                        # 'hba1c': questionnaire_data['lifestyle']['hba1c'],  # Removed from backend calculations
-                        'fasting_glucose': questionnaire_data['lifestyle']['fasting_glucose'],
-                        'frequent_hunger': questionnaire_data['lifestyle']['frequent_hunger'],
-                        'frequent_thirst': questionnaire_data['lifestyle']['frequent_thirst'],
-                        'frequent_urination': questionnaire_data['lifestyle']['frequent_urination'],
-                        # Health section
-                        'conditions': ','.join(questionnaire_data['health']['conditions']),  # Join list as comma-separated string
-                        'medications': questionnaire_data['health']['medications'],
-                        'diabetes_history': questionnaire_data['health']['diabetes_history'],
-                        'cancer_history': questionnaire_data['health']['cancer_history'],
-                        'cvd_history': questionnaire_data['health']['cvd_history'],
-                        'cvd_history': questionnaire_data['health']['cvd_history'],
-                        # Symptoms (flattened from dict)
-                        'symptom_fatigue': questionnaire_data['health']['symptoms']['fatigue'],
-                        'symptom_joint_pain': questionnaire_data['health']['symptoms']['joint_pain'],
-                        'symptom_digestive': questionnaire_data['health']['symptoms']['digestive'],
-                        'symptom_skin_issues': questionnaire_data['health']['symptoms']['skin_issues'],
-                        'symptom_headaches': questionnaire_data['health']['symptoms']['headaches'],
-                        'symptom_mood': questionnaire_data['health']['symptoms']['mood'],
-                        'symptom_cognitive': questionnaire_data['health']['symptoms']['cognitive'],
-                        'symptom_sleep_issues': questionnaire_data['health']['symptoms']['sleep_issues'],
-                        # Genetic section
-                        'had_testing': questionnaire_data['genetic']['had_testing'],
-                        'findings': questionnaire_data['genetic']['findings'],
-                        # Calculated BMI (optional, but included as per original)
-                        'bmi': questionnaire_data['personal']['weight'] / ((questionnaire_data['personal']['height']/100) ** 2) if questionnaire_data['personal']['height'] > 0 else 0,
-                        # New: Risk scores as percentages (N/A if not calculated, e.g., due to existing condition)
-                        'metabolic_risk': round(risk_scores.get('metabolic_lifestyle', 0) * 100, 1) if 'metabolic_lifestyle' in risk_scores else 'N/A',
-                        'cvd_risk': round(risk_scores.get('cvd_stroke', 0) * 100, 1) if 'cvd_stroke' in risk_scores else 'N/A',
-                        'diabetes_risk': round(risk_scores.get('diabetes', 0) * 100, 1) if 'diabetes' in risk_scores else 'N/A',
-                        'cancer_risk': round(risk_scores.get('cancer', 0) * 100, 1) if 'cancer' in risk_scores else 'N/A'
-                    }
-                    
-                     # Save to CSV (append mode) - unchanged
-                    csv_path = 'submissions/submissions.csv'
-                    file_exists = os.path.isfile(csv_path)
-                    with open(csv_path, 'a', newline='') as csvfile:
-                        writer = csv.DictWriter(csvfile, fieldnames=flat_data.keys())
-                        if not file_exists:
-                            writer.writeheader()  # Write header only once
-                        writer.writerow(flat_data)
-                    
-                    # Save to JSON (new file per submission)
-                    json_path = f'submissions/submission_{questionnaire_data["timestamp"].replace(":", "-")}.json'
-                    with open(json_path, 'w') as jsonfile:
-                        json.dump(questionnaire_data, jsonfile, indent=4)
-                    
-                     # --- NEW: Append data to Google Sheets ---
-                    print("DEBUG: Starting Google Sheets authentication...")
-                    
-                    scopes = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-                    
-                    # Check for local credentials file FIRST
-                    if os.path.exists('dnacare.json'):
-                        print("DEBUG: Using local file 'dnacare.json' for credentials.")
-                        creds = ServiceAccountCredentials.from_json_keyfile_name('dnacare.json', scopes)
-                    # If no local file, check for Streamlit secrets (for deployment)
-                    elif 'GOOGLE_CREDENTIALS' in st.secrets:
-                        print("DEBUG: Using Streamlit secrets for credentials.")
-                        #creds_dict = json.loads(st.secrets['GOOGLE_CREDENTIALS'])
-                        creds_dict = st.secrets['GOOGLE_CREDENTIALS']
-                        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scopes)
-                    # If neither is found, raise an error
-                    else:
-                        raise FileNotFoundError("Could not find 'dnacare.json' for local development or GOOGLE_CREDENTIALS secret for deployment.")
-
-                    client = gspread.authorize(creds)
-                    print("DEBUG: Authentication successful.")
-                    
-                    spreadsheet = client.open_by_key(GOOGLE_SHEET_ID)
-                    worksheet = spreadsheet.sheet1
-                    print(f"DEBUG: Opened worksheet '{worksheet.title}'.")
-                    
-                    if not worksheet.row_values(1):
-                        worksheet.append_row(list(flat_data.keys()))
-                        print("DEBUG: Added header row to empty sheet.")
+                    tenant = current_tenant()
+                    flat_data = flatten_submission(questionnaire_data, risk_scores, model.version, tenant['id'])
                     
-                    worksheet.append_row(list(flat_data.values()))
-                    print("DEBUG: Appended new row to Google Sheet.")
+                    # Save to local files, cohort statistics and Google Sheets
+                    sinks.store_submissions([(questionnaire_data, flat_data, risk_scores)], tenant)
                     
                     # On success, set state and rerun to show results
                     st.session_state.show_results = True
@@ -0,0 +1,204 @@
+"""Microbenchmarks of the scoring compute path and the storage sinks.
+
+Each case is timed over a fixed synthetic cohort (``synthetic.py``, fixed
+seed) and reported as nanoseconds per record (best of several rounds) and
+peak traced allocation per record (``tracemalloc``, one separate round).
+Storage sinks write to a throw-away ``SUBMISSIONS_DIR``, and Google Sheets
+is replaced by an in-process stand-in that only serializes the request.
+
+    python benchmark.py                  # run, compare with benchmark_baseline.json
+    python benchmark.py --save           # run and record the baseline
+    python benchmark.py --threshold 5    # fail on a >5% slowdown (default 10%)
+    python benchmark.py -k recommendations
+
+Exits with status 1 if any case is slower than its baseline by more than the
+threshold. Baselines are machine specific: record them on the machine (or CI
+runner class) that runs the comparison.
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Never touch the real archive: every sink writes below a scratch directory
+_SCRATCH_DIR = tempfile.mkdtemp(prefix='benchmark-')
+atexit.register(shutil.rmtree, _SCRATCH_DIR, True)  # registered first, so it runs after the sinks' own exit hooks
+os.environ['SUBMISSIONS_DIR'] = os.path.join(_SCRATCH_DIR, 'submissions')
+
+import aggregates  # noqa: E402  (after SUBMISSIONS_DIR is set)
+import history  # noqa: E402
+import percentiles  # noqa: E402
+import sheets  # noqa: E402
+import storage  # noqa: E402
+from model_registry import active_model  # noqa: E402
+from recommendations import generate_recommendations  # noqa: E402
+from records import featurize, unpack  # noqa: E402
+from scoring import (  # noqa: E402
+    process_questionnaire_data, calculate_framingham_risk_score, calculate_risk_scores,
+    calculate_framingham_risk_score_batch, calculate_risk_scores_batch, risk_scores_at
+)
+from synthetic import iter_questionnaires  # noqa: E402
+
+BASELINE_PATH = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 10.0  # percent
+SINGLE_RECORDS = 2000
+BATCH_RECORDS = 20000
+SINK_RECORDS = 500
+ROUNDS = 7
+MIN_ROUND_NS = 100_000_000
+SEED = 40
+
+
+class LocalWorksheet:
+    """Stand-in for a gspread worksheet: serializes each request like the API client, sends nothing"""
+
+    def __init__(self):
+        self.rows = 0
+
+    def row_values(self, row):
+        return ['timestamp'] if self.rows else []
+
+    def append_rows(self, values):
+        json.dumps({'values': values})
+        self.rows += len(values)
+
+
+def _cohort(n):
+    return [q for chunk in iter_questionnaires(n, SEED) for q in chunk]
+
+
+def build_cases():
+    """name -> (run, reset, records per run); ``reset`` (untimed, may be None) runs before each round"""
+    model = active_model()
+    single = _cohort(SINGLE_RECORDS)
+    single_features = [process_questionnaire_data(q) for q in single]
+    single_scores = [calculate_risk_scores(f, model) for f in single_features]
+    batch = _cohort(BATCH_RECORDS)
+    batch_records = featurize(batch, len(batch))
+    batch_scores = calculate_risk_scores_batch(batch_records, model)
+    batch_features = [unpack(record) for record in batch_records]
+    version = model.version
+    sink = [(q, storage.flatten_submission(q, s, version), s) for q, s in zip(single[:SINK_RECORDS], single_scores)]
+    worksheet = LocalWorksheet()
+    sheets.get_worksheet = lambda *args: worksheet
+    store = percentiles.PercentileStore(percentiles.PERCENTILES_PATH)
+
+    def recommend_batch():
+        for i, features in enumerate(batch_features):
+            generate_recommendations(risk_scores_at(batch_scores, i), features, 'en', model)
+
+    def reset_sinks():
+        shutil.rmtree(storage.SUBMISSIONS_DIR, ignore_errors=True)
+        os.makedirs(storage.SUBMISSIONS_DIR)
+
+    return {
+        'process_questionnaire_data': (lambda: [process_questionnaire_data(q) for q in single], None, len(single)),
+        'framingham': (lambda: [calculate_framingham_risk_score(f, model) for f in single_features], None, len(single)),
+        'calculate_risk_scores': (lambda: [calculate_risk_scores(f, model) for f in single_features], None, len(single)),
+        'generate_recommendations': (
+            lambda: [generate_recommendations(s, f, 'en', model) for s, f in zip(single_scores, single_features)],
+            None, len(single)),
+        'flatten_submission': (
+            lambda: [storage.flatten_submission(q, s, version) for q, s in zip(single, single_scores)],
+            None, len(single)),
+        'batch/featurize': (lambda: featurize(batch, len(batch)), None, len(batch)),
+        'batch/framingham': (lambda: calculate_framingham_risk_score_batch(batch_records, model), None, len(batch)),
+        'batch/calculate_risk_scores': (lambda: calculate_risk_scores_batch(batch_records, model), None, len(batch)),
+        'batch/generate_recommendations': (recommend_batch, None, len(batch)),
+        'sink/csv_json': (lambda: storage.save_submissions([(q, flat) for q, flat, _ in sink]), reset_sinks, len(sink)),
+        'sink/aggregates': (
+            lambda: aggregates.record_submissions([
+                (q['timestamp'], q['personal']['age'], q['personal']['sex'], s) for q, _, s in sink
+            ], aggregates.AGGREGATES_PATH),
+            reset_sinks, len(sink)),
+        'sink/percentiles': (lambda: [store.record(q['personal']['age'], s) for q, _, s in sink], reset_sinks, len(sink)),
+        'sink/history': (
+            lambda: history.record_submissions([
+                (q['personal']['phone'], q['personal']['name'], storage.submission_id(q), q['timestamp'], s, version) for q, _, s in sink
+            ]),
+            reset_sinks, len(sink)),
+        'sink/sheets': (lambda: sheets.append_rows('benchmark', [flat for _, flat, _ in sink]), None, len(sink)),
+    }
+
+
+def measure(run, reset, records, rounds=ROUNDS):
+    """``(ns/record, peak traced bytes/record)``: best of ``rounds`` timed runs, then one traced run"""
+    if reset:
+        reset()
+    started = time.perf_counter_ns()
+    run()  # warm-up: caches, catalogs, lazily opened files
+    # Cases without state to reset repeat within a round until it lasts MIN_ROUND_NS
+    loops = 1 if reset else max(1, -(-MIN_ROUND_NS // (time.perf_counter_ns() - started)))
+    best = float('inf')
+    for _ in range(rounds):
+        if reset:
+            reset()
+        started = time.perf_counter_ns()
+        for _ in range(loops):
+            run()
+        best = min(best, (time.perf_counter_ns() - started) / loops)
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best / records, peak / records
+
+
+def compare(results, baseline, threshold):
+    """Names of the cases more than ``threshold`` percent slower than the baseline"""
+    return [
+        name for name, result in results.items()
+        if name in baseline and result['ns_per_record'] > baseline[name]['ns_per_record'] * (1 + threshold / 100)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring and storage per record")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed slowdown in percent (default {DEFAULT_THRESHOLD:g})")
+    parser.add_argument('-k', dest='pattern', default='', help="only run cases whose name contains this")
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['cases']
+
+    results = {}
+    for name, (run, reset, records) in build_cases().items():
+        if args.pattern not in name:
+            continue
+        ns, peak = measure(run, reset, records, args.rounds)
+        results[name] = {'ns_per_record': round(ns, 1), 'peak_bytes_per_record': round(peak, 1)}
+        change = ''
+        if name in baseline:
+            change = f"{(ns / baseline[name]['ns_per_record'] - 1) * 100:+7.1f}%"
+        print(f"{name:32} {ns:12,.0f} ns/record {peak:10,.0f} B/record {change}")
+
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'cases': results}, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Slower than the baseline by more than {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Build the static, in-browser version of the calculator.
+
+``calculator/calculator.js`` reimplements the questionnaire, scoring and
+recommendation rules in JavaScript; this script exports everything it needs
+from the Python definitions (the active scoring model's parameters, the
+answer -> value tables of ``scoring.py``, ``recommendations.rule_table``,
+the clinics' contact links and the translation catalogs) and writes one
+self-contained page:
+
+    build/calculator/index.html   the page, data and script inlined
+    build/calculator/assets/      product images
+
+The page can be served from any static host or CDN; respondents get their
+scores with no server round trip, and only the final submission is posted
+(to ``POST /v1/submit`` of the scoring API, which validates and re-scores it
+with its own active model). Rebuild after changing the active scoring model,
+the catalogs or ``tenants.json``.
+
+``--check`` runs the JavaScript under node on synthetic respondents (plus
+boundary ages and BMIs) and compares its scores and recommendations with
+the Python implementation; it exits non-zero on any mismatch.
+
+    python build_static.py [-o build/calculator] [--check] [-n 5000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import i18n
+import recommendations
+import scoring
+import synthetic
+import tenants
+from model_registry import active_model
+from options import DISPLAYED_VALUE_LANGUAGES
+from recommendations import generate_recommendations
+from scoring import process_questionnaire_data, calculate_risk_scores
+
+SOURCE_DIR = 'calculator'
+OUTPUT_DIR = os.getenv('CALCULATOR_BUILD_DIR', 'build/calculator')
+# Relative to the page (/calculator/); absolute URLs when the page is hosted elsewhere
+SUBMIT_URL = os.getenv('CALCULATOR_SUBMIT_URL', '../v1/submit')
+APP_URL = os.getenv('CALCULATOR_APP_URL', '../')
+SCORE_TOLERANCE = 1e-12  # Math.exp and libm's exp may differ in the last bit
+
+# Checked on top of the synthetic respondents: ages on every bracket edge, BMIs on the flag threshold
+EDGE_AGES = (1, 20, 29, 30, 34, 35, 39, 40, 41, 44, 45, 49, 50, 54, 55, 59, 60, 64, 65, 69, 70, 74, 75, 79, 80, 120)
+EDGE_BODIES = ((100, 200), (64, 160), (81, 180))  # (weight, height): BMI exactly 25
+
+
+def export_data(model=None):
+    """Everything calculator.js reads from ``window.CALCULATOR``"""
+    model = model or active_model()
+    rules = recommendations.rule_table()
+    return {
+        'model': model.params,
+        'tables': {
+            'intensity_met': scoring.INTENSITY_MET,
+            'exercise_times_per_week': scoring.EXERCISE_TIMES_PER_WEEK,
+            'duration_hours': scoring.DURATION_HOURS,
+            'sleep_scores': scoring.SLEEP_SCORES,
+            'stress_scores': scoring.STRESS_SCORES,
+            'smoking_risk': scoring.SMOKING_RISK,
+            'cholesterol_mg_dl': scoring.CHOLESTEROL_MG_DL,
+            'bp_medication': scoring.BP_MEDICATION,
+            'fasting_glucose_mg_dl': scoring.FASTING_GLUCOSE_MG_DL,
+            'symptom_scores': scoring.SYMPTOM_SCORES,
+            'family_history_scores': scoring.FAMILY_HISTORY_SCORES,
+            'condition_weights': scoring.CONDITION_WEIGHTS,
+            'no_condition_score': scoring.NO_CONDITION_SCORE,
+            'male_values': scoring.MALE_VALUES,
+        },
+        'recommendations': {
+            'order': list(recommendations.RULES),
+            'table': {f'{risk_key}|{band}|{int(older)}|{flags}': rule
+                      for (risk_key, band, older, flags), rule in rules.items()},
+            'flag_rules': recommendations.FLAG_RULES,
+            'flag_masks': recommendations.FLAG_MASKS,
+            'high_risk_score': recommendations.HIGH_RISK_SCORE,
+            'older_age': recommendations.OLDER_AGE,
+        },
+        'products': recommendations.PRODUCTS,
+        'links': {tenant_id: tenants.get(tenant_id)['whatsapp_links'] for tenant_id in tenants.ids()},
+        'default_clinic': tenants.DEFAULT_TENANT,
+        'languages': i18n.languages(),
+        'default_lang': i18n.DEFAULT_LANG,
+        'displayed_value_languages': list(DISPLAYED_VALUE_LANGUAGES),
+        'catalogs': {lang: i18n.catalog(lang) for lang in i18n.languages()},
+        'submit_url': SUBMIT_URL,
+        'app_url': APP_URL,
+    }
+
+
+def build(output_dir=OUTPUT_DIR, model=None):
+    """Write the page and its assets to ``output_dir``; returns the page's path"""
+    with open(os.path.join(SOURCE_DIR, 'index.html'), encoding='utf-8') as f:
+        page = f.read()
+    with open(os.path.join(SOURCE_DIR, 'calculator.js'), encoding='utf-8') as f:
+        script = f.read()
+    data = json.dumps(export_data(model), ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    page = page.replace('/*CALCULATOR_DATA*/', data).replace('/*CALCULATOR_JS*/', script)
+
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.copytree('assets', os.path.join(output_dir, 'assets'), dirs_exist_ok=True)
+    path = os.path.join(output_dir, 'index.html')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(page)
+    os.replace(tmp_path, path)
+    print(f"DEBUG: Wrote {path} ({len(page.encode('utf-8')) / 1024:.0f} KB).")
+    return path
+
+
+# Scores and recommendations of every questionnaire on stdin, as JSON on stdout
+NODE_RUNNER = """
+const calc = require(process.argv[2]);
+const input = JSON.parse(require('fs').readFileSync(0, 'utf-8'));
+const data = input.data, model = calc.compileModel(data.model);
+const results = input.cases.map(([questionnaire, lang]) => {
+  const features = calc.processQuestionnaireData(questionnaire, data.tables);
+  const scores = calc.calculateRiskScores(features, model);
+  const recs = calc.generateRecommendations(scores, features, model, data.recommendations).map(rec => [
+    rec.risk_key, rec.items.map(i => data.catalogs[lang].recommendations[rec.group][i]),
+    data.products[rec.product].cta, data.catalogs[lang].products[rec.product]]);
+  return [scores, recs];
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def _check_cases(n, seed):
+    langs = list(i18n.languages())
+    cases = []
+    for chunk in synthetic.iter_questionnaires(n, seed):
+        for questionnaire in chunk:
+            i = len(cases)
+            if i % 4 == 1:
+                questionnaire['personal']['age'] = EDGE_AGES[i // 4 % len(EDGE_AGES)]
+            elif i % 8 == 2:
+                weight, height = EDGE_BODIES[i // 8 % len(EDGE_BODIES)]
+                questionnaire['personal']['weight'], questionnaire['personal']['height'] = weight, height
+            cases.append((questionnaire, langs[i % len(langs)]))
+    return cases
+
+
+def check(n=5000, seed=0):
+    """Compare calculator.js with the Python scoring on ``n`` respondents; returns the number of mismatches"""
+    node = shutil.which('node')
+    if node is None:
+        raise SystemExit("node is required for --check")
+    model = active_model()
+    data = export_data(model)
+    cases = _check_cases(n, seed)
+    with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as f:
+        f.write(NODE_RUNNER)
+        runner = f.name
+    try:
+        output = subprocess.run([node, runner, os.path.abspath(os.path.join(SOURCE_DIR, 'calculator.js'))],
+                                input=json.dumps({'data': data, 'cases': cases}), capture_output=True,
+                                text=True, check=True).stdout
+    finally:
+        os.remove(runner)
+
+    mismatches = 0
+    for (questionnaire, lang), (js_scores, js_recs) in zip(cases, json.loads(output)):
+        features = process_questionnaire_data(questionnaire)
+        scores = calculate_risk_scores(features, model)
+        recs = [[rec['risk_key'], list(rec['recommendations']), rec['product']['cta'], rec['product']['caption']]
+                for rec in generate_recommendations(scores, features, lang, model)]
+        same_scores = scores.keys() == js_scores.keys() and all(
+            abs(scores[key] - js_scores[key]) <= SCORE_TOLERANCE for key in scores)
+        if not same_scores or recs != js_recs:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"Mismatch ({lang}): {json.dumps(questionnaire)}\n  python: {scores} {recs}\n"
+                      f"  js:     {js_scores} {js_recs}")
+    print(f"Checked {len(cases)} respondent(s) against model {model.version}: {mismatches} mismatch(es).")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static in-browser calculator")
+    parser.add_argument('-o', '--output', default=OUTPUT_DIR, help="output directory (default: %(default)s)")
+    parser.add_argument('--check', action='store_true', help="compare the JavaScript scoring with Python (needs node)")
+    parser.add_argument('-n', type=int, default=5000, help="respondents compared by --check")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    build(args.output)
+    if args.check and check(args.n, args.seed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+/*
+ * Static risk calculator: the questionnaire, scoring and recommendations of
+ * app.py running entirely in the browser. Every table, weight and text comes
+ * from window.CALCULATOR, which build_static.py exports from the Python
+ * definitions (scoring.py, recommendations.py, scoring_models/, locales/).
+ * Answers never leave the page until the respondent submits; the submission
+ * is re-validated and re-scored by the server (POST /v1/submit, api.py).
+ *
+ * The scoring half mirrors scoring.py / recommendations.py line by line and
+ * also loads under node: `python build_static.py --check` compares it with
+ * calculate_risk_scores on synthetic respondents.
+ */
+(function (root) {
+  'use strict';
+
+  // --- Scoring (scoring.py) ---
+
+  function compileModel(params) {
+    // Same derived values as model_registry.ScoringModel
+    var m = {
+      version: String(params.version),
+      scoreMin: params.score_bounds[0], scoreMax: params.score_bounds[1],
+      bmiMin: params.bmi_range[0], bmiSpan: params.bmi_range[1] - params.bmi_range[0],
+      metHoursCap: params.met_hours_cap,
+      metabolicWeights: params.metabolic.weights, metabolicMultiplier: params.metabolic.multiplier,
+      cvdFamilyHistoryWeight: params.cvd.family_history_weight, cvdMultiplier: params.cvd.multiplier,
+      framingham: params.cvd.framingham,
+      diabetesWeights: params.diabetes.weights, diabetesMultiplier: params.diabetes.multiplier,
+      defaultWaist: params.diabetes.default_waist,
+      waistMin: params.diabetes.waist_range[0], waistSpan: params.diabetes.waist_range[1] - params.diabetes.waist_range[0],
+      glucoseMin: params.diabetes.glucose_range[0], glucoseSpan: params.diabetes.glucose_range[1] - params.diabetes.glucose_range[0],
+      cancerWeights: params.cancer.weights, cancerMultiplier: params.cancer.multiplier,
+      cancerAgeMin: params.cancer.age_range[0], cancerAgeSpan: params.cancer.age_range[1] - params.cancer.age_range[0],
+      recommendationThresholds: params.recommendation_thresholds
+    };
+    return m;
+  }
+
+  function sum(values) {
+    var total = 0;
+    for (var i = 0; i < values.length; i++) total += values[i];
+    return total;
+  }
+
+  function processQuestionnaireData(data, tables) {
+    var personal = data.personal, activity = data.activity, lifestyle = data.lifestyle, health = data.health;
+    var symptom = tables.symptom_scores;
+    var conditions = health.conditions;
+    var symptomValues = Object.keys(health.symptoms).map(function (key) { return symptom[health.symptoms[key]]; });
+    var height = personal.height / 100;
+    return {
+      age: personal.age,
+      bmi: personal.weight / (height * height),  // as Python's ** 2 (a correctly rounded square)
+      gender_male: tables.male_values.indexOf(personal.sex) >= 0 ? 1 : 0,
+      waist_circumference: personal.waist_circumference,
+      met_hours: tables.intensity_met[activity.intensity] * tables.exercise_times_per_week[activity.exercise_frequency]
+        * tables.duration_hours[activity.duration],
+      sleep_score: tables.sleep_scores[lifestyle.sleep_hours],
+      stress_score: tables.stress_scores[lifestyle.stress_level],
+      smoking_risk: tables.smoking_risk[lifestyle.smoking],
+      alcohol_risk: lifestyle.alcohol === 'Yes' ? 1 : 0,
+      total_cholesterol: tables.cholesterol_mg_dl[lifestyle.total_cholesterol],
+      bp_medication: tables.bp_medication[lifestyle.blood_pressure_medication],
+      fasting_glucose: tables.fasting_glucose_mg_dl[lifestyle.fasting_glucose],
+      diabetes_symptoms: (symptom[lifestyle.frequent_hunger] + symptom[lifestyle.frequent_thirst]
+        + symptom[lifestyle.frequent_urination]) / 3,
+      health_condition_score: conditions.indexOf('None') >= 0 ? tables.no_condition_score
+        : Math.min(sum(conditions.filter(function (c) { return c !== 'None'; })
+          .map(function (c) { return tables.condition_weights[c]; })) / 3, 1.0),
+      symptom_severity: sum(symptomValues) / symptomValues.length,
+      diabetes_family_history: tables.family_history_scores[health.diabetes_history],
+      cancer_family_history: tables.family_history_scores[health.cancer_history],
+      cvd_family_history: tables.family_history_scores[health.cvd_history],
+      has_diabetes: conditions.indexOf('Diabetes') >= 0,
+      has_cvd: conditions.indexOf('Cardiovascular disease') >= 0,
+      has_cancer: conditions.indexOf('Cancer') >= 0
+    };
+  }
+
+  function bisectLeft(a, x, lo) {
+    var hi = a.length;
+    while (lo < hi) {
+      var mid = (lo + hi) >> 1;
+      if (a[mid] < x) lo = mid + 1; else hi = mid;
+    }
+    return lo;
+  }
+
+  function bisectRight(a, x) {
+    var lo = 0, hi = a.length;
+    while (lo < hi) {
+      var mid = (lo + hi) >> 1;
+      if (x < a[mid]) hi = mid; else lo = mid + 1;
+    }
+    return lo;
+  }
+
+  function clip(value, low, high) {
+    return Math.max(low, Math.min(high, value));
+  }
+
+  function framinghamRiskScore(f, m) {
+    var fr = m.framingham;
+    var age = f.age;
+    var diabetes = f.fasting_glucose >= fr.diabetes_glucose || f.has_diabetes;
+    var ageBin = age < fr.age_edges[0] ? 0 : bisectLeft(fr.age_edges, age, 1);
+    var points = (f.gender_male ? fr.age_points_male : fr.age_points_female)[ageBin];
+    var cholPoints = fr.chol_points[bisectRight(fr.chol_edges, f.total_cholesterol)];
+    if (age >= fr.older_age) cholPoints += fr.older_chol_adjustment;
+    points += cholPoints;
+    if (f.bp_medication > 0) points += fr.bp_medication_points;
+    if (f.smoking_risk > 0.5) points += fr.smoking_points;
+    if (diabetes) points += fr.diabetes_points;
+    var risk = 1 - Math.exp(-fr.rate * (points + fr.points_offset));
+    return clip(risk, m.scoreMin, m.scoreMax);
+  }
+
+  function calculateRiskScores(f, m) {
+    var low = m.scoreMin, high = m.scoreMax, w;
+    var scores = {};
+    var bmiTerm = Math.max(0, (f.bmi - m.bmiMin) / m.bmiSpan);
+    var inactivity = 1 - Math.min(f.met_hours / m.metHoursCap, 1);
+
+    w = m.metabolicWeights;
+    var metabolic = w.bmi * bmiTerm + w.inactivity * inactivity + w.stress * f.stress_score
+      + w.smoking * f.smoking_risk + w.alcohol * f.alcohol_risk + w.poor_sleep * (1 - f.sleep_score);
+    scores.metabolic_lifestyle = clip(Math.min(metabolic * m.metabolicMultiplier, 1.0), low, high);
+
+    if (!f.has_cvd) {
+      var cvd = framinghamRiskScore(f, m) + f.cvd_family_history * m.cvdFamilyHistoryWeight;
+      scores.cvd_stroke = clip(Math.min(cvd * m.cvdMultiplier, 1.0), low, high);
+    }
+    if (!f.has_diabetes) {
+      var waist = f.waist_circumference > 0 ? f.waist_circumference : m.defaultWaist;
+      w = m.diabetesWeights;
+      var diabetes = w.bmi * bmiTerm + w.waist * Math.max(0, (waist - m.waistMin) / m.waistSpan)
+        + w.glucose * Math.min(Math.max((f.fasting_glucose - m.glucoseMin) / m.glucoseSpan, 0), 1)
+        + w.inactivity * inactivity + w.family_history * f.diabetes_family_history + w.symptoms * f.diabetes_symptoms;
+      scores.diabetes = clip(Math.min(diabetes * m.diabetesMultiplier, 1.0), low, high);
+    }
+    if (!f.has_cancer) {
+      w = m.cancerWeights;
+      var cancer = w.age * (f.age - m.cancerAgeMin) / m.cancerAgeSpan + w.smoking * f.smoking_risk
+        + w.alcohol * f.alcohol_risk + w.bmi * bmiTerm + w.family_history * f.cancer_family_history;
+      scores.cancer = clip(Math.min(cancer * m.cancerMultiplier, 1.0), low, high);
+    }
+    return scores;
+  }
+
+  // --- Recommendations (recommendations.py) ---
+
+  function featureFlags(f, rules) {
+    var flags = 0;
+    rules.flag_rules.forEach(function (rule) {
+      if (f[rule[1]] > rule[2]) flags |= rule[0];
+    });
+    return flags;
+  }
+
+  function generateRecommendations(scores, f, m, rules) {
+    var flags = featureFlags(f, rules);
+    var older = f.age > rules.older_age;
+    var result = [];
+    rules.order.forEach(function (riskKey) {
+      var score = scores[riskKey];
+      if (score === undefined || score < m.recommendationThresholds[riskKey]) return;
+      var band = score > rules.high_risk_score ? 'high' : 'elevated';
+      var rule = rules.table[[riskKey, band, older ? 1 : 0, flags & rules.flag_masks[riskKey]].join('|')];
+      result.push({risk_key: riskKey, group: rule.group, items: rule.items, product: rule.product});
+    });
+    return result;
+  }
+
+  var api = {
+    compileModel: compileModel,
+    processQuestionnaireData: processQuestionnaireData,
+    calculateRiskScores: calculateRiskScores,
+    generateRecommendations: generateRecommendations
+  };
+  if (typeof module !== 'undefined' && module.exports) {
+    module.exports = api;
+    return;
+  }
+  root.Calculator = api;
+
+  // --- Page (app.py) ---
+
+  var D = root.CALCULATOR;
+  var model = compileModel(D.model);
+  var params = new URLSearchParams(root.location.search);
+  var clinic = params.get('clinic') || '';
+  var links = D.links[clinic] || D.links[D.default_clinic];
+  var lang = D.languages[params.get('lang')] ? params.get('lang') : D.default_lang;
+  var answers = {};  // field -> internal value (option key, index or text), kept across language switches
+  var CATEGORIES = [
+    ['metabolic_lifestyle', 'category_metabolic'], ['cvd_stroke', 'category_cvd'],
+    ['diabetes', 'category_diabetes'], ['cancer', 'category_cancer']
+  ];
+
+  function T(key) { return D.catalogs[lang].ui[key]; }
+  function options(name) { return D.catalogs[lang].options[name]; }
+  function help(name) { return name ? D.catalogs[lang].help[name] || '' : ''; }
+
+  function el(tag, attrs, children) {
+    var node = document.createElement(tag);
+    Object.keys(attrs || {}).forEach(function (key) {
+      if (key === 'text') node.textContent = attrs[key];
+      else if (key === 'className') node.className = attrs[key];
+      else node.setAttribute(key, attrs[key]);
+    });
+    (children || []).forEach(function (child) { if (child) node.appendChild(child); });
+    return node;
+  }
+
+  function labelled(text, input, helpText) {
+    var label = el('label', {title: helpText || ''}, [el('span', {text: text + (helpText ? ' ⓘ' : '')}), input]);
+    return label;
+  }
+
+  function textField(field, labelKey, multiline) {
+    var input = el(multiline ? 'textarea' : 'input', multiline ? {rows: 4} : {type: 'text'});
+    input.value = answers[field] || '';
+    input.addEventListener('input', function () { answers[field] = input.value; });
+    return labelled(T(labelKey), input);
+  }
+
+  function numberField(field, labelKey, max) {
+    var input = el('input', {type: 'number', min: 0, max: max, step: 1});
+    input.value = answers[field] || '';
+    input.addEventListener('input', function () { answers[field] = input.value; update(); });
+    return labelled(T(labelKey), input);
+  }
+
+  function selectField(field, labelKey, optionsName, helpName, onChange) {
+    var map = options(optionsName);
+    var keys = Object.keys(map);
+    if (!(field in answers)) answers[field] = keys[0];
+    var select = el('select', {}, keys.map(function (key) { return el('option', {value: key, text: map[key]}); }));
+    select.value = answers[field];
+    select.addEventListener('change', function () { answers[field] = select.value; update(); if (onChange) onChange(); });
+    return labelled(T(labelKey), select, help(helpName));
+  }
+
+  function plainSelectField(field, labelKey, optionsKey) {
+    // Options stored as displayed (sex, activity level); the answer is their index
+    if (!(field in answers)) answers[field] = 0;
+    var select = el('select', {}, T(optionsKey).map(function (text, i) { return el('option', {value: i, text: text}); }));
+    select.value = answers[field];
+    select.addEventListener('change', function () { answers[field] = Number(select.value); update(); });
+    return labelled(T(labelKey), select);
+  }
+
+  function radioField(field, labelKey) {
+    var map = options('symptom_scale');
+    if (!(field in answers)) answers[field] = Object.keys(map)[0];
+    var group = el('div', {className: 'radios'}, Object.keys(map).map(function (key) {
+      var input = el('input', {type: 'radio', name: field, value: key});
+      input.checked = answers[field] === key;
+      input.addEventListener('change', function () { answers[field] = key; update(); });
+      return el('label', {}, [input, el('span', {text: map[key]})]);
+    }));
+    return el('fieldset', {}, [el('legend', {text: T(labelKey)}), group]);
+  }
+
+  function conditionsField() {
+    var map = options('health_conditions_map');
+    if (!answers.conditions) answers.conditions = ['None'];
+    var boxes = el('div', {className: 'checks'});
+    Object.keys(map).forEach(function (key) {
+      var input = el('input', {type: 'checkbox', value: key});
+      input.checked = answers.conditions.indexOf(key) >= 0;
+      input.addEventListener('change', function () {
+        var selected = answers.conditions.filter(function (c) { return c !== key; });
+        if (input.checked) selected.push(key);
+        if (selected.length > 1 && selected.indexOf('None') >= 0) selected = selected.filter(function (c) { return c !== 'None'; });
+        answers.conditions = selected.length ? selected : ['None'];
+        renderForm();
+      });
+      boxes.appendChild(el('label', {}, [input, el('span', {text: map[key]})]));
+    });
+    return el('fieldset', {}, [el('legend', {text: T('conditions_label')}), boxes]);
+  }
+
+  function section(titleKey, children) {
+    return el('section', {}, [el('h2', {text: T(titleKey)})].concat(children));
+  }
+
+  function columns(children) {
+    return el('div', {className: 'columns'}, children);
+  }
+
+  function renderForm() {
+    var form = document.getElementById('form');
+    form.textContent = '';
+    form.appendChild(section('personal_info', [columns([
+      textField('name', 'name'), plainSelectField('sex', 'sex', 'sex_options'), numberField('age', 'age', 120),
+      textField('phone', 'phone'), numberField('waist_circumference', 'waist', 200),
+      numberField('height', 'height', 300), numberField('weight', 'weight', 500), textField('occupation', 'occupation'),
+      plainSelectField('activity_level', 'activity_level', 'activity_options')
+    ])]));
+    form.appendChild(section('exercise_header', [columns([
+      selectField('exercise_frequency', 'exercise_freq', 'exercise_freq_map', 'exercise_freq_help'),
+      selectField('duration', 'exercise_duration', 'duration_map', 'duration_map_help'),
+      selectField('intensity', 'exercise_intensity', 'intensity_map', 'intensity_map_help')
+    ])]));
+    form.appendChild(section('lifestyle_header', [columns([
+      selectField('sleep_hours', 'sleep_hours', 'sleep_map', 'sleep_map_help'),
+      selectField('stress_level', 'stress_level', 'stress_map', 'stress_map_help'),
+      selectField('total_cholesterol', 'cholesterol_level', 'cholesterol_map', 'cholesterol_map_help'),
+      selectField('blood_pressure_medication', 'bp_meds', 'bp_map', 'bp_map_help'),
+      selectField('smoking', 'smoking_status', 'smoking_map', 'smoking_map_help'),
+      selectField('alcohol', 'alcohol_use', 'alcohol_map', 'alcohol_map_help'),
+      selectField('hba1c', 'hba1c_label', 'hba1c_map', 'hba1c_map_help'),
+      selectField('fasting_glucose', 'fasting_glucose', 'glucose_map', 'glucose_map_help')
+    ]), el('h3', {text: T('symptoms_header')}), columns([
+      radioField('frequent_hunger', 'frequent_hunger'), radioField('frequent_thirst', 'frequent_thirst'),
+      radioField('frequent_urination', 'frequent_urination')
+    ])]));
+    form.appendChild(section('health_header', [
+      conditionsField(), textField('medications', 'medications_label'),
+      el('h3', {text: T('family_history')}), columns([
+        selectField('diabetes_history', 'diabetes_history', 'family_history_map'),
+        selectField('cancer_history', 'cancer_history', 'family_history_map'),
+        selectField('cvd_history', 'cvd_history', 'family_history_map')
+      ]),
+      el('h3', {text: T('wellfit_header')}), columns([
+        radioField('fatigue', 'symptom_fatigue'), radioField('joint_pain', 'symptom_joint_pain'),
+        radioField('digestive', 'symptom_digestive'), radioField('skin_issues', 'symptom_skin_issues'),
+        radioField('headaches', 'symptom_headaches'), radioField('mood', 'symptom_mood'),
+        radioField('cognitive', 'symptom_cognitive'), radioField('sleep_issues', 'symptom_sleep')
+      ])
+    ]));
+    form.appendChild(section('genetic_header', [
+      selectField('had_testing', 'had_testing', 'genetic_test_map', null, renderForm),
+      answers.had_testing === 'Yes' ? textField('findings', 'findings', true) : null
+    ]));
+    update();
+  }
+
+  function storedChoice(optionsKey, index) {
+    // As app.stored_choice: the displayed label in en/id, the English one otherwise
+    var source = D.displayed_value_languages.indexOf(lang) >= 0 ? lang : 'en';
+    return D.catalogs[source].ui[optionsKey][index];
+  }
+
+  function number(field) {
+    var value = Number(answers[field]);
+    return answers[field] === '' || answers[field] === undefined || isNaN(value) ? 0 : value;
+  }
+
+  function questionnaire() {
+    var a = answers;
+    return {
+      personal: {
+        name: (a.name || '').trim(), phone: a.phone || '', age: number('age'), sex: storedChoice('sex_options', a.sex),
+        height: number('height'), weight: number('weight'), occupation: a.occupation || '',
+        activity_level: storedChoice('activity_options', a.activity_level), waist_circumference: number('waist_circumference')
+      },
+      activity: {exercise_frequency: a.exercise_frequency, duration: a.duration, intensity: a.intensity},
+      lifestyle: {
+        sleep_hours: a.sleep_hours, stress_level: a.stress_level, smoking: a.smoking, alcohol: a.alcohol,
+        total_cholesterol: a.total_cholesterol, blood_pressure_medication: a.blood_pressure_medication,
+        hba1c: a.hba1c, fasting_glucose: a.fasting_glucose, frequent_hunger: a.frequent_hunger,
+        frequent_thirst: a.frequent_thirst, frequent_urination: a.frequent_urination
+      },
+      health: {
+        conditions: a.conditions, medications: a.medications || '', diabetes_history: a.diabetes_history,
+        cancer_history: a.cancer_history, cvd_history: a.cvd_history,
+        symptoms: {
+          fatigue: a.fatigue, joint_pain: a.joint_pain, digestive: a.digestive, skin_issues: a.skin_issues,
+          headaches: a.headaches, mood: a.mood, cognitive: a.cognitive, sleep_issues: a.sleep_issues
+        }
+      },
+      genetic: {had_testing: a.had_testing, findings: a.had_testing === 'Yes' ? a.findings || '' : ''}
+    };
+  }
+
+  function missingFields(data, requireName) {
+    // Same mandatory fields (and labels) as the form's validation error in app.py
+    var missing = [];
+    if (requireName && !data.personal.name) missing.push(T('name'));
+    if (!(data.personal.age > 0 && data.personal.age <= 120)) missing.push(T('age'));
+    if (!(data.personal.waist_circumference > 0 && data.personal.waist_circumference <= 200)) missing.push(T('waist'));
+    if (!(data.personal.height > 0 && data.personal.height <= 300)) missing.push(T('height'));
+    if (!(data.personal.weight > 0 && data.personal.weight <= 500)) missing.push(T('weight'));
+    return missing;
+  }
+
+  function band(value) {
+    if (value < 0.3) return ['low', T('risk_level_low')];
+    if (value < 0.5) return ['moderate', T('risk_level_moderate')];
+    return ['high', T('risk_level_high')];
+  }
+
+  function renderResults(scores, recommendations) {
+    var out = document.getElementById('results');
+    out.textContent = '';
+    out.appendChild(el('h2', {text: T('result_header')}));
+    out.appendChild(el('p', {text: T('result_subtext')}));
+    out.appendChild(el('div', {className: 'metrics'}, CATEGORIES.map(function (category) {
+      var value = scores[category[0]];
+      if (value === undefined) {
+        return el('div', {className: 'metric na'}, [el('span', {text: T(category[1])}), el('strong', {text: 'N/A'}),
+          el('em', {text: T('risk_na')})]);
+      }
+      var level = band(value);
+      return el('div', {className: 'metric ' + level[0]}, [el('span', {text: T(category[1])}),
+        el('strong', {text: (value * 100).toFixed(1) + '%'}), el('em', {text: level[1]})]);
+    })));
+    out.appendChild(el('h2', {text: T('recommendation_header')}));
+    var labels = {};
+    CATEGORIES.forEach(function (category) { labels[category[0]] = category[1]; });
+    if (recommendations.length) {
+      recommendations.forEach(function (rec) {
+        var texts = D.catalogs[lang].recommendations[rec.group];
+        var product = D.products[rec.product];
+        var image = el('img', {src: product.image, alt: ''});
+        image.onerror = function () { image.remove(); };
+        out.appendChild(el('div', {className: 'recommendation'}, [
+          el('div', {}, [el('h3', {text: '🎯 ' + T(labels[rec.risk_key])}), el('strong', {text: T('recommendations_label')}),
+            el('ol', {}, rec.items.map(function (i) { return el('li', {text: texts[i]}); }))]),
+          el('div', {className: 'product'}, [el('strong', {text: T('recommended_product')}), image,
+            el('p', {text: D.catalogs[lang].products[rec.product]}),
+            el('a', {className: 'button', href: links[product.cta], target: '_blank', rel: 'noopener', text: T('check_promo')})])
+        ]));
+      });
+    } else {
+      out.appendChild(el('p', {className: 'success', text: T('low_risk_success')}));
+      out.appendChild(el('strong', {text: T('general_maintenance')}));
+      out.appendChild(el('ol', {}, ['maintain_habits', 'regular_checkups', 'stay_active', 'monitor_changes']
+        .map(function (key) { return el('li', {text: T(key)}); })));
+    }
+    out.appendChild(el('h2', {text: T('take_action_header')}));
+    out.appendChild(el('div', {className: 'actions'}, [
+      el('a', {className: 'button', href: links.promo, target: '_blank', rel: 'noopener', text: T('promo_button')}),
+      el('a', {className: 'button', href: links.inquiry, target: '_blank', rel: 'noopener', text: T('inquiry_button')})
+    ]));
+  }
+
+  function update() {
+    var data = questionnaire();
+    var out = document.getElementById('results');
+    if (missingFields(data, false).length) {
+      out.textContent = '';
+      return;
+    }
+    var features = processQuestionnaireData(data, D.tables);
+    var scores = calculateRiskScores(features, model);
+    renderResults(scores, generateRecommendations(scores, features, model, D.recommendations));
+  }
+
+  function message(className, text, link) {
+    var box = document.getElementById('message');
+    box.className = className;
+    box.textContent = text;
+    if (link) {
+      box.appendChild(el('br'));
+      box.appendChild(el('a', {href: link.href, text: link.text}));
+    }
+  }
+
+  function submit() {
+    var data = questionnaire();
+    var missing = missingFields(data, true);
+    if (missing.length) {
+      message('error', T('mandatory_fields_error').replace('{fields}', missing.join(', ')));
+      return;
+    }
+    var button = document.getElementById('submit');
+    button.disabled = true;
+    var query = new URLSearchParams({lang: lang});
+    if (clinic) query.set('clinic', clinic);
+    fetch(D.submit_url + '?' + query, {
+      method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(data)
+    }).then(function (response) {
+      return response.json().then(function (body) { return [response.status, body]; });
+    }).then(function (result) {
+      var status = result[0], body = result[1];
+      if (status === 429) {
+        message('error', T('rate_limited_error'));
+      } else if (status !== 200) {
+        message('error', (body.errors || [body.error]).join('; '));
+      } else {
+        // The server re-scored with its active model; show its scores if that changed since the build
+        if (body.model_version !== model.version) {
+          var features = processQuestionnaireData(data, D.tables);
+          renderResults(body.risk_scores, generateRecommendations(body.risk_scores, features, model, D.recommendations));
+        }
+        var share = new URLSearchParams({r: body.share});
+        if (clinic) share.set('clinic', clinic);
+        message('success', T('success_msg'), {href: D.app_url + '?' + share, text: T('share_header')});
+      }
+    }).catch(function () {
+      message('error', T('report_failed'));
+    }).then(function () {
+      button.disabled = false;
+    });
+  }
+
+  function renderPage() {
+    document.documentElement.lang = lang;
+    document.title = T('title');
+    document.getElementById('title').textContent = T('title');
+    document.getElementById('subtitle').textContent = T('subtitle');
+    document.getElementById('submit').textContent = T('submit_button');
+    renderForm();
+  }
+
+  function init() {
+    var picker = document.getElementById('lang');
+    Object.keys(D.languages).forEach(function (code) {
+      picker.appendChild(el('option', {value: code, text: D.languages[code]}));
+    });
+    picker.value = lang;
+    picker.addEventListener('change', function () { lang = picker.value; renderPage(); });
+    document.getElementById('submit').addEventListener('click', submit);
+    renderPage();
+  }
+
+  document.addEventListener('DOMContentLoaded', init);
+})(this);
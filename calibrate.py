@@ -0,0 +1,331 @@
+"""Fit the scoring weights to outcome labels, out of core.
+
+Outcome labels (e.g. lab results) come as a CSV with the submission's
+``submission_id`` or ``timestamp`` (as in the archive, export and Google
+Sheet) and a 0/1 column per risk category that was confirmed either way;
+blank cells are unknown:
+
+    submission_id,metabolic_lifestyle,cvd_stroke,diabetes,cancer
+    3f2b9c0e8d7a4c51b6e2f0a9d8c7b6a5,,0,1,
+
+Bulk-intake rows stored before ``form_date`` existed share their paper form's
+date as timestamp; label those by ``submission_id``.
+
+The labels are loaded into a scratch SQLite file, then the archive
+(``submissions.csv`` and the files it was rotated into) is streamed in
+chunks of CHUNK_ROWS rows. Labeled rows are featurized in one batch per
+chunk and folded into the normal equations ``X'X`` and ``X'y`` of every
+category, so memory stays flat whatever the number of rows and one pass
+over the archive is enough.
+
+Each score is a clipped linear combination of its terms (``scoring.py``), so
+the fit is least squares on the same terms, without intercept: the result
+drops straight into the model file. The metabolic, diabetes and cancer
+weights are refit (their multipliers are kept); for CVD the Framingham
+estimate's multiplier and the family-history weight are. ``--ridge`` shrinks
+the fit towards the base model, for categories with few labels; categories
+with fewer than MIN_LABELS labels keep their base weights.
+
+The candidate is written to ``scoring_models/<version>.json``; ``--shadow``
+also makes it the registry's shadow model, so it is scored alongside the
+active one on live submissions (``shadow.py``) before anyone promotes it.
+
+    python calibrate.py outcomes.csv --version v2 [--base v1] [--ridge 10] [--shadow]
+"""
+import argparse
+import copy
+import csv
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from aggregates import RISK_CATEGORIES
+from model_registry import REGISTRY, MODELS_DIR, active_model
+from records import featurize
+from scoring import calculate_framingham_risk_score_batch
+from storage import CSV_PATH, archive_paths, is_tombstone, submission_id, unflatten_submission, write_json_atomic
+
+CHUNK_ROWS = 20000  # archive rows per featurized batch
+LOOKUP_ROWS = 500  # timestamps per label query (below SQLite's bound-parameter limit)
+MIN_LABELS = 50
+
+# Category -> terms of its score in scoring.calculate_risk_scores, in fit order
+TERMS = {
+    'metabolic_lifestyle': ['bmi', 'inactivity', 'stress', 'smoking', 'alcohol', 'poor_sleep'],
+    'cvd_stroke': ['framingham', 'family_history'],
+    'diabetes': ['bmi', 'waist', 'glucose', 'inactivity', 'family_history', 'symptoms'],
+    'cancer': ['age', 'smoking', 'alcohol', 'bmi', 'family_history'],
+}
+PARAMS_SECTION = {'metabolic_lifestyle': 'metabolic', 'cvd_stroke': 'cvd', 'diabetes': 'diabetes', 'cancer': 'cancer'}
+NUMERIC_FIELDS = {'age': int, 'height': float, 'weight': float, 'waist_circumference': float}
+
+
+class NormalEquations:
+    """Running ``X'X``, ``X'y`` and ``y'y`` of a least-squares fit"""
+
+    def __init__(self, k):
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+        self.y_sum = 0.0
+        self.n = 0
+
+    def add(self, x, y):
+        self.xtx += x.T @ x
+        self.xty += x.T @ y
+        self.yty += float(y @ y)
+        self.y_sum += float(y.sum())
+        self.n += len(y)
+
+    def solve(self, prior, ridge=0.0):
+        """Coefficients minimizing ``|y - Xb|^2 + ridge * |b - prior|^2``"""
+        k = len(prior)
+        return np.linalg.solve(self.xtx + ridge * np.eye(k), self.xty + ridge * np.asarray(prior))
+
+    def brier(self, b):
+        """Mean squared error of the linear score ``Xb`` (before clipping), rounded; None without labels"""
+        if not self.n:
+            return None
+        b = np.asarray(b)
+        return round(float((self.yty - 2 * b @ self.xty + b @ self.xtx @ b) / self.n), 6)
+
+
+def design(records, model):
+    """Per category: ``(X, applies)``, the terms of every record and the mask of records it is scored for"""
+    f = {name: records[name].astype(float) for name in records.dtype.names}
+    bmi = np.maximum(0, (f['bmi'] - model.bmi_min) / model.bmi_span)
+    inactivity = 1 - np.minimum(f['met_hours'] / model.met_hours_cap, 1)
+    waist = np.where(f['waist_circumference'] > 0, f['waist_circumference'], model.default_waist)
+    columns = {
+        'metabolic_lifestyle': [bmi, inactivity, f['stress_score'], f['smoking_risk'], f['alcohol_risk'],
+                                1 - f['sleep_score']],
+        'cvd_stroke': [calculate_framingham_risk_score_batch(f, model), f['cvd_family_history']],
+        'diabetes': [bmi, np.maximum(0, (waist - model.waist_min) / model.waist_span),
+                     np.clip((f['fasting_glucose'] - model.glucose_min) / model.glucose_span, 0, 1),
+                     inactivity, f['diabetes_family_history'], f['diabetes_symptoms']],
+        'cancer': [(f['age'] - model.cancer_age_min) / model.cancer_age_span, f['smoking_risk'],
+                   f['alcohol_risk'], bmi, f['cancer_family_history']],
+    }
+    applies = {
+        'metabolic_lifestyle': np.ones(len(records), dtype=bool),
+        'cvd_stroke': ~records['has_cvd'],
+        'diabetes': ~records['has_diabetes'],
+        'cancer': ~records['has_cancer'],
+    }
+    return {category: (np.column_stack(columns[category]), applies[category]) for category in RISK_CATEGORIES}
+
+
+def coefficients(params, category):
+    """The fitted parametrization of a category's weights: one coefficient per term"""
+    section = params[PARAMS_SECTION[category]]
+    multiplier = section['multiplier']
+    if category == 'cvd_stroke':
+        return [multiplier, multiplier * section['family_history_weight']]
+    return [multiplier * section['weights'][term] for term in TERMS[category]]
+
+
+def set_coefficients(params, category, b):
+    """Write fitted coefficients back into a model's parameters"""
+    section = params[PARAMS_SECTION[category]]
+    if category == 'cvd_stroke':
+        section['multiplier'] = round(float(b[0]), 6)
+        section['family_history_weight'] = round(float(b[1] / b[0]), 6) if b[0] else 0.0
+        return
+    if not section['multiplier']:
+        section['multiplier'] = 1.0  # a zero multiplier cannot carry the fitted weights
+    for key, value in zip(TERMS[category], b):
+        section['weights'][key] = round(float(value / section['multiplier']), 6)
+
+
+def load_labels(labels_path, conn):
+    """Copy an outcome CSV into the scratch database; returns the number of labeled submissions and the key column"""
+    conn.execute("CREATE TABLE labels (key TEXT PRIMARY KEY, "
+                 + ', '.join(f'{category} REAL' for category in RISK_CATEGORIES) + ") WITHOUT ROWID")
+    sql = f"INSERT OR REPLACE INTO labels VALUES (?{', ?' * len(RISK_CATEGORIES)})"
+
+    def value(cell):
+        cell = (cell or '').strip()
+        return float(cell) if cell else None
+
+    with open(labels_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        column = next((name for name in ('submission_id', 'timestamp') if name in (reader.fieldnames or [])), None)
+        if column is None:
+            raise SystemExit(f"{labels_path} needs a 'submission_id' or 'timestamp' column")
+        batch = []
+        for row in reader:
+            batch.append((row[column].strip(), *(value(row.get(category)) for category in RISK_CATEGORIES)))
+            if len(batch) >= CHUNK_ROWS:
+                conn.executemany(sql, batch)
+                batch = []
+        conn.executemany(sql, batch)
+    conn.commit()
+    return conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0], column
+
+
+def _questionnaire(row):
+    row = dict(row)
+    for field, cast in NUMERIC_FIELDS.items():
+        row[field] = cast(float(row[field] or 0))
+    if row['height'] <= 0:
+        raise ValueError("no height")
+    return unflatten_submission(row)
+
+
+def _lookup(conn, keys):
+    labels = {}
+    for i in range(0, len(keys), LOOKUP_ROWS):
+        part = keys[i:i + LOOKUP_ROWS]
+        labels.update((row[0], row[1:]) for row in conn.execute(
+            f"SELECT * FROM labels WHERE key IN ({','.join('?' * len(part))})", part))
+    return labels
+
+
+def iter_labeled_chunks(paths, conn, column='timestamp'):
+    """Yield ``(records, labels)`` for the labeled archive rows, CHUNK_ROWS archive rows at a time.
+
+    Rows are matched on ``column`` (``submission_id`` or ``timestamp``).
+    ``labels`` is a float array with a column per risk category, NaN where unknown.
+    """
+    key = submission_id if column == 'submission_id' else (lambda row: row['timestamp'])
+
+    def chunk_result(rows):
+        labels = _lookup(conn, [key(row) for row in rows])
+        questionnaires, values = [], []
+        for row in rows:
+            if key(row) not in labels:
+                continue
+            try:
+                questionnaires.append(_questionnaire(row))
+            except (ValueError, KeyError):  # hand-edited or foreign row
+                continue
+            values.append(labels.pop(key(row)))  # first copy only
+        if not questionnaires:
+            return None
+        return featurize(questionnaires, len(questionnaires)), np.array(values, dtype=float)
+
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = []
+            for row in csv.DictReader(f):
+                if is_tombstone(row):
+                    continue
+                rows.append(row)
+                if len(rows) >= CHUNK_ROWS:
+                    result = chunk_result(rows)
+                    rows = []
+                    if result is not None:
+                        yield result
+            result = chunk_result(rows) if rows else None
+            if result is not None:
+                yield result
+
+
+def fit(labels_path, base=None, ridge=0.0, csv_path=CSV_PATH, min_labels=MIN_LABELS):
+    """Fit every category on the labeled archive rows; returns ``(candidate params, report)``"""
+    base = base or active_model()
+    equations = {category: NormalEquations(len(TERMS[category])) for category in RISK_CATEGORIES}
+    start = time.time()
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix='calibrate_labels_')
+    os.close(fd)
+    conn = sqlite3.connect(db_path)
+    try:
+        n_labels, column = load_labels(labels_path, conn)
+        matched = 0
+        for records, labels in iter_labeled_chunks(archive_paths(csv_path), conn, column):
+            matched += len(records)
+            for i, (category, (x, applies)) in enumerate(design(records, base).items()):
+                known = applies & ~np.isnan(labels[:, i])
+                equations[category].add(x[known], labels[known, i])
+    finally:
+        conn.close()
+        os.remove(db_path)
+
+    params = copy.deepcopy(base.params)
+    report = {'labels': n_labels, 'matched': matched, 'seconds': round(time.time() - start, 1), 'categories': {}}
+    for category, eq in equations.items():
+        prior = coefficients(base.params, category)
+        entry = {'n': eq.n, 'prevalence': round(eq.y_sum / eq.n, 4) if eq.n else None,
+                 'brier_base': eq.brier(prior)}
+        report['categories'][category] = entry
+        if not eq.n or eq.n < min_labels:
+            entry['fitted'] = False
+            continue
+        try:
+            b = eq.solve(prior, ridge)
+        except np.linalg.LinAlgError:
+            raise SystemExit(f"{category}: the labeled rows do not determine every weight; use --ridge")
+        set_coefficients(params, category, b)
+        entry.update(fitted=True, brier_fit=eq.brier(coefficients(params, category)))
+    return params, report
+
+
+def candidate_path(version, models_dir=MODELS_DIR):
+    """Where a new candidate ``version`` goes; refuses to replace an existing model"""
+    path = os.path.join(models_dir, f'{version}.json')
+    if version == 'registry' or os.path.exists(path):
+        raise SystemExit(f"{path} already exists; pick a new --version")
+    return path
+
+
+def write_candidate(params, version, base_version, labels_path, report, models_dir=MODELS_DIR):
+    """Write the fitted parameters as ``<models_dir>/<version>.json``; returns the path"""
+    path = candidate_path(version, models_dir)
+    params['version'] = version
+    params['description'] = f"Calibrated from {base_version} on {os.path.basename(labels_path)}"
+    params['calibration'] = {'base': base_version, 'labels': os.path.basename(labels_path),
+                             'fitted_at': datetime.now().isoformat(timespec='seconds'), **report}
+    write_json_atomic(path, params, indent=4)
+    return path
+
+
+def set_shadow(version, models_dir=MODELS_DIR):
+    """Make ``version`` the registry's shadow model, keeping the active one"""
+    path = os.path.join(models_dir, 'registry.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        registry = {'active': 'v1'}
+    write_json_atomic(path, {**registry, 'shadow': version}, indent=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the scoring weights to outcome labels")
+    parser.add_argument('labels', help="CSV with a timestamp column and a 0/1 column per risk category")
+    parser.add_argument('--version', required=True, help="version name of the candidate model, e.g. v2")
+    parser.add_argument('--base', help="model to start from (default: the active one)")
+    parser.add_argument('--ridge', type=float, default=0.0, help="shrink towards the base weights (default: 0)")
+    parser.add_argument('--min-labels', type=int, default=MIN_LABELS, help="labels needed to refit a category")
+    parser.add_argument('--archive', default=CSV_PATH, help="submissions CSV (default: %(default)s)")
+    parser.add_argument('--shadow', action='store_true', help="score the candidate alongside the active model")
+    args = parser.parse_args(argv)
+
+    candidate_path(args.version)  # fail before the pass over the archive, not after
+    base = REGISTRY.get(args.base) if args.base else active_model()
+    params, report = fit(args.labels, base, args.ridge, args.archive, args.min_labels)
+    print(f"{report['matched']} of {report['labels']} labeled submission(s) found in the archive "
+          f"({report['seconds']}s).")
+    for category, entry in report['categories'].items():
+        if not entry['fitted']:
+            print(f"  {category}: {entry['n']} label(s), kept the {base.version} weights")
+            continue
+        print(f"  {category}: {entry['n']} label(s), prevalence {entry['prevalence']:.1%}, "
+              f"Brier {entry['brier_base']:.4f} -> {entry['brier_fit']:.4f} (before clipping)")
+    if not any(entry['fitted'] for entry in report['categories'].values()):
+        sys.exit("No category had enough labels; nothing written.")
+    path = write_candidate(params, args.version, base.version, args.labels, report)
+    print(f"Wrote {path}")
+    if args.shadow:
+        set_shadow(args.version)
+        print(f"{args.version} is now the shadow model; compare in submissions/shadow_scores.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,8 +25,11 @@ echo "🔄 Stopping existing containers..."
 docker-compose down --remove-orphans || true
 
 # Build and start the application
-echo "🏗️  Building and starting the application..."
-docker-compose up --build -d
+# APP_REPLICAS controls how many Streamlit processes run behind nginx;
+# raise it (e.g. APP_REPLICAS=$(nproc)) until the host CPU is saturated.
+APP_REPLICAS=${APP_REPLICAS:-2}
+echo "🏗️  Building and starting the application with ${APP_REPLICAS} replica(s)..."
+docker-compose up --build -d --scale disease-prediction-app="${APP_REPLICAS}"
 
 # Wait for the application to be ready
 echo "⏳ Waiting for application to be ready..."
@@ -42,6 +45,7 @@ if docker-compose ps | grep -q "Up"; then
     echo "   - View logs: docker-compose logs -f"
     echo "   - Stop app: docker-compose down"
     echo "   - Restart: docker-compose restart"
+    echo "   - Rescale: docker-compose up -d --scale disease-prediction-app=N && docker-compose exec nginx nginx -s reload"
 else
     echo "❌ Deployment failed. Check logs with: docker-compose logs"
     exit 1
@@ -0,0 +1,508 @@
+"""Right to erasure: delete every stored copy of a respondent's submissions.
+
+A submission is stored in several places: a row of ``submissions.csv`` (or
+of a file it was rotated into), its JSON file, the respondent's history
+file, cached PDF reports, the clinic's Google Sheet and the sheet's local
+mirror. ``submissions/erasure.db`` indexes where each one went, keyed by a
+salted hash of the phone number and of the name (the salt of
+``history.py``), so an erasure goes straight to the affected rows instead of
+rewriting or scanning the archive:
+
+- CSV rows are overwritten in place by a tombstone of the same length
+  (readers skip them, ``storage.is_tombstone``);
+- JSON files and reports are deleted and history entries removed;
+- sheet rows are tombstoned by the outbox worker, queued behind any pending
+  write of the same rows, and so are their copies in the mirror.
+
+Locations are keyed by the submission's ``submission_id`` (timestamps are not
+unique) and each one is checked against it before it is touched; submissions
+stored before ids existed are identified by their timestamp. ``compact`` (run
+by ``worker.py`` every ERASURE_COMPACT_SECONDS) later removes the tombstoned
+rows for good and moves the index entries of the rows after them.
+Aggregates, percentile sketches, shadow scores and share links hold neither
+name nor phone number and are not touched.
+
+    python erasure.py --phone 0812... [--name "Budi Santoso"] [--dry-run]
+    python erasure.py --compact
+    python erasure.py --rebuild-index   # once, for submissions stored before the index existed
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import history
+import outbox
+import tenants
+from storage import (SUBMISSIONS_DIR, CSV_PATH, TOMBSTONE, archive_paths, file_lock, fsync_dir, fsync_file,
+                     id_column, is_tombstone, iter_csv_spans, row_submission_id, submission_id,
+                     tombstone_csv_row, tombstone_csv_submissions)
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines only ever run a single process
+    fcntl = None
+
+INDEX_PATH = os.path.join(SUBMISSIONS_DIR, 'erasure.db')
+LOG_PATH = os.path.join(SUBMISSIONS_DIR, 'erasure_log.jsonl')
+SHEET_LOCK_PATH = os.path.join(SUBMISSIONS_DIR, 'erasure_sheets')  # serializes row edits against row deletes
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    key TEXT NOT NULL,            -- salted hash of the phone number or the name
+    store TEXT NOT NULL,          -- csv, json, history, report or sheet
+    path TEXT NOT NULL,           -- file, or '<clinic>/<sheet id>' for sheet rows
+    position INTEGER NOT NULL,    -- byte offset (csv), sheet row (0 until delivered)
+    length INTEGER NOT NULL,      -- bytes (csv)
+    timestamp TEXT NOT NULL,      -- of the submission, for display
+    submission_id TEXT NOT NULL   -- checked before anything is erased
+);
+CREATE INDEX IF NOT EXISTS locations_key ON locations (key);
+CREATE INDEX IF NOT EXISTS locations_position ON locations (store, path, position);
+CREATE TABLE IF NOT EXISTS tombstones (
+    store TEXT NOT NULL,          -- csv or sheet
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    submission_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tombstones_path ON tombstones (store, path);
+"""
+
+
+def _migrate(conn):
+    """Add submission ids to an index created before them; its entries are identified by their timestamp"""
+    conn.execute("BEGIN IMMEDIATE")  # one process migrates, the others then see the new columns
+    try:
+        if 'submission_id' not in {row[1] for row in conn.execute("PRAGMA table_info(locations)")}:
+            conn.execute("ALTER TABLE locations ADD COLUMN submission_id TEXT NOT NULL DEFAULT ''")
+            conn.execute("UPDATE locations SET submission_id = timestamp")
+        if 'timestamp' in {row[1] for row in conn.execute("PRAGMA table_info(tombstones)")}:
+            conn.execute("ALTER TABLE tombstones RENAME COLUMN timestamp TO submission_id")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def connect(path=INDEX_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(_SCHEMA)
+    _migrate(conn)
+    return conn
+
+
+def _keys(phone, name):
+    return [key for key in (history.respondent_key(phone), history.name_key(name)) if key is not None]
+
+
+def _sheet_path(tenant_id, sheet_id):
+    return f'{tenant_id}/{sheet_id}'
+
+
+def _insert(conn, rows):
+    conn.executemany("INSERT INTO locations VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def index_submissions(submissions, locations, tenant):
+    """Index stored ``(questionnaire_data, flat_data, risk_scores)`` submissions at their ``save_submissions`` locations"""
+    sheet_id = tenants.sheet_id(tenant)
+    rows = []
+    for (questionnaire_data, _, _), (offset, length, json_path) in zip(submissions, locations):
+        personal = questionnaire_data['personal']
+        submission = (questionnaire_data['timestamp'], submission_id(questionnaire_data))
+        phone_key = history.respondent_key(personal['phone'])
+        stored = [('csv', CSV_PATH, offset, length), ('json', json_path, 0, 0)]
+        if phone_key is not None:
+            stored.append(('history', history.history_path(phone_key), 0, 0))
+        if sheet_id:
+            stored.append(('sheet', _sheet_path(tenant['id'], sheet_id), 0, 0))
+        for key in _keys(personal['phone'], personal['name']):
+            rows.extend((key,) + location + submission for location in stored)
+    conn = connect()
+    try:
+        with conn:
+            _insert(conn, rows)
+    finally:
+        conn.close()
+
+
+def index_report(questionnaire_data, path):
+    """Index a cached PDF report of a submission"""
+    personal = questionnaire_data['personal']
+    conn = connect()
+    try:
+        with conn:
+            _insert(conn, [(key, 'report', path, 0, 0, questionnaire_data['timestamp'],
+                            submission_id(questionnaire_data)) for key in _keys(personal['phone'], personal['name'])])
+    finally:
+        conn.close()
+
+
+def index_sheet_rows(tenant_id, sheet_id, first_row, submissions):
+    """Record the sheet rows of just delivered submission ids (rows ``first_row``, ``first_row + 1``, ...)"""
+    if first_row is None:
+        return
+    path = _sheet_path(tenant_id, sheet_id)
+    rows = [(first_row + i, path, submission) for i, submission in enumerate(submissions)]
+    conn = connect()
+    try:
+        with conn:
+            # Erased before delivery: the row is still to be tombstoned, see erase_sheet_rows
+            for table in ('locations', 'tombstones'):
+                conn.executemany(f"UPDATE {table} SET position = ? "
+                                 "WHERE store = 'sheet' AND path = ? AND submission_id = ? AND position = 0", rows)
+    finally:
+        conn.close()
+
+
+def find(phone=None, name=None):
+    """Indexed locations of a respondent's submissions, ``{submission_id: (timestamp, [(store, path, position, length)])}``.
+
+    Given both, only submissions matching the phone number and the name are returned.
+    """
+    keys = [history.respondent_key(phone) if phone else None, history.name_key(name) if name else None]
+    keys = [key for key in keys if key is not None]
+    if not keys:
+        return {}
+    sql = "SELECT DISTINCT submission_id, timestamp, store, path, position, length FROM locations WHERE key = ?"
+    params = [keys[0]]
+    if len(keys) == 2:
+        sql += " AND submission_id IN (SELECT submission_id FROM locations WHERE key = ?)"
+        params.append(keys[1])
+    conn = connect()
+    try:
+        rows = conn.execute(sql + " ORDER BY timestamp", params).fetchall()
+    finally:
+        conn.close()
+    found = {}
+    for submission, timestamp, *location in rows:
+        found.setdefault(submission, (timestamp, []))[1].append(tuple(location))
+    return found
+
+
+def _erase_csv(path, offset, length, submission):
+    """Tombstone the archive row of a submission id; returns the ``(path, offset)`` it was found at, or None"""
+    if tombstone_csv_row(path, offset, length, submission):
+        return path, offset
+    # Rotated aside since (same offsets, new name), or compacted while we looked it up: scan
+    for candidate in reversed(archive_paths()):
+        spans = tombstone_csv_submissions(candidate, {submission})
+        if spans:
+            return candidate, spans[0][0]
+    return None
+
+
+def _erase_history(path, submissions):
+    try:
+        f = open(path, 'r+', encoding='utf-8')
+    except FileNotFoundError:
+        return 0
+    with f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)  # as history's appends
+        lines = f.readlines()
+        kept = [line for line in lines if line.strip() and submission_id(json.loads(line)) not in submissions]
+        f.seek(0)
+        f.truncate()
+        f.write(''.join(kept))
+        fsync_file(f)
+    if not kept:
+        os.remove(path)
+    return len(lines) - len(kept)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def erase(phone=None, name=None, submissions=None):
+    """Erase a respondent's submissions (all found by ``find``, or the ids ``submissions``) from every store.
+
+    Returns the number of erased items per store; sheet rows are counted
+    when their erasure is queued.
+    """
+    found = find(phone, name)
+    if submissions is not None:
+        found = {submission: found[submission] for submission in submissions if submission in found}
+    counts = {'submissions': len(found), 'csv': 0, 'json': 0, 'history': 0, 'report': 0, 'sheet': 0, 'missing': 0}
+    erased, tombstones, history_paths, sheet_rows = [], [], {}, {}
+    for submission, (_, locations) in found.items():
+        for store, path, position, length in locations:
+            erased.append((store, path, position, submission))
+            if store == 'csv':
+                result = _erase_csv(path, position, length, submission)
+                if result is None:
+                    counts['missing'] += 1
+                    continue
+                counts['csv'] += 1
+                tombstones.append(('csv',) + result + (submission,))
+            elif store in ('json', 'report'):
+                counts[store] += _remove(path)
+            elif store == 'history':
+                history_paths.setdefault(path, set()).add(submission)
+            elif store == 'sheet':
+                sheet_rows.setdefault(path, set()).add(submission)
+                tombstones.append(('sheet', path, position, submission))
+    for path, erased_submissions in history_paths.items():
+        counts['history'] += _erase_history(path, erased_submissions)
+    for path, erased_submissions in sheet_rows.items():
+        tenant_id, sheet_id = path.split('/', 1)
+        outbox.remove_failed_rows(tenant_id, erased_submissions)
+        outbox.enqueue('sheets_erase', {'tenant': tenant_id, 'sheet_id': sheet_id,
+                                        'submissions': sorted(erased_submissions)}, queue=tenant_id)
+        counts['sheet'] += len(erased_submissions)
+
+    conn = connect()
+    try:
+        with conn:
+            conn.executemany("DELETE FROM locations WHERE store = ? AND path = ? AND position = ? AND submission_id = ?",
+                             erased)
+            conn.executemany("INSERT INTO tombstones VALUES (?, ?, ?, ?)", tombstones)
+    finally:
+        conn.close()
+    # Audit trail without any personal data
+    with open(LOG_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'erased_at': datetime.now().isoformat(), **counts}) + '\n')
+    print(f"DEBUG: Erased {counts['submissions']} submission(s): {counts}.")
+    return counts
+
+
+def _pending_submissions(tenant_id, sheet_id):
+    return {submission_id(row) for payload in outbox.pending_payloads(tenant_id, 'sheets')
+            if payload.get('sheet_id') == sheet_id for row in payload['rows']}
+
+
+def erase_sheet_rows(tenant_id, sheet_id, submissions):
+    """Tombstone the sheet rows (and mirrored rows) of erased submission ids; runs in the outbox worker.
+
+    Raises while a row is still waiting in the outbox, so the erasure is
+    retried after the row has been written.
+    """
+    import sheets
+    import sheet_mirror
+    from gspread.utils import rowcol_to_a1
+    path = _sheet_path(tenant_id, sheet_id)
+    worksheet = sheets.get_worksheet(sheet_id, tenant_id, tenants.get(tenant_id).get('credentials'))
+    with file_lock(SHEET_LOCK_PATH):
+        conn = connect()
+        try:
+            placeholders = ','.join('?' * len(submissions))
+            positions = dict(conn.execute(
+                f"SELECT submission_id, position FROM tombstones WHERE store = 'sheet' AND path = ? "
+                f"AND submission_id IN ({placeholders})", [path, *submissions]).fetchall())
+            known = {submission: row for submission, row in positions.items() if row > 0}
+            header, *cells = worksheet.batch_get(['1:1', *(f'{row}:{row}' for row in known.values())])
+            header = header[0] if header else []
+            width, column = len(header) or 1, id_column(header)
+            rows = {}
+            for (submission, row), value in zip(known.items(), cells):
+                if value and (row_submission_id(value[0], column) == submission or is_tombstone(value[0])):
+                    rows[submission] = row
+            if len(rows) < len(submissions):
+                # Not delivered when erased, or moved by edits in the sheet: look the rest up by id
+                ranges = ['A:A'] + ([] if column is None else ['{0}:{0}'.format(rowcol_to_a1(1, column + 1)[:-1])])
+                first, *ids = [[cell[0] if cell else '' for cell in values] for values in worksheet.batch_get(ranges)]
+                ids = ids[0] if ids else []
+                for row, value in enumerate(first, 1):
+                    submission = (ids[row - 1] if row <= len(ids) else '') or value
+                    if submission in submissions and submission not in rows:
+                        rows[submission] = row
+                waiting = (set(submissions) - set(rows)) & _pending_submissions(tenant_id, sheet_id)
+                if waiting:
+                    raise RuntimeError(f"{len(waiting)} erased row(s) not yet written to the sheet")
+            if rows:
+                blank = [''] * (width - 1)
+                worksheet.batch_update([{'range': f'A{row}:{rowcol_to_a1(row, width)}', 'values': [[TOMBSTONE, *blank]]}
+                                        for row in rows.values()])
+            with conn:
+                # Rows never written (e.g. deleted by hand) leave nothing to compact
+                conn.execute(f"DELETE FROM tombstones WHERE store = 'sheet' AND path = ? "
+                             f"AND submission_id IN ({placeholders})", [path, *submissions])
+                conn.executemany("INSERT INTO tombstones VALUES ('sheet', ?, ?, ?)",
+                                 [(path, row, submission) for submission, row in rows.items()])
+        finally:
+            conn.close()
+    mirrored = sheet_mirror.tombstone_rows(tenant_id, set(submissions))
+    print(f"DEBUG: Erased {len(rows)} sheet row(s) and {mirrored} mirrored row(s) of {tenant_id}.")
+
+
+def compact_csv(path, conn):
+    """Rewrite an archive file without its tombstones, moving the index entries of the rows after them"""
+    moves, dropped = [], []
+    with file_lock(path):
+        tmp_path = f"{path}.{os.getpid()}.compact.tmp"
+        try:
+            src = open(path, 'rb')
+        except FileNotFoundError:
+            return 0
+        with src, open(tmp_path, 'wb') as out:
+            new_offset = 0
+            for offset, length, fields in iter_csv_spans(src):
+                if offset and is_tombstone(fields):
+                    dropped.append((path, offset))
+                    continue
+                if offset != new_offset:
+                    moves.append((new_offset, path, offset))
+                # Re-read the raw bytes: the row is copied exactly as written
+                src_position = src.tell()
+                src.seek(offset)
+                out.write(src.read(length))
+                src.seek(src_position)
+                new_offset += length
+            fsync_file(out)
+        os.replace(tmp_path, path)
+        fsync_dir(os.path.dirname(path))
+        # Ascending order: a row only ever moves down onto positions already vacated
+        with conn:
+            conn.executemany("DELETE FROM locations WHERE store = 'csv' AND path = ? AND position = ?", dropped)
+            conn.executemany("UPDATE locations SET position = ? WHERE store = 'csv' AND path = ? AND position = ?",
+                             moves)
+            conn.execute("DELETE FROM tombstones WHERE store = 'csv' AND path = ?", (path,))
+    return len(dropped)
+
+
+def compact_sheet(path, conn):
+    """Delete the tombstoned rows of a clinic's sheet in one call, moving the index entries below them up"""
+    import sheets
+    tenant_id, sheet_id = path.split('/', 1)
+    worksheet = sheets.get_worksheet(sheet_id, tenant_id, tenants.get(tenant_id).get('credentials'))
+    with file_lock(SHEET_LOCK_PATH):
+        rows = sorted({row for (row,) in conn.execute(
+            "SELECT position FROM tombstones WHERE store = 'sheet' AND path = ? AND position > 0", (path,))},
+            reverse=True)
+        if not rows:
+            return 0
+        cells = worksheet.batch_get([f'A{row}' for row in rows])
+        rows = [row for row, value in zip(rows, cells) if value and value[0] and value[0][0] == TOMBSTONE]
+        if rows:
+            worksheet.spreadsheet.batch_update({'requests': [
+                {'deleteDimension': {'range': {'sheetId': worksheet.id, 'dimension': 'ROWS',
+                                               'startIndex': row - 1, 'endIndex': row}}}
+                for row in rows  # bottom up, so the other row numbers stay valid
+            ]})
+        with conn:
+            for table in ('locations', 'tombstones'):
+                conn.executemany(f"DELETE FROM {table} WHERE store = 'sheet' AND path = ? AND position = ?",
+                                 [(path, row) for row in rows])
+            for row in rows:
+                for table in ('locations', 'tombstones'):
+                    conn.execute(f"UPDATE {table} SET position = position - 1 "
+                                 "WHERE store = 'sheet' AND path = ? AND position > ?", (path, row))
+    if rows:
+        import sheet_mirror
+        sheet_mirror.invalidate(tenant_id)
+    return len(rows)
+
+
+def compact():
+    """Remove tombstoned rows from the archive files and the sheets; errors are logged per file or sheet"""
+    conn = connect()
+    try:
+        targets = conn.execute("SELECT DISTINCT store, path FROM tombstones "
+                               "WHERE store = 'csv' OR position > 0").fetchall()
+        for store, path in targets:
+            try:
+                removed = (compact_csv if store == 'csv' else compact_sheet)(path, conn)
+            except Exception as e:  # one clinic's sheet must not stop the others
+                print(f"DEBUG: Erasure compaction of {path} failed: {e}")
+                continue
+            if removed:
+                print(f"DEBUG: Compacted {removed} erased row(s) out of {path}.")
+    finally:
+        conn.close()
+
+
+def rebuild_index():
+    """Re-index the archive files, JSON files, history and sheet mirrors (one-off backfill); report entries are kept"""
+    start = time.time()
+    conn = connect()
+    try:
+        with conn:
+            # Sheet tombstones are kept: the worker may not have compacted them yet. So are report
+            # entries: a cached PDF (named by a hash) cannot be traced back to its respondent
+            conn.execute("DELETE FROM locations WHERE store != 'report'")
+            conn.execute("DELETE FROM tombstones WHERE store = 'csv'")
+            reports = conn.execute("SELECT DISTINCT path FROM locations WHERE store = 'report'").fetchall()
+            conn.executemany("DELETE FROM locations WHERE store = 'report' AND path = ?",
+                             [(path,) for (path,) in reports if not os.path.exists(path)])  # evicted meanwhile
+            for path in archive_paths():
+                if not os.path.isfile(path):
+                    continue
+                with file_lock(path), open(path, 'rb') as f:
+                    spans = iter_csv_spans(f)
+                    columns = next(spans, (0, 0, []))[2]
+                    column = id_column(columns)
+                    rows = []
+                    for offset, length, fields in spans:
+                        row = dict(zip(columns, fields))
+                        if is_tombstone(fields):
+                            conn.execute("INSERT INTO tombstones VALUES ('csv', ?, ?, '')", (path, offset))
+                            continue
+                        submission = (row['timestamp'], row_submission_id(fields, column))
+                        phone_key = history.respondent_key(row.get('phone'))
+                        for key in _keys(row.get('phone'), row.get('name')):
+                            rows.append((key, 'csv', path, offset, length) + submission)
+                            if phone_key is not None and os.path.exists(history.history_path(phone_key)):
+                                rows.append((key, 'history', history.history_path(phone_key), 0, 0) + submission)
+                    _insert(conn, rows)
+            for path in glob.glob(os.path.join(glob.escape(SUBMISSIONS_DIR), 'submission_*.json')):
+                with open(path, encoding='utf-8') as f:
+                    questionnaire_data = json.load(f)
+                personal = questionnaire_data['personal']
+                _insert(conn, [(key, 'json', path, 0, 0, questionnaire_data['timestamp'], submission_id(questionnaire_data))
+                               for key in _keys(personal.get('phone'), personal.get('name'))])
+            import sheet_mirror
+            for tenant_id, sheet_id, _ in sheet_mirror.targets():
+                try:
+                    f = open(sheet_mirror.mirror_path(tenant_id), 'rb')
+                except FileNotFoundError:
+                    continue
+                with f:
+                    spans = iter_csv_spans(f)
+                    columns = next(spans, (0, 0, []))[2]
+                    column = id_column(columns)
+                    rows = []
+                    for index, (_, _, fields) in enumerate(spans):
+                        row = dict(zip(columns, fields))
+                        for key in _keys(row.get('phone'), row.get('name')):
+                            rows.append((key, 'sheet', _sheet_path(tenant_id, sheet_id), index + 2, 0,
+                                         row.get('timestamp', ''), row_submission_id(fields, column)))
+                    _insert(conn, rows)
+        n = conn.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"Indexed {n} location(s) in {INDEX_PATH} in {time.time() - start:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Erase a respondent's submissions from every store")
+    parser.add_argument('--phone', help="phone number (any format)")
+    parser.add_argument('--name', help="full name (case and spacing ignored)")
+    parser.add_argument('--dry-run', action='store_true', help="only list the submissions found")
+    parser.add_argument('--compact', action='store_true', help="remove tombstoned rows now")
+    parser.add_argument('--rebuild-index', action='store_true', help="re-index all stored submissions")
+    args = parser.parse_args(argv)
+    if args.rebuild_index:
+        rebuild_index()
+    if args.phone or args.name:
+        found = find(args.phone, args.name)
+        for submission, (timestamp, locations) in found.items():
+            print(timestamp, submission, ', '.join(sorted({store for store, *_ in locations})))
+        print(f"{len(found)} submission(s) found")
+        if found and not args.dry_run:
+            print(erase(args.phone, args.name))
+    if args.compact:
+        compact()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Streaming filtered export of the submissions archive.
+
+Rows are read one at a time from ``submissions.csv`` and the files it was
+rotated into, filtered by date range and risk band, and written straight to
+a CSV or XLSX file (openpyxl write-only mode), so memory stays flat however
+large the archive is. Used by the admin export page and from the command line:
+
+    python export.py --start 2025-09-01 --end 2025-09-30 --band cvd_stroke=high -o high_cvd.xlsx
+"""
+import argparse
+import csv
+import os
+import sys
+from itertools import islice
+
+from aggregates import BANDS, CSV_RISK_COLUMNS, RISK_CATEGORIES, risk_band
+from storage import SUBMISSIONS_DIR, CSV_PATH, archive_paths, is_tombstone
+
+EXPORTS_DIR = os.path.join(SUBMISSIONS_DIR, 'exports')  # scratch space for the admin page
+CHUNK_ROWS = 1000
+NUMERIC_COLUMNS = {'age', 'height', 'weight', 'waist_circumference', 'bmi', *CSV_RISK_COLUMNS.values()}
+
+
+def archive_columns(paths):
+    """Union of the headers of ``paths``, in first-seen order"""
+    columns = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            for column in next(csv.reader(f), []):
+                if column not in columns:
+                    columns.append(column)
+    return columns
+
+
+def _band(value):
+    return 'na' if value in ('', 'N/A', None) else risk_band(float(value) / 100)
+
+
+def iter_matching_rows(paths, start=None, end=None, bands=None):
+    """Yield archive rows (dicts) whose day is within [start, end] and whose bands match.
+
+    ``bands`` maps a risk category to the accepted bands, e.g.
+    ``{'cvd_stroke': {'high'}}``; every listed category must match.
+    """
+    bands = bands or {}
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if is_tombstone(row):
+                    continue
+                day = row['timestamp'][:10]
+                if (start and day < start) or (end and day > end):
+                    continue
+                if all(_band(row.get(CSV_RISK_COLUMNS[category])) in accepted
+                       for category, accepted in bands.items()):
+                    yield row
+
+
+def _chunks(rows):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(rows, columns, out):
+    """Write rows to a text file object in chunks; returns the number of rows written"""
+    writer = csv.DictWriter(out, fieldnames=columns, restval='', extrasaction='ignore')
+    writer.writeheader()
+    n = 0
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        n += len(chunk)
+    return n
+
+
+def _cell(column, value):
+    if column in NUMERIC_COLUMNS and value not in ('', 'N/A', None):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return value
+
+
+def write_xlsx(rows, columns, path):
+    """Write rows to an .xlsx file with openpyxl's streaming writer; returns the number of rows written"""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('submissions')
+    sheet.append(columns)
+    n = 0
+    for row in rows:
+        sheet.append([_cell(column, row.get(column, '')) for column in columns])
+        n += 1
+    workbook.save(path)
+    return n
+
+
+def export(path, fmt='csv', start=None, end=None, bands=None, csv_path=CSV_PATH, rotated=True):
+    """Export matching rows of the archive to ``path``; returns the number of rows exported.
+
+    With ``rotated=False`` only ``csv_path`` itself is read (e.g. a clinic's sheet mirror).
+    """
+    paths = archive_paths(csv_path) if rotated else [csv_path]
+    columns = archive_columns(paths)
+    rows = iter_matching_rows(paths, start, end, bands)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if fmt == 'xlsx':
+            n = write_xlsx(rows, columns, tmp_path)
+        else:
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as out:
+                n = write_csv(rows, columns, out)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return n
+
+
+def parse_band_filters(values):
+    """['cvd_stroke=high,moderate', ...] -> {'cvd_stroke': {'high', 'moderate'}}"""
+    bands = {}
+    for value in values:
+        category, _, accepted = value.partition('=')
+        accepted = {band.strip() for band in accepted.split(',') if band.strip()}
+        if category not in RISK_CATEGORIES or not accepted or not accepted <= set(BANDS):
+            raise ValueError(f"bad band filter {value!r}: use <{'|'.join(RISK_CATEGORIES)}>=<{','.join(BANDS)}>")
+        bands.setdefault(category, set()).update(accepted)
+    return bands
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export filtered submissions as CSV or XLSX")
+    parser.add_argument('--start', help="first day (YYYY-MM-DD), inclusive")
+    parser.add_argument('--end', help="last day (YYYY-MM-DD), inclusive")
+    parser.add_argument('--band', action='append', default=[],
+                        help="category=band[,band] filter, e.g. cvd_stroke=high (repeatable)")
+    parser.add_argument('--format', choices=['csv', 'xlsx'], help="default: from the output file extension")
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--archive', default=CSV_PATH, help=f"submissions CSV (default: {CSV_PATH})")
+    args = parser.parse_args(argv)
+    try:
+        bands = parse_band_filters(args.band)
+    except ValueError as e:
+        parser.error(str(e))
+    fmt = args.format or ('xlsx' if args.output.lower().endswith('.xlsx') else 'csv')
+    n = export(args.output, fmt, args.start, args.end, bands, args.archive)
+    print(f"Exported {n} row(s) to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
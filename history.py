@@ -0,0 +1,152 @@
+"""Per-respondent risk history, keyed by a salted hash of the phone number.
+
+Each respondent with a phone number gets one small append-only file,
+``submissions/history/<h[:2]>/<h>.jsonl`` where ``h`` is the hash, holding
+one line per assessment. Showing someone's trend is a single file read, and
+recording a submission appends one line. No phone number or name is stored
+here.
+
+Anyone can type someone else's phone number into the public form, so each
+line also holds a salted hash of the name and ``lookup`` only returns the
+lines of the same name: a stranger sees neither the owner's scores nor adds
+to the owner's trend. Lines from before the name was recorded are not shown
+until ``python history.py`` rebuilds the files from the archive.
+
+Set ``HISTORY_SALT`` (the same value for every replica). Without it, a random
+salt is generated once and kept next to the index.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import secrets
+
+from aggregates import CSV_RISK_COLUMNS, RISK_CATEGORIES
+from storage import SUBMISSIONS_DIR, CSV_PATH, archive_paths, file_lock, is_tombstone, submission_id
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines only ever run a single process
+    fcntl = None
+
+HISTORY_DIR = os.path.join(SUBMISSIONS_DIR, 'history')
+SALT_PATH = os.path.join(HISTORY_DIR, 'salt')
+
+_salt = {}
+
+
+def normalize_phone(phone):
+    """Canonical digits of an Indonesian phone number ('0812-..' / '+62 812..' -> '62812..'), or None"""
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('0'):
+        digits = '62' + digits[1:]
+    elif digits.startswith('8'):
+        digits = '62' + digits
+    return digits if len(digits) >= 8 else None
+
+
+def _get_salt():
+    if 'value' not in _salt:
+        salt = os.getenv('HISTORY_SALT', '')
+        if not salt:
+            with file_lock(SALT_PATH):
+                if not os.path.exists(SALT_PATH):
+                    with open(SALT_PATH, 'w') as f:
+                        f.write(secrets.token_hex(32))
+                with open(SALT_PATH) as f:
+                    salt = f.read().strip()
+        _salt['value'] = salt.encode()
+    return _salt['value']
+
+
+def respondent_key(phone):
+    """Salted hash identifying a respondent, or None without a usable phone number"""
+    normalized = normalize_phone(phone)
+    if normalized is None:
+        return None
+    return hashlib.sha256(_get_salt() + normalized.encode()).hexdigest()
+
+
+def name_key(name):
+    """Salted hash of a name (case and spacing ignored), or None for an empty name"""
+    normalized = ' '.join((name or '').casefold().split())
+    if not normalized:
+        return None
+    return hashlib.sha256(_get_salt() + b'name:' + normalized.encode()).hexdigest()
+
+
+def history_path(key):
+    return os.path.join(HISTORY_DIR, key[:2], f'{key}.jsonl')
+
+
+def _append_lines(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        f.write(''.join(lines))
+
+
+def _entry(name, submission, timestamp, risk_scores, model_version):
+    return json.dumps({
+        'name_key': name_key(name),
+        'submission_id': submission,
+        'timestamp': timestamp,
+        'model_version': model_version,
+        'scores': {category: risk_scores.get(category) for category in RISK_CATEGORIES},
+    }) + '\n'
+
+
+def record_submissions(submissions):
+    """Append ``(phone, name, submission_id, timestamp, risk_scores, model_version)`` entries to their respondents' histories"""
+    by_key = {}
+    for phone, name, submission, timestamp, risk_scores, model_version in submissions:
+        key = respondent_key(phone)
+        if key is not None:
+            by_key.setdefault(key, []).append(_entry(name, submission, timestamp, risk_scores, model_version))
+    for key, lines in by_key.items():
+        _append_lines(history_path(key), lines)
+
+
+def lookup(phone, name):
+    """All recorded assessments of the respondent with this phone number and name, oldest first"""
+    key, name = respondent_key(phone), name_key(name)
+    if key is None or name is None:
+        return []
+    try:
+        with open(history_path(key), encoding='utf-8') as f:
+            entries = [entry for entry in map(json.loads, filter(str.strip, f)) if entry.get('name_key') == name]
+    except FileNotFoundError:
+        return []
+    return sorted(entries, key=lambda entry: entry['timestamp'])
+
+
+def rebuild_from_csv(csv_path=CSV_PATH):
+    """Recreate the history files from the submissions CSV and its rotated archives (one-off backfill)"""
+    by_key = {}
+    for archive_path in archive_paths(csv_path):  # oldest first, so each history stays in order
+        with open(archive_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                key = respondent_key(row.get('phone'))
+                if key is None or is_tombstone(row):
+                    continue
+                risk_scores = {
+                    category: float(row[column]) / 100
+                    for category, column in CSV_RISK_COLUMNS.items()
+                    if row[column] not in ('', 'N/A')
+                }
+                by_key.setdefault(key, []).append(
+                    _entry(row.get('name'), submission_id(row), row['timestamp'], risk_scores,
+                           row.get('model_version', '')))
+    for key, lines in by_key.items():
+        path = history_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+        _append_lines(path, lines)
+    return len(by_key)
+
+
+if __name__ == "__main__":
+    n = rebuild_from_csv()
+    print(f"Rebuilt {n} respondent histories in {HISTORY_DIR} from {CSV_PATH} and its rotated archives")
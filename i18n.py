@@ -0,0 +1,123 @@
+"""Translation catalogs.
+
+Every language has one catalog, ``locales/<lang>.json``, with the sections
+``ui`` (page text), ``options`` (option labels per ``*_map``), ``help``
+(``*_help`` tooltips), ``recommendations`` and ``products``. Missing entries
+fall back to English, so a new language can start with a partial catalog;
+``locales/languages.json`` lists the languages offered and their names.
+
+The Docker build runs ``python i18n.py --compile``, which merges each catalog
+with the English fallback and pickles it to ``locales/compiled/``. A
+catalog is loaded the first time its language is used and then shared by all
+sessions of the process, so users of one language never pay for another.
+"""
+import json
+import os
+import pickle
+import sys
+import threading
+from collections.abc import Mapping
+
+LOCALES_DIR = os.getenv('LOCALES_DIR', 'locales')
+COMPILED_DIR = os.path.join(LOCALES_DIR, 'compiled')
+DEFAULT_LANG = 'en'
+
+_catalogs = {}
+_lock = threading.Lock()
+_languages = {}
+
+
+def languages():
+    """Language code -> display name, in the order offered to users"""
+    if not _languages:
+        with open(os.path.join(LOCALES_DIR, 'languages.json'), encoding='utf-8') as f:
+            _languages.update(json.load(f))
+    return _languages
+
+
+def _merge(fallback, override):
+    """``override`` on top of ``fallback``; nested dicts merge, everything else is replaced"""
+    merged = dict(fallback)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(fallback.get(key), dict):
+            value = _merge(fallback[key], value)
+        merged[key] = value
+    return merged
+
+
+def _read_source(lang):
+    with open(os.path.join(LOCALES_DIR, f'{lang}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compile_catalog(lang):
+    """The full catalog of ``lang``: its own entries with English filling the gaps"""
+    if lang == DEFAULT_LANG:
+        return _read_source(lang)
+    return _merge(_read_source(DEFAULT_LANG), _read_source(lang))
+
+
+def _load(lang):
+    compiled = os.path.join(COMPILED_DIR, f'{lang}.pickle')
+    sources = [os.path.join(LOCALES_DIR, f'{name}.json') for name in {lang, DEFAULT_LANG}]
+    try:
+        if os.path.getmtime(compiled) >= max(os.path.getmtime(path) for path in sources):
+            with open(compiled, 'rb') as f:
+                return pickle.load(f)
+    except OSError:
+        pass
+    # No (or a stale) build artifact, e.g. when running from a source checkout
+    return compile_catalog(lang)
+
+
+def catalog(lang):
+    """Cached full catalog of ``lang`` (English for unknown languages)"""
+    cached = _catalogs.get(lang)
+    if cached is not None:
+        return cached
+    if lang not in languages():
+        lang = DEFAULT_LANG
+    with _lock:
+        if lang not in _catalogs:
+            _catalogs[lang] = _load(lang)
+            print(f"DEBUG: Loaded translation catalog '{lang}'.")
+        return _catalogs[lang]
+
+
+class CatalogSection(Mapping):
+    """Language -> one entry of every catalog, e.g. ``CatalogSection('options', 'sleep_map')['id']``.
+
+    Behaves like the per-language dicts the app used to define inline, but
+    only loads a language's catalog when that language is looked up.
+    """
+
+    def __init__(self, section, name=None):
+        self.section = section
+        self.name = name
+
+    def __getitem__(self, lang):
+        entry = catalog(lang)[self.section]
+        return entry if self.name is None else entry[self.name]
+
+    def __iter__(self):
+        return iter(languages())
+
+    def __len__(self):
+        return len(languages())
+
+
+def compile_all():
+    """Write ``locales/compiled/<lang>.pickle`` for every offered language"""
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    for lang in languages():
+        path = os.path.join(COMPILED_DIR, f'{lang}.pickle')
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(compile_catalog(lang), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        print(f"Compiled {path}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['--compile']:
+        sys.exit('usage: python i18n.py --compile')
+    compile_all()
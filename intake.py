@@ -0,0 +1,218 @@
+"""Bulk intake of paper questionnaires typed into a CSV or Excel file.
+
+Uploaded files use the submissions CSV column layout (``flat_data``, see
+``storage.flatten_submission``). Computed columns (``bmi`` and the ``*_risk``
+percentages) are ignored and recomputed. Rows are read, validated and scored
+in fixed-size chunks so arbitrarily large files never sit in memory at once.
+
+The ``timestamp`` (or ``form_date``) column is the date on the paper form,
+shared by every form of a screening event; it is kept as ``form_date``. Each
+stored submission is timestamped when it is read, like a form submission.
+"""
+import csv
+import functools
+import io
+from datetime import datetime, timedelta
+from itertools import islice
+
+from pydantic import ValidationError
+
+from options import (
+    sleep_map, stress_map, cholesterol_map, bp_map, smoking_map, alcohol_map,
+    glucose_map, symptom_scale, health_conditions_map, family_history_map,
+    genetic_test_map, exercise_freq_map, duration_map, intensity_map,
+    SEX_VALUES, ACTIVITY_LEVEL_VALUES
+)
+from i18n import CatalogSection
+from model_registry import active_model
+from models import Questionnaire, format_error
+from records import featurize
+from scoring import calculate_risk_scores_batch, risk_scores_at
+from storage import flatten_submission, unflatten_submission
+
+CHUNK_SIZE = 1000
+LANG = CatalogSection('ui')
+
+NUMERIC_FIELDS = ['age', 'height', 'weight', 'waist_circumference']
+TEXT_FIELDS = ['name', 'phone', 'occupation', 'medications', 'findings']
+
+OPTION_FIELDS = {
+    'exercise_frequency': exercise_freq_map,
+    'duration': duration_map,
+    'intensity': intensity_map,
+    'sleep_hours': sleep_map,
+    'stress_level': stress_map,
+    'smoking': smoking_map,
+    'alcohol': alcohol_map,
+    'total_cholesterol': cholesterol_map,
+    'blood_pressure_medication': bp_map,
+    'fasting_glucose': glucose_map,
+    'frequent_hunger': symptom_scale,
+    'frequent_thirst': symptom_scale,
+    'frequent_urination': symptom_scale,
+    'diabetes_history': family_history_map,
+    'cancer_history': family_history_map,
+    'cvd_history': family_history_map,
+    'symptom_fatigue': symptom_scale,
+    'symptom_joint_pain': symptom_scale,
+    'symptom_digestive': symptom_scale,
+    'symptom_skin_issues': symptom_scale,
+    'symptom_headaches': symptom_scale,
+    'symptom_mood': symptom_scale,
+    'symptom_cognitive': symptom_scale,
+    'symptom_sleep_issues': symptom_scale,
+    'had_testing': genetic_test_map,
+}
+
+
+def _option_lookup(options_map):
+    """Accept the internal key or the label of any language, case-insensitively"""
+    lookup = {}
+    for labels in options_map.values():
+        for key, label in labels.items():
+            lookup[key.casefold()] = key
+            lookup[label.casefold()] = key
+    return lookup
+
+
+@functools.lru_cache(maxsize=None)
+def _lookups():
+    """Label lookups over every language; built on first use so other pages don't load all catalogs"""
+    option_lookups = {field: _option_lookup(options_map) for field, options_map in OPTION_FIELDS.items()}
+    condition_lookup = _option_lookup(health_conditions_map)
+    sex_lookup = {value.casefold(): value for value in SEX_VALUES}
+    activity_level_lookup = {value.casefold(): value for value in ACTIVITY_LEVEL_VALUES}
+    # Labels of languages added later are stored as their English equivalent
+    english = LANG['en']
+    for labels in LANG.values():
+        for lookup, key in ((sex_lookup, 'sex_options'), (activity_level_lookup, 'activity_options')):
+            for label, english_label in zip(labels[key], english[key]):
+                lookup.setdefault(label.casefold(), english_label)
+    return option_lookups, condition_lookup, sex_lookup, activity_level_lookup
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _parse_form_date(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    text = _text(value)
+    return datetime.fromisoformat(text).isoformat() if text else ''
+
+
+def _timestamps():
+    """Strictly increasing timestamps from now on, so a batch read within one clock tick never repeats one"""
+    last = None
+    while True:
+        now = datetime.now()
+        last = now if last is None or now > last else last + timedelta(microseconds=1)
+        yield last.isoformat()
+
+
+def _number(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return value if value not in (None, '') else 0  # empty counts as missing, like the form
+
+
+def row_to_questionnaire(row, timestamp=None):
+    """Validate an uploaded row and return it as a ``Questionnaire`` stored at ``timestamp`` (default: now).
+
+    Option labels of any language are mapped to their internal keys first;
+    all other checks are left to the shared pydantic models. Raises
+    ValueError (or pydantic's ValidationError, a subclass) on bad input.
+    """
+    flat = {'timestamp': timestamp or datetime.now().isoformat(),
+            'form_date': _parse_form_date(row.get('form_date') or row.get('timestamp'))}
+    for field in TEXT_FIELDS:
+        flat[field] = _text(row.get(field))
+    for field in NUMERIC_FIELDS:
+        flat[field] = _number(row.get(field))
+    option_lookups, condition_lookup, sex_lookup, activity_level_lookup = _lookups()
+    flat['sex'] = sex_lookup.get(_text(row.get('sex')).casefold(), _text(row.get('sex')))
+    activity_level = _text(row.get('activity_level'))
+    flat['activity_level'] = activity_level_lookup.get(activity_level.casefold(), activity_level)
+    for field, lookup in option_lookups.items():
+        value = _text(row.get(field))
+        flat[field] = lookup.get(value.casefold(), value)
+    flat['conditions'] = ','.join(
+        condition_lookup.get(c.strip().casefold(), c.strip())
+        for c in _text(row.get('conditions')).split(',') if c.strip()
+    )
+    return Questionnaire.model_validate(unflatten_submission(flat))
+
+
+def _reason(error):
+    if isinstance(error, ValidationError):
+        return '; '.join(format_error(e) for e in error.errors()[:3])
+    return str(error)
+
+
+def iter_uploaded_rows(file, filename):
+    """Yield the data rows of an uploaded CSV or Excel file as dicts"""
+    file.seek(0)
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        import openpyxl
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_text(cell) for cell in next(rows, ())]
+            for values in rows:
+                if any(v is not None and _text(v) for v in values):
+                    yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            yield from csv.DictReader(text)
+        finally:
+            text.detach()
+
+
+def count_uploaded_rows(file, filename):
+    """Cheap estimate of the number of data rows, for progress reporting"""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        import openpyxl
+        file.seek(0)
+        workbook = openpyxl.load_workbook(file, read_only=True)
+        try:
+            return max((workbook.active.max_row or 1) - 1, 1)
+        finally:
+            workbook.close()
+    return max(file.getvalue().count(b'\n') - 1, 1)
+
+
+def score_chunks(rows, chunk_size=CHUNK_SIZE, clinic=''):
+    """Validate and score rows chunk by chunk (stored under ``clinic``).
+
+    Yields ``(accepted, rejected, rows_read)`` per chunk where ``accepted`` is a
+    list of ``(questionnaire_data, flat_data, risk_scores)`` and ``rejected`` a
+    list of ``(row_number, name, reason)``; row numbers match the spreadsheet
+    (the header is row 1).
+    """
+    rows = iter(rows)
+    timestamps = _timestamps()
+    row_number = 1
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        valid, rejected = [], []
+        for row in chunk:
+            row_number += 1
+            try:
+                valid.append(row_to_questionnaire(row, next(timestamps)).model_dump())
+            except ValueError as e:
+                rejected.append((row_number, _text(row.get('name')), _reason(e)))
+        accepted = []
+        if valid:
+            # Score the whole chunk at once from packed feature records
+            model = active_model()
+            batch_scores = calculate_risk_scores_batch(featurize(valid, len(valid)), model)
+            for i, questionnaire_data in enumerate(valid):
+                risk_scores = risk_scores_at(batch_scores, i)
+                accepted.append((questionnaire_data, flatten_submission(questionnaire_data, risk_scores, model.version, clinic), risk_scores))
+        yield accepted, rejected, len(chunk)
@@ -0,0 +1,178 @@
+"""Versioned scoring parameters.
+
+Each ``scoring_models/<version>.json`` holds the weights, multipliers and
+thresholds of one scoring-model version; ``scoring_models/registry.json``
+names the ``active`` version used for results and an optional ``shadow``
+candidate scored alongside it (see ``shadow.py``). Files are compiled once
+into a ``ScoringModel`` and recompiled when their mtime changes, so a tuning
+is picked up by every running replica without a restart.
+"""
+import json
+import os
+import threading
+import time
+
+MODELS_DIR = os.getenv('SCORING_MODELS_DIR', 'scoring_models')
+RELOAD_CHECK_SECONDS = 2.0  # stat the files at most this often per process
+
+
+class ScoringModel:
+    """One parameter file compiled into flat attributes and lookup tables"""
+
+    __slots__ = (
+        'version', 'description', 'score_min', 'score_max', 'bmi_min', 'bmi_span', 'met_hours_cap',
+        'metabolic_weights', 'metabolic_multiplier',
+        'cvd_family_history_weight', 'cvd_multiplier',
+        'age_edges', 'age_points_male', 'age_points_female', 'chol_edges', 'chol_points',
+        'older_age', 'older_chol_adjustment', 'bp_medication_points', 'smoking_points',
+        'diabetes_points', 'diabetes_glucose', 'points_offset', 'rate',
+        'diabetes_weights', 'diabetes_multiplier', 'default_waist', 'waist_min', 'waist_span',
+        'glucose_min', 'glucose_span',
+        'cancer_weights', 'cancer_multiplier', 'cancer_age_min', 'cancer_age_span',
+        'recommendation_thresholds', 'params',
+    )
+
+    def __init__(self, params):
+        self.params = params
+        self.version = str(params['version'])
+        self.description = params.get('description', '')
+        self.score_min, self.score_max = (float(v) for v in params['score_bounds'])
+        self.bmi_min, bmi_max = (float(v) for v in params['bmi_range'])
+        self.bmi_span = bmi_max - self.bmi_min
+        self.met_hours_cap = float(params['met_hours_cap'])
+
+        metabolic = params['metabolic']
+        self.metabolic_weights = {k: float(v) for k, v in metabolic['weights'].items()}
+        self.metabolic_multiplier = float(metabolic['multiplier'])
+
+        cvd = params['cvd']
+        framingham = cvd['framingham']
+        self.cvd_family_history_weight = float(cvd['family_history_weight'])
+        self.cvd_multiplier = float(cvd['multiplier'])
+        self.age_edges = tuple(framingham['age_edges'])
+        self.age_points_male = tuple(framingham['age_points_male'])
+        self.age_points_female = tuple(framingham['age_points_female'])
+        self.chol_edges = tuple(framingham['chol_edges'])
+        self.chol_points = tuple(framingham['chol_points'])
+        if not (len(self.age_points_male) == len(self.age_points_female) == len(self.age_edges) + 1
+                and len(self.chol_points) == len(self.chol_edges) + 1):
+            raise ValueError(f"scoring model {self.version}: each points table needs one entry more than its edges")
+        self.older_age = framingham['older_age']
+        self.older_chol_adjustment = framingham['older_chol_adjustment']
+        self.bp_medication_points = framingham['bp_medication_points']
+        self.smoking_points = framingham['smoking_points']
+        self.diabetes_points = framingham['diabetes_points']
+        self.diabetes_glucose = framingham['diabetes_glucose']
+        self.points_offset = framingham['points_offset']
+        self.rate = float(framingham['rate'])
+
+        diabetes = params['diabetes']
+        self.diabetes_weights = {k: float(v) for k, v in diabetes['weights'].items()}
+        self.diabetes_multiplier = float(diabetes['multiplier'])
+        self.default_waist = float(diabetes['default_waist'])
+        self.waist_min, waist_max = (float(v) for v in diabetes['waist_range'])
+        self.waist_span = waist_max - self.waist_min
+        self.glucose_min, glucose_max = (float(v) for v in diabetes['glucose_range'])
+        self.glucose_span = glucose_max - self.glucose_min
+
+        cancer = params['cancer']
+        self.cancer_weights = {k: float(v) for k, v in cancer['weights'].items()}
+        self.cancer_multiplier = float(cancer['multiplier'])
+        self.cancer_age_min, cancer_age_max = (float(v) for v in cancer['age_range'])
+        self.cancer_age_span = cancer_age_max - self.cancer_age_min
+
+        self.recommendation_thresholds = {k: float(v) for k, v in params['recommendation_thresholds'].items()}
+
+    def __repr__(self):
+        return f'ScoringModel({self.version!r})'
+
+
+def load_model(path):
+    """Read and compile one parameter file"""
+    with open(path, encoding='utf-8') as f:
+        return ScoringModel(json.load(f))
+
+
+class ModelRegistry:
+    """Process-wide cache of compiled models, refreshed when files change on disk"""
+
+    def __init__(self, models_dir=MODELS_DIR):
+        self.models_dir = models_dir
+        self.registry_path = os.path.join(models_dir, 'registry.json')
+        self._lock = threading.Lock()
+        self._models = {}  # version -> (mtime, ScoringModel)
+        self._registry = (None, {})  # (mtime, parsed registry.json)
+        self._checked_at = {}  # path -> monotonic time of the last stat
+
+    def _due(self, path):
+        now = time.monotonic()
+        if now - self._checked_at.get(path, -RELOAD_CHECK_SECONDS) < RELOAD_CHECK_SECONDS:
+            return False
+        self._checked_at[path] = now
+        return True
+
+    def get(self, version):
+        """Compiled model for ``version``, recompiled if its file changed"""
+        path = os.path.join(self.models_dir, f'{version}.json')
+        cached = self._models.get(version)
+        if cached is not None and not self._due(path):
+            return cached[1]
+        with self._lock:
+            mtime = os.path.getmtime(path)
+            cached = self._models.get(version)
+            if cached is None or cached[0] != mtime:
+                try:
+                    model = load_model(path)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    if cached is None:
+                        raise
+                    # Keep serving the last good compile while a file is being edited
+                    print(f"DEBUG: Keeping scoring model {version} from before the failed reload: {e}")
+                    return cached[1]
+                if model.version != version:
+                    raise ValueError(f"{path} declares version {model.version!r}")
+                self._models[version] = (mtime, model)
+                print(f"DEBUG: Loaded scoring model {version}.")
+                cached = self._models[version]
+            return cached[1]
+
+    def _read_registry(self):
+        mtime, registry = self._registry
+        if mtime is not None and not self._due(self.registry_path):
+            return registry
+        try:
+            current = os.path.getmtime(self.registry_path)
+        except OSError:
+            return {'active': 'v1'}
+        if current != mtime:
+            try:
+                with open(self.registry_path, encoding='utf-8') as f:
+                    registry = json.load(f)
+                self._registry = (current, registry)
+            except (OSError, ValueError) as e:
+                print(f"DEBUG: Could not read {self.registry_path}: {e}")
+        return self._registry[1] or {'active': 'v1'}
+
+    def active(self):
+        """The model used for the results users see"""
+        return self.get(os.getenv('SCORING_MODEL_VERSION') or self._read_registry().get('active', 'v1'))
+
+    def shadow(self):
+        """The candidate model to score alongside the active one, or None"""
+        version = os.getenv('SCORING_SHADOW_VERSION') or self._read_registry().get('shadow')
+        return self.get(version) if version else None
+
+    def versions(self):
+        return sorted(name[:-5] for name in os.listdir(self.models_dir)
+                      if name.endswith('.json') and name != 'registry.json')
+
+
+REGISTRY = ModelRegistry()
+
+
+def active_model():
+    return REGISTRY.active()
+
+
+def shadow_model():
+    return REGISTRY.shadow()
@@ -0,0 +1,151 @@
+"""Typed questionnaire models (pydantic v2).
+
+One schema for every entry point: the Streamlit form, bulk intake and the
+scoring API. Option fields are ``Literal`` types built from the option maps,
+so their validation runs entirely in pydantic-core; ``model_dump()`` returns
+the nested ``questionnaire_data`` dict the scoring functions expect.
+"""
+import gc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Annotated, List, Literal, Union
+
+from pydantic import BaseModel, Field, StringConstraints, TypeAdapter, ValidationError, field_validator
+
+from options import (
+    sleep_map, stress_map, cholesterol_map, bp_map, smoking_map, alcohol_map,
+    hba1c_map, glucose_map, symptom_scale, health_conditions_map, family_history_map,
+    genetic_test_map, exercise_freq_map, duration_map, intensity_map,
+    SEX_VALUES, ACTIVITY_LEVEL_VALUES
+)
+
+
+def _options(options_map):
+    """Literal type of the internal option keys of an option map"""
+    return Literal[tuple(options_map['en'])]
+
+
+Name = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+Symptom = _options(symptom_scale)
+FamilyHistory = _options(family_history_map)
+Condition = _options(health_conditions_map)
+
+
+class PersonalInfo(BaseModel):
+    name: Name
+    phone: str = ''
+    # Upper bounds match the number inputs of the questionnaire form
+    age: Annotated[int, Field(gt=0, le=120)]
+    sex: Literal[tuple(SEX_VALUES)]
+    height: Annotated[Union[int, float], Field(gt=0, le=300)]
+    weight: Annotated[Union[int, float], Field(gt=0, le=500)]
+    occupation: str = ''
+    activity_level: Literal[tuple(ACTIVITY_LEVEL_VALUES)]
+    waist_circumference: Annotated[Union[int, float], Field(gt=0, le=200)]
+
+
+class ActivityInfo(BaseModel):
+    exercise_frequency: _options(exercise_freq_map)
+    duration: _options(duration_map)
+    intensity: _options(intensity_map)
+
+
+class LifestyleInfo(BaseModel):
+    sleep_hours: _options(sleep_map)
+    stress_level: _options(stress_map)
+    smoking: _options(smoking_map)
+    alcohol: _options(alcohol_map)
+    total_cholesterol: _options(cholesterol_map)
+    blood_pressure_medication: _options(bp_map)
+    hba1c: _options(hba1c_map) = 'Unknown'  # Collected by the form, not used in scoring
+    fasting_glucose: _options(glucose_map)
+    frequent_hunger: Symptom
+    frequent_thirst: Symptom
+    frequent_urination: Symptom
+
+
+class Symptoms(BaseModel):
+    fatigue: Symptom
+    joint_pain: Symptom
+    digestive: Symptom
+    skin_issues: Symptom
+    headaches: Symptom
+    mood: Symptom
+    cognitive: Symptom
+    sleep_issues: Symptom
+
+
+class HealthInfo(BaseModel):
+    conditions: List[Condition] = ['None']
+    medications: str = ''
+    diabetes_history: FamilyHistory
+    cancer_history: FamilyHistory
+    cvd_history: FamilyHistory
+    symptoms: Symptoms
+
+    @field_validator('conditions')
+    @classmethod
+    def drop_none_when_other_conditions(cls, conditions):
+        if not conditions:
+            return ['None']
+        if len(conditions) > 1:
+            conditions = [c for c in conditions if c != 'None']
+        return conditions
+
+
+class GeneticInfo(BaseModel):
+    had_testing: _options(genetic_test_map)
+    findings: str = ''
+
+
+class Questionnaire(BaseModel):
+    personal: PersonalInfo
+    activity: ActivityInfo
+    lifestyle: LifestyleInfo
+    health: HealthInfo
+    genetic: GeneticInfo
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
+    submission_id: str = Field(default_factory=lambda: uuid.uuid4().hex)  # unique, unlike timestamps
+    form_date: str = ''  # date written on a paper form (bulk intake); ``timestamp`` is when it was stored
+
+
+QuestionnaireList = TypeAdapter(List[Questionnaire])
+
+
+def format_error(error):
+    """One-line description of a pydantic error dict, e.g. 'personal.age: Input should be greater than 0'"""
+    return f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+
+
+@contextmanager
+def _gc_paused():
+    # Validating a large batch allocates millions of container objects at
+    # once; the cyclic collector would rescan them repeatedly for no gain.
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def validate_questionnaires(payloads):
+    """Validate many payloads in (at most) two pydantic-core calls.
+
+    Returns ``(valid, errors)``: ``valid`` is a list of ``(index, Questionnaire)``
+    and ``errors`` maps the index of each rejected payload to its messages.
+    """
+    payloads = list(payloads)
+    with _gc_paused():
+        try:
+            return list(enumerate(QuestionnaireList.validate_python(payloads))), {}
+        except ValidationError as e:
+            errors = {}
+            for error in e.errors():
+                index, *loc = error['loc']
+                errors.setdefault(index, []).append(format_error({**error, 'loc': loc}))
+        ok_indexes = [i for i in range(len(payloads)) if i not in errors]
+        valid = QuestionnaireList.validate_python([payloads[i] for i in ok_indexes])
+    return list(zip(ok_indexes, valid)), errors
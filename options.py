@@ -0,0 +1,46 @@
+"""Questionnaire option maps.
+
+Each ``*_map`` maps the internal (English) option key, which is what gets
+stored and scored, to its display label per language. ``*_help`` holds the
+matching tooltip per language. The labels live in the translation catalogs
+(``locales/``, see ``i18n.py``) and are loaded per language on first use.
+"""
+from i18n import CatalogSection
+
+sleep_map = CatalogSection('options', 'sleep_map')
+sleep_map_help = CatalogSection('help', 'sleep_map_help')
+stress_map = CatalogSection('options', 'stress_map')
+stress_map_help = CatalogSection('help', 'stress_map_help')
+cholesterol_map = CatalogSection('options', 'cholesterol_map')
+cholesterol_map_help = CatalogSection('help', 'cholesterol_map_help')
+bp_map = CatalogSection('options', 'bp_map')
+bp_map_help = CatalogSection('help', 'bp_map_help')
+smoking_map = CatalogSection('options', 'smoking_map')
+smoking_map_help = CatalogSection('help', 'smoking_map_help')
+alcohol_map = CatalogSection('options', 'alcohol_map')
+alcohol_map_help = CatalogSection('help', 'alcohol_map_help')
+hba1c_map = CatalogSection('options', 'hba1c_map')
+hba1c_map_help = CatalogSection('help', 'hba1c_map_help')
+glucose_map = CatalogSection('options', 'glucose_map')
+glucose_map_help = CatalogSection('help', 'glucose_map_help')
+symptom_scale = CatalogSection('options', 'symptom_scale')
+health_conditions_map = CatalogSection('options', 'health_conditions_map')
+family_history_map = CatalogSection('options', 'family_history_map')
+genetic_test_map = CatalogSection('options', 'genetic_test_map')
+exercise_freq_map = CatalogSection('options', 'exercise_freq_map')
+exercise_freq_help = CatalogSection('help', 'exercise_freq_help')
+duration_map = CatalogSection('options', 'duration_map')
+duration_map_help = CatalogSection('help', 'duration_map_help')
+intensity_map = CatalogSection('options', 'intensity_map')
+intensity_map_help = CatalogSection('help', 'intensity_map_help')
+
+
+# Sex and work activity level are stored exactly as displayed in English or
+# Indonesian (the 'sex_options' / 'activity_options' UI strings). Languages
+# added later store the English value, so these lists stay fixed.
+DISPLAYED_VALUE_LANGUAGES = ('en', 'id')
+SEX_VALUES = ["Male", "Female", "Laki-laki", "Perempuan"]
+ACTIVITY_LEVEL_VALUES = [
+    "Sedentary", "Lightly active", "Moderately active", "Very active",
+    "Duduk terus-menerus", "Sedikit aktif", "Cukup aktif", "Sangat aktif"
+]
@@ -0,0 +1,242 @@
+"""Durable outbox for writes to remote sinks (Google Sheets).
+
+The app never calls a remote service while a user waits. ``enqueue`` writes
+the request as a small JSON file and fsyncs it before returning, then the
+worker process (``worker.py``) delivers it and deletes it. Entries move
+between directories below ``submissions/outbox/<queue>/`` by atomic renames:
+
+    tmp/      being written by the app
+    new/      committed, waiting for delivery
+    cur/      claimed by one worker (rename is atomic, so only one wins)
+    failed/   gave up after MAX_ATTEMPTS; inspect and move back to new/
+
+Every clinic (``tenants.py``) has its own queue, drained independently, so a
+slow or over-quota spreadsheet only delays its own rows.
+
+A worker that dies mid-delivery leaves its claims in ``cur/``; they go back
+to ``new/`` after CLAIM_TIMEOUT seconds. Delivery is therefore at least
+once: a request can be repeated, but never lost.
+"""
+import itertools
+import json
+import os
+import socket
+import time
+
+from storage import SUBMISSIONS_DIR, fsync_dir, fsync_file, submission_id
+
+OUTBOX_DIR = os.path.join(SUBMISSIONS_DIR, 'outbox')
+CLAIM_TIMEOUT = 300  # seconds a claimed entry may stay undelivered before it is retried
+MAX_ATTEMPTS = 100  # with the worker's backoff (up to 5 minutes) this covers a multi-hour outage
+MAX_CLAIM = 500  # entries claimed (and grouped into remote calls) per drain pass
+DEFAULT_QUEUE = 'default'
+
+_counter = itertools.count()
+
+
+def _dir(name, queue=DEFAULT_QUEUE):
+    return os.path.join(OUTBOX_DIR, queue, name)
+
+
+def queues():
+    """Names of the queues that have ever received an entry"""
+    try:
+        return sorted(name for name in os.listdir(OUTBOX_DIR) if os.path.isdir(_dir('new', name)))
+    except FileNotFoundError:
+        return []
+
+
+def _deliver_sheets(payloads):
+    import erasure
+    import sheets  # the app process never needs the Google client libraries
+    import tenants
+    by_sheet = {}
+    for payload in payloads:
+        by_sheet.setdefault((payload['tenant'], payload['sheet_id']), []).extend(payload['rows'])
+    for (tenant_id, sheet_id), rows in by_sheet.items():
+        first_row = sheets.append_rows(sheet_id, rows, tenant_id, tenants.get(tenant_id).get('credentials'))
+        try:
+            erasure.index_sheet_rows(tenant_id, sheet_id, first_row, [submission_id(row) for row in rows])
+        except Exception as e:  # delivered: a retry would duplicate the rows
+            print(f"DEBUG: Could not index sheet rows of {tenant_id} for erasure: {e}")
+
+
+def _erase_sheets(payloads):
+    import erasure
+    for payload in payloads:
+        # Entries queued before submission ids existed name the rows by timestamp, their legacy id
+        erasure.erase_sheet_rows(payload['tenant'], payload['sheet_id'],
+                                 payload.get('submissions', payload.get('timestamps')))
+
+
+# Sink name -> function delivering a list of payloads (several entries in one call)
+SINKS = {
+    'sheets': _deliver_sheets,
+    'sheets_erase': _erase_sheets,  # right to erasure, see erasure.py
+}
+
+
+def enqueue(sink, payload, queue=DEFAULT_QUEUE):
+    """Durably commit one request for ``sink`` to ``queue``; returns once it is on disk"""
+    if sink not in SINKS:
+        raise ValueError(f"unknown outbox sink {sink!r}")
+    for name in ('tmp', 'new'):
+        os.makedirs(_dir(name, queue), exist_ok=True)
+    # Sortable by creation time; host and pid keep replicas from colliding
+    entry = f"{time.time_ns():020d}-{socket.gethostname()}-{os.getpid()}-{next(_counter)}.1.json"
+    tmp_path = os.path.join(_dir('tmp', queue), entry)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'sink': sink, 'payload': payload}, f)
+        fsync_file(f)
+    os.rename(tmp_path, os.path.join(_dir('new', queue), entry))
+    fsync_dir(_dir('new', queue))
+    return entry
+
+
+def _attempts(entry):
+    return int(entry.rsplit('.', 2)[1])
+
+
+def _with_attempts(entry, attempts):
+    return f"{entry.rsplit('.', 2)[0]}.{attempts}.json"
+
+
+def release_stale_claims(queue=DEFAULT_QUEUE, now=None):
+    """Put entries claimed longer than CLAIM_TIMEOUT ago (a crashed worker) back in ``new/``"""
+    now = now or time.time()
+    released = 0
+    for entry in os.listdir(_dir('cur', queue)):
+        path = os.path.join(_dir('cur', queue), entry)
+        try:
+            if now - os.path.getmtime(path) < CLAIM_TIMEOUT:
+                continue
+            os.rename(path, os.path.join(_dir('new', queue), entry))
+            released += 1
+        except FileNotFoundError:  # delivered or released by another worker meanwhile
+            continue
+    return released
+
+
+def claim(queue=DEFAULT_QUEUE, limit=MAX_CLAIM):
+    """Move up to ``limit`` of the oldest committed entries into ``cur/``; returns their names"""
+    claimed = []
+    for entry in sorted(os.listdir(_dir('new', queue))):
+        source = os.path.join(_dir('new', queue), entry)
+        try:
+            os.utime(source)  # the claim time, for release_stale_claims
+            os.rename(source, os.path.join(_dir('cur', queue), entry))
+        except FileNotFoundError:  # another worker got it first
+            continue
+        claimed.append(entry)
+        if len(claimed) >= limit:
+            break
+    return claimed
+
+
+def _retry(entries, queue):
+    for entry in entries:
+        attempts = _attempts(entry) + 1
+        target = _dir('new', queue) if attempts <= MAX_ATTEMPTS else _dir('failed', queue)
+        try:
+            os.rename(os.path.join(_dir('cur', queue), entry), os.path.join(target, _with_attempts(entry, attempts)))
+        except FileNotFoundError:
+            continue
+        if attempts > MAX_ATTEMPTS:
+            print(f"DEBUG: Outbox entry {entry} failed {MAX_ATTEMPTS} times, moved to {target}.")
+
+
+def drain(queue=DEFAULT_QUEUE, limit=MAX_CLAIM):
+    """Deliver one batch of entries of ``queue``; returns ``(delivered, failed)`` entry counts"""
+    for name in ('new', 'cur', 'failed'):
+        os.makedirs(_dir(name, queue), exist_ok=True)
+    release_stale_claims(queue)
+    entries = claim(queue, limit)
+    by_sink = {}
+    for entry in entries:
+        try:
+            with open(os.path.join(_dir('cur', queue), entry), encoding='utf-8') as f:
+                request = json.load(f)
+            by_sink.setdefault(request['sink'], []).append((entry, request['payload']))
+        except (ValueError, KeyError) as e:  # unreadable entries can never succeed
+            print(f"DEBUG: Outbox entry {entry} is unreadable ({e}), moved to {_dir('failed', queue)}.")
+            os.rename(os.path.join(_dir('cur', queue), entry), os.path.join(_dir('failed', queue), entry))
+    delivered = failed = 0
+    for sink, items in by_sink.items():
+        names = [entry for entry, _ in items]
+        try:
+            SINKS[sink]([payload for _, payload in items])
+        except Exception as e:  # network, quota and auth errors alike: retry later
+            print(f"DEBUG: Outbox delivery to {sink} failed ({len(items)} entries): {e}")
+            _retry(names, queue)
+            failed += len(names)
+            continue
+        for entry in names:
+            try:
+                os.remove(os.path.join(_dir('cur', queue), entry))
+            except FileNotFoundError:  # released as stale and re-claimed meanwhile
+                pass
+        delivered += len(names)
+    return delivered, failed
+
+
+def pending_payloads(queue=DEFAULT_QUEUE, sink='sheets'):
+    """Payloads of ``sink`` in ``queue`` not yet delivered (in ``new/`` or ``cur/``)"""
+    payloads = []
+    for name in ('new', 'cur'):
+        try:
+            entries = os.listdir(_dir(name, queue))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            try:
+                with open(os.path.join(_dir(name, queue), entry), encoding='utf-8') as f:
+                    request = json.load(f)
+            except (OSError, ValueError):  # delivered or moved meanwhile
+                continue
+            if request.get('sink') == sink:
+                payloads.append(request['payload'])
+    return payloads
+
+
+def remove_failed_rows(queue, submissions):
+    """Drop the sheet rows of the submission ids ``submissions`` from dead entries in ``failed/``; returns the number removed"""
+    removed = 0
+    try:
+        entries = os.listdir(_dir('failed', queue))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        path = os.path.join(_dir('failed', queue), entry)
+        try:
+            with open(path, encoding='utf-8') as f:
+                request = json.load(f)
+            rows = request['payload']['rows']
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        kept = [row for row in rows if submission_id(row) not in submissions]
+        if len(kept) == len(rows):
+            continue
+        removed += len(rows) - len(kept)
+        if not kept:
+            os.remove(path)
+            continue
+        request['payload']['rows'] = kept
+        tmp_path = os.path.join(_dir('tmp', queue), entry)
+        os.makedirs(_dir('tmp', queue), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(request, f)
+            fsync_file(f)
+        os.replace(tmp_path, path)
+    if removed:
+        fsync_dir(_dir('failed', queue))
+    return removed
+
+
+def backlog(queue=DEFAULT_QUEUE):
+    """Number of entries of ``queue`` waiting in ``new/`` and ``cur/``, and dead entries in ``failed/``"""
+    def count(name):
+        try:
+            return len(os.listdir(_dir(name, queue)))
+        except FileNotFoundError:
+            return 0
+    return {'pending': count('new') + count('cur'), 'failed': count('failed')}
@@ -0,0 +1,150 @@
+"""Streaming population percentiles for risk scores.
+
+One mergeable sketch per (risk category, age group) answers "higher than X%
+of respondents your age" without touching the archive. Risk scores live in
+[0, 1] and are shown to 0.1%, so each sketch is a fixed 1000-bin histogram:
+exact at display resolution, O(1) to update, trivially mergeable across
+replicas and O(1) to query once its cumulative counts are cached.
+
+Each process keeps the merged population in memory plus the submissions it
+has not persisted yet. A background thread adds those pending counts to the
+shared file under a lock every FLUSH_SECONDS (sooner once FLUSH_EVERY are
+pending), which also picks up what other replicas flushed; lookups on the
+results page never touch the file.
+"""
+import atexit
+import os
+import threading
+
+import numpy as np
+
+from aggregates import RISK_CATEGORIES, age_group, iter_archive_scores
+from storage import SUBMISSIONS_DIR, CSV_PATH, file_lock
+
+PERCENTILES_PATH = os.path.join(SUBMISSIONS_DIR, 'percentiles.npz')
+BINS = 1000
+MIN_POPULATION = 30  # Don't compare against fewer respondents than this
+FLUSH_EVERY = 50  # Pending submissions before a flush
+FLUSH_SECONDS = 60  # ...or seconds since the last flush
+
+
+class ScoreSketch:
+    """Fixed-resolution mergeable quantile sketch over scores in [0, 1]"""
+    __slots__ = ('counts', '_below')
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(BINS, dtype=np.int64) if counts is None else counts
+        self._below = None
+
+    @staticmethod
+    def bin(score):
+        return min(int(score * BINS), BINS - 1)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def add(self, score):
+        self.counts[self.bin(score)] += 1
+        self._below = None
+
+    def merge(self, other):
+        self.counts += other.counts
+        self._below = None
+
+    def percentile(self, score):
+        """Percentage of the population with a lower score, or None if too few"""
+        if self._below is None:
+            # _below[i] = number of scores in bins strictly below bin i; last entry = total
+            self._below = np.concatenate(([0], np.cumsum(self.counts)))
+        total = self._below[-1]
+        if total < MIN_POPULATION:
+            return None
+        return 100.0 * self._below[self.bin(score)] / total
+
+
+def _key(category, group):
+    return f"{category}|{group}"
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as data:
+        return {key: ScoreSketch(data[key].copy()) for key in data.files}
+
+
+def _save(path, sketches):
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **{key: sketch.counts for key, sketch in sketches.items()})
+    os.replace(tmp_path, path)
+
+
+class PercentileStore:
+    """Process-wide sketches: merged population plus not-yet-persisted counts"""
+
+    def __init__(self, path=PERCENTILES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_count = 0
+        self._sketches = _load(path)
+        self._wake = threading.Event()
+        atexit.register(self.flush)
+        threading.Thread(target=self._flush_forever, name='percentile-flusher', daemon=True).start()
+
+    def record(self, age, risk_scores):
+        """Add the scores of one stored submission"""
+        group = age_group(age)
+        with self._lock:
+            for category in RISK_CATEGORIES:
+                if category not in risk_scores:
+                    continue
+                key = _key(category, group)
+                self._sketches.setdefault(key, ScoreSketch()).add(risk_scores[category])
+                self._pending.setdefault(key, ScoreSketch()).add(risk_scores[category])
+            self._pending_count += 1
+            if self._pending_count >= FLUSH_EVERY:
+                self._wake.set()
+
+    def percentile(self, category, age, score):
+        """Percentage of same-age-group respondents with a lower score (None if unknown); in memory only"""
+        sketch = self._sketches.get(_key(category, age_group(age)))
+        return None if sketch is None else sketch.percentile(score)
+
+    def _flush_forever(self):
+        while True:
+            self._wake.wait(FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:  # the counts stay pending for the next attempt
+                print(f"DEBUG: Percentile flush failed: {e}")
+
+    def flush(self):
+        """Persist pending counts and refresh the population from the shared file"""
+        with self._lock:
+            with file_lock(self.path):
+                persisted = _load(self.path)
+                for key, sketch in self._pending.items():
+                    persisted.setdefault(key, ScoreSketch()).merge(sketch)
+                if self._pending:
+                    _save(self.path, persisted)
+            self._pending, self._pending_count = {}, 0
+            self._sketches = persisted
+
+
+def rebuild_from_csv(csv_path=CSV_PATH, path=PERCENTILES_PATH):
+    """Recreate the sketches from the submissions CSV and its rotated archives (one-off backfill)"""
+    sketches = {}
+    for _, age, _, risk_scores in iter_archive_scores(csv_path):
+        group = age_group(age)
+        for category, score in risk_scores.items():
+            sketches.setdefault(_key(category, group), ScoreSketch()).add(score)
+    with file_lock(path):
+        _save(path, sketches)
+
+
+if __name__ == "__main__":
+    rebuild_from_csv()
+    print(f"Rebuilt {PERCENTILES_PATH} from {CSV_PATH} and its rotated archives")
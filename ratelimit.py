@@ -0,0 +1,91 @@
+"""Submission rate limiting per client address and per browser session.
+
+Each limiter keeps a sliding-window counter per key (the counts of the
+current and previous fixed window, weighted by how far the current window
+has progressed) in an LRU of at most ``max_keys`` entries, so memory stays
+bounded however many clients show up. nginx's ``ip_hash`` sends a client to
+the same replica every time, so per-process counters are enough.
+
+Limits are ``<count>/<seconds>`` strings, e.g. ``RATE_LIMIT_SESSION=5/600``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def parse_limit(value):
+    """'5/600' -> (5, 600.0)"""
+    count, _, seconds = value.partition('/')
+    return int(count), float(seconds)
+
+
+class SlidingWindowLimiter:
+    """At most ``limit`` events per ``window`` seconds per key"""
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [window index, count in it, count in the previous one]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted_keys = 0
+
+    def _estimate(self, bucket, now):
+        index = int(now // self.window)
+        if bucket[0] != index:
+            bucket[2] = bucket[1] if bucket[0] == index - 1 else 0
+            bucket[0], bucket[1] = index, 0
+        elapsed = now / self.window - index
+        return bucket[1] + bucket[2] * (1 - elapsed)
+
+    def allow(self, key, now=None):
+        """Count an event for ``key`` and return True, or return False if it is over the limit"""
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [int(now // self.window), 0, 0]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evicted_keys += 1
+            else:
+                self._buckets.move_to_end(key)
+            if self._estimate(bucket, now) + 1 > self.limit:
+                self.rejected += 1
+                return False
+            bucket[1] += 1
+            self.allowed += 1
+            return True
+
+    def stats(self):
+        return {'allowed': self.allowed, 'rejected': self.rejected,
+                'keys': len(self._buckets), 'evicted_keys': self.evicted_keys}
+
+
+# A clinic's respondents often share one public address, so the address limit
+# is much higher than the per-browser one
+SESSION_LIMITER = SlidingWindowLimiter(*parse_limit(os.getenv('RATE_LIMIT_SESSION', '5/600')))
+ADDRESS_LIMITER = SlidingWindowLimiter(*parse_limit(os.getenv('RATE_LIMIT_ADDRESS', '60/600')))
+
+
+def allow_submission(address, session_id):
+    """Whether this client may store another submission now.
+
+    A session over its limit is rejected without using up its address's
+    budget, so one looping browser cannot lock out others behind the same NAT.
+    """
+    if not SESSION_LIMITER.allow(session_id):
+        print(f"DEBUG: Rate limited session {session_id[:8]} ({address}).")
+        return False
+    if address and not ADDRESS_LIMITER.allow(address):
+        print(f"DEBUG: Rate limited address {address}.")
+        return False
+    return True
+
+
+def stats():
+    """Counters per limiter, for the admin page"""
+    return {'session': SESSION_LIMITER.stats(), 'address': ADDRESS_LIMITER.stats()}
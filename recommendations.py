@@ -0,0 +1,170 @@
+"""Personalized recommendations and product call-to-action per risk category.
+
+Free of Streamlit so the app and the scoring API share the same rules. The
+rules are evaluated once per language, on its first use, for every
+combination of risk category, band, age group and feature flags;
+``generate_recommendations`` is then a handful of dictionary lookups.
+"""
+import threading
+
+from i18n import CatalogSection
+from model_registry import active_model
+
+# Recommendation texts per group and language (translation catalogs, see i18n.py)
+RECOMMENDATIONS = {
+    group: CatalogSection('recommendations', group)
+    for group in ('metabolic', 'cvd', 'diabetes', 'cancer')
+}
+PRODUCT_CAPTIONS = CatalogSection('products')
+
+# Call-to-action chat links for each product
+WHATSAPP_LINKS = {
+    "metabolic": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20atau%20menengah%20untuk%20penyakit%20metabolik%20dan%20gaya%20hidup.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20Genme%20Life%3F",
+    "diabetes": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20atau%20menengah%20untuk%20penyakit%20diabetes.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20Medical%20Check%20Up%3F",
+    "cvd": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20atau%20menengah%20untuk%20penyakit%20kardiovaskular.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20StrokeGENME%3F",
+    "cancer": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20menengah%20untuk%20penyakit%20kanker.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20KalScreen%3F",
+    "cancer_high_risk": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab!%2C%20Setelah%20saya%20menggunakan%20DNA%20CARE%20Calculator%2C%20saya%20memiliki%20risiko%20tinggi%20%20untuk%20penyakit%20kanker.%20Apakah%20bisa%20diinfokan%20lebih%20lanjut%20mengenai%20tes%20Spot-Mas%3F",
+    # "Take action" buttons under the results
+    "promo": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab%2C%20apakah%20ada%20promo%20untuk%20produk%20GENME%3F%20apakah%20saya%20bisa%20mendapatkan%20informasi%20lebih%20lanjut",
+    "inquiry": "https://api.whatsapp.com/send?phone=6281510068080&text=Halo%20CR%20KALGen%20Innolab%2C%20saya%20tertarik%20dengan%20produk%20GENME%2C%20apakah%20saya%20bisa%20mendapatkan%20informasi%20lebih%20lanjut%3F",
+}
+
+# Product panel per product key (captions come from PRODUCT_CAPTIONS)
+PRODUCTS = {
+    'genme_life': {
+        'image': 'assets/GENME_LIFE.png',
+        'cta': 'metabolic',  # key of WHATSAPP_LINKS (clinics may override it, see tenants.py)
+    },
+    'strokegenme': {
+        'image': 'assets/StrokeGENME.png',
+        'cta': 'cvd',
+    },
+    'mcu': {
+        'image': 'assets/MCU.jpg',
+        'cta': 'diabetes',
+    },
+    'kalscanner69': {
+        'image': 'assets/Kalscanner69.png',
+        'cta': 'cancer',
+    },
+    'spotmas': {
+        'image': 'assets/spotmas.jpeg',
+        'cta': 'cancer_high_risk',
+    },
+}
+
+# Feature flags that add extra recommendations
+FLAG_BMI, FLAG_SMOKING, FLAG_ALCOHOL, FLAG_STRESS, FLAG_SYMPTOMS = 1, 2, 4, 8, 16
+HIGH_RISK_SCORE = 0.5  # above this a category is "high" (e.g. SpotMas instead of Kalscanner69)
+OLDER_AGE = 40
+
+# risk_key -> (RECOMMENDATIONS group, number of base items, [(flag, extra item index)], product)
+RULES = {
+    'metabolic_lifestyle': ('metabolic', 5, [(FLAG_BMI, 5), (FLAG_SMOKING, 6)], 'genme_life'),
+    'cvd_stroke': ('cvd', 5, [(FLAG_SMOKING, 5), (FLAG_STRESS, 6)], 'strokegenme'),
+    'diabetes': ('diabetes', 5, [(FLAG_BMI, 5), (FLAG_SYMPTOMS, 6)], 'mcu'),
+    'cancer': ('cancer', 4, [(FLAG_SMOKING, 4), (FLAG_ALCOHOL, 5)], 'kalscanner69'),
+}
+
+
+# (flag, feature, threshold): the flag is set when the feature is above the threshold
+FLAG_RULES = [
+    (FLAG_BMI, 'bmi', 25),
+    (FLAG_SMOKING, 'smoking_risk', 0.5),
+    (FLAG_ALCOHOL, 'alcohol_risk', 0.5),
+    (FLAG_STRESS, 'stress_score', 0.6),
+    (FLAG_SYMPTOMS, 'diabetes_symptoms', 0.5),
+]
+
+
+def feature_flags(features):
+    """Bit set of the FLAG_* conditions that hold for ``features``"""
+    flags = 0
+    for flag, feature, threshold in FLAG_RULES:
+        if features[feature] > threshold:
+            flags |= flag
+    return flags
+
+
+def _product(risk_key, band, older):
+    if risk_key == 'cancer' and band == 'high' and older:
+        return 'spotmas'
+    return RULES[risk_key][3]
+
+
+# Flags each category looks at; the others are masked out of the lookup key
+FLAG_MASKS = {risk_key: sum(flag for flag, _ in extras) for risk_key, (_, _, extras, _) in RULES.items()}
+
+
+def rule_table():
+    """Evaluate the rules for every (risk_key, band, older, flags) combination, language-independently.
+
+    Maps each combination to its RECOMMENDATIONS group, the indices of the
+    items shown and the product key. Also exported to the static calculator.
+    """
+    table = {}
+    for risk_key, (group, n_base, extras, _) in RULES.items():
+        for band in ('elevated', 'high'):
+            for older in (False, True):
+                for flags in range(FLAG_MASKS[risk_key] + 1):
+                    if flags & ~FLAG_MASKS[risk_key]:
+                        continue
+                    table[(risk_key, band, older, flags)] = {
+                        'group': group,
+                        'items': list(range(n_base)) + [i for flag, i in extras if flags & flag],
+                        'product': _product(risk_key, band, older),
+                    }
+    return table
+
+
+def _compile_bundles(lang):
+    """The rule table with the texts, captions and links of ``lang`` filled in"""
+    captions = PRODUCT_CAPTIONS[lang]
+    bundles = {}
+    for (risk_key, band, older, flags), rule in rule_table().items():
+        items = RECOMMENDATIONS[rule['group']][lang]
+        product_key = rule['product']
+        bundles[(risk_key, band, older, flags)] = {
+            'risk_key': risk_key,
+            'recommendations': tuple(items[i] for i in rule['items']),
+            'product': {
+                'image': PRODUCTS[product_key]['image'],
+                'caption': captions[product_key],
+                'cta': PRODUCTS[product_key]['cta'],
+                'link': WHATSAPP_LINKS[PRODUCTS[product_key]['cta']],
+            },
+        }
+    return bundles
+
+
+_BUNDLES = {}  # lang -> compiled bundles, built on first use of the language
+_bundles_lock = threading.Lock()
+
+
+def bundles(lang):
+    compiled = _BUNDLES.get(lang)
+    if compiled is None:
+        with _bundles_lock:
+            compiled = _BUNDLES.setdefault(lang, _compile_bundles(lang))
+    return compiled
+
+
+def generate_recommendations(risk_scores, features, lang='en', model=None):
+    """Personalized recommendations and product CTA per risk category.
+
+    Returns a list of ``{'risk_key', 'recommendations', 'product'}`` bundles
+    for the categories at or above the thresholds of the scoring model, in
+    display order. Bundles are shared, precompiled objects: do not mutate them.
+    """
+    thresholds = (model or active_model()).recommendation_thresholds
+    compiled = bundles(lang)
+    flags = feature_flags(features)
+    older = features['age'] > OLDER_AGE
+    recommendations = []
+    for risk_key in RULES:
+        score = risk_scores.get(risk_key)
+        if score is None or score < thresholds[risk_key]:
+            continue
+        band = 'high' if score > HIGH_RISK_SCORE else 'elevated'
+        recommendations.append(compiled[(risk_key, band, older, flags & FLAG_MASKS[risk_key])])
+    return recommendations
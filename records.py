@@ -0,0 +1,82 @@
+"""Compact, fixed-type feature records for batch work.
+
+``process_questionnaire_data`` returns a small dict, which is convenient for
+one respondent but costs about 577 bytes per record (tracemalloc over 2,000
+synthetic respondents). For archive-scale jobs the same fields are packed
+into a NumPy structured array with ``FEATURE_DTYPE`` (94 bytes per record).
+Each field of such an array is a strided view (``records['bmi']``), so the
+batch scorer, recommendations and other stages read it in place without
+building per-record objects.
+
+That is about a 6x saving, not the 10x first aimed for. Getting there would
+mean storing the float fields as ``u1`` codes decoded through lookup tables
+in every consumer (scoring, calibration, share links); 6x is accepted to keep
+the fields plain float64 views that score exactly like the scalar path.
+"""
+from itertools import islice
+
+import numpy as np
+
+from scoring import process_questionnaire_data
+
+# Same keys as process_questionnaire_data. Floats are kept as float64 so batch
+# scoring gives bit-for-bit the scores of the scalar path (float32 shifted
+# stored percentages and, on band edges, risk bands).
+FEATURE_FIELDS = [
+    ('age', 'i2'),
+    ('bmi', 'f8'),
+    ('gender_male', '?'),
+    ('waist_circumference', 'f8'),
+    ('met_hours', 'f8'),
+    ('sleep_score', 'f8'),
+    ('stress_score', 'f8'),
+    ('smoking_risk', 'f8'),
+    ('alcohol_risk', 'u1'),
+    ('total_cholesterol', 'i2'),
+    ('bp_medication', 'f8'),
+    ('fasting_glucose', 'i2'),
+    ('diabetes_symptoms', 'f8'),
+    ('health_condition_score', 'f8'),
+    ('symptom_severity', 'f8'),
+    ('diabetes_family_history', 'u1'),
+    ('cancer_family_history', 'u1'),
+    ('cvd_family_history', 'u1'),
+    ('has_diabetes', '?'),
+    ('has_cvd', '?'),
+    ('has_cancer', '?'),
+]
+FEATURE_DTYPE = np.dtype(FEATURE_FIELDS)
+FEATURE_NAMES = FEATURE_DTYPE.names
+
+
+def pack_features(features, count=-1):
+    """Pack an iterable of feature dicts into one contiguous structured array"""
+    return np.fromiter(
+        (tuple(f[name] for name in FEATURE_NAMES) for f in features),
+        dtype=FEATURE_DTYPE, count=count,
+    )
+
+
+def featurize(questionnaires, count=-1):
+    """Structured feature array for nested questionnaire dicts, without keeping the per-record dicts"""
+    return pack_features(map(process_questionnaire_data, questionnaires), count)
+
+
+def iter_feature_chunks(questionnaires, chunk_size=100000):
+    """Featurize a (possibly huge) stream of questionnaires in bounded-size chunks"""
+    questionnaires = iter(questionnaires)
+    while True:
+        chunk = featurize(islice(questionnaires, chunk_size))
+        if not len(chunk):
+            return
+        yield chunk
+
+
+def columns(records):
+    """Field name -> column view of a structured feature array (no copies)"""
+    return {name: records[name] for name in records.dtype.names}
+
+
+def unpack(record):
+    """One packed record back as a plain ``process_questionnaire_data``-style dict"""
+    return dict(zip(FEATURE_NAMES, record.item()))
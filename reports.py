@@ -0,0 +1,237 @@
+"""Printable PDF reports of the results page, rendered off the script thread.
+
+A report holds the risk scores and bands, the recommendations with their
+product panels and the clinic's contact links, in the respondent's language.
+Rendering takes a noticeable fraction of a second, so ``request`` hands it
+to a small thread pool and the page polls ``status`` until the file exists.
+
+Reports are content-addressed: the file name is a hash of the answers, the
+scoring-model version, the language and the clinic's links, so the same
+results never render twice and every replica (sharing ``submissions/``)
+serves them from ``submissions/reports/``. The cache is bounded to
+REPORT_CACHE_BYTES; the least recently downloaded reports are deleted first.
+
+fpdf2 needs a Unicode TTF font for Indonesian text (``REPORT_FONT``, DejaVu
+Sans by default; the Docker image installs it). Without it the built-in
+Helvetica is used and characters outside Latin-1 are replaced.
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import erasure
+import i18n
+from storage import SUBMISSIONS_DIR
+
+REPORTS_DIR = os.path.join(SUBMISSIONS_DIR, 'reports')
+REPORT_CACHE_BYTES = int(os.getenv('REPORT_CACHE_MB', '200')) * 1024 * 1024
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+REPORT_FONT = os.getenv('REPORT_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+REPORT_FONT_BOLD = os.getenv('REPORT_FONT_BOLD', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
+PRODUCT_IMAGE_MM = 45
+PRODUCT_IMAGE_PX = 300  # about 170 dpi at PRODUCT_IMAGE_MM
+
+# Same order and labels as the results page
+CATEGORIES = [
+    ('metabolic_lifestyle', 'category_metabolic'),
+    ('cvd_stroke', 'category_cvd'),
+    ('diabetes', 'category_diabetes'),
+    ('cancer', 'category_cancer'),
+]
+# Emoji and pictographs: no printable font has them
+EMOJI = re.compile('[\U0001F000-\U0001FFFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]')
+
+LANG = i18n.CatalogSection('ui')
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='pdf-report')
+_jobs_lock = threading.Lock()
+_jobs = {}  # key -> Future of a report being rendered (or that failed)
+
+
+def report_key(questionnaire_data, model_version, lang, links):
+    """Content hash identifying a report"""
+    inputs = {'answers': questionnaire_data, 'model_version': model_version, 'lang': lang, 'links': links}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def report_path(key):
+    return os.path.join(REPORTS_DIR, f'{key}.pdf')
+
+
+def cached_report(key):
+    """Path of a finished report (marking it recently used), or None"""
+    path = report_path(key)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def status(key):
+    """'ready', 'failed' or 'pending'"""
+    if os.path.exists(report_path(key)):
+        return 'ready'
+    with _jobs_lock:
+        job = _jobs.get(key)
+    if job is not None and job.done() and job.exception() is not None:
+        return 'failed'
+    return 'pending'
+
+
+def request(key, questionnaire_data, risk_scores, recommendations, model_version, lang, links):
+    """Start rendering report ``key`` unless it exists or is already being rendered; returns immediately"""
+    if os.path.exists(report_path(key)):
+        return
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and not job.done():
+            return
+        _jobs[key] = _executor.submit(_render_to_cache, key, questionnaire_data, risk_scores,
+                                      recommendations, model_version, lang, links)
+
+
+def _render_to_cache(key, *args):
+    try:
+        pdf = render(*args)
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        path = report_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        erasure.index_report(args[0], path)
+        print(f"DEBUG: Rendered PDF report {key[:12]} ({len(pdf) / 1024:.0f} KB).")
+        evict()
+    except Exception as e:
+        print(f"DEBUG: PDF report {key[:12]} failed: {e}")
+        raise
+    with _jobs_lock:
+        _jobs.pop(key, None)  # done; the file is the result now
+
+
+def evict(max_bytes=None):
+    """Delete least recently used reports until the cache fits in ``max_bytes``; returns the number deleted"""
+    max_bytes = REPORT_CACHE_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = [entry for entry in os.scandir(REPORTS_DIR) if entry.name.endswith('.pdf')]
+    except FileNotFoundError:
+        return 0
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:  # evicted by another replica meanwhile
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    if deleted:
+        print(f"DEBUG: Evicted {deleted} cached PDF report(s).")
+    return deleted
+
+
+def _new_pdf():
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.set_image_filter('DCTDecode')  # JPEG: photos at a fraction of the size
+    if os.path.exists(REPORT_FONT):
+        pdf.add_font('report', '', REPORT_FONT)
+        pdf.add_font('report', 'B', REPORT_FONT_BOLD if os.path.exists(REPORT_FONT_BOLD) else REPORT_FONT)
+        pdf.report_font = 'report'
+    else:
+        pdf.report_font = 'Helvetica'
+    pdf.add_page()
+    return pdf
+
+
+@functools.lru_cache(maxsize=None)
+def _product_image(path):
+    """A product photo shrunk to print size, once per process (decoding the originals dominates rendering)"""
+    from PIL import Image
+    with Image.open(path) as image:
+        image = image.convert('RGB')
+    image.thumbnail((PRODUCT_IMAGE_PX, PRODUCT_IMAGE_PX * 4))
+    return image
+
+
+def _text(pdf, text):
+    text = EMOJI.sub('', str(text)).strip()
+    if pdf.report_font == 'Helvetica':
+        text = text.encode('latin-1', 'replace').decode('latin-1')
+    return text
+
+
+def _write(pdf, text, size=10, style='', link=''):
+    pdf.set_font(pdf.report_font, style, size)
+    pdf.multi_cell(0, size * 0.5, _text(pdf, text), link=link, new_x='LMARGIN', new_y='NEXT')
+
+
+def render(questionnaire_data, risk_scores, recommendations, model_version, lang, links):
+    """The report as PDF bytes"""
+    T = LANG[lang]
+    pdf = _new_pdf()
+    _write(pdf, T['results_title'], 16, 'B')
+    personal = questionnaire_data['personal']
+    _write(pdf, f"{T['name']}: {personal['name']}    {T['age']}: {personal['age']}", 10)
+    _write(pdf, f"{questionnaire_data['timestamp'][:10]}  ·  {model_version}  ·  "
+                f"{datetime.now():%Y-%m-%d %H:%M}", 8)
+    pdf.ln(3)
+
+    _write(pdf, T['result_header'], 13, 'B')
+    _write(pdf, T['result_subtext'], 9)
+    for risk_key, label_key in CATEGORIES:
+        value = risk_scores.get(risk_key)
+        if value is None:
+            level = T['risk_na']
+            shown = 'N/A'
+        else:
+            level = T['risk_level_low'] if value < 0.3 else T['risk_level_moderate'] if value < 0.5 else T['risk_level_high']
+            shown = f"{value * 100:.1f}%"
+        pdf.set_font(pdf.report_font, 'B', 11)
+        pdf.cell(75, 7, _text(pdf, T[label_key]))
+        pdf.cell(25, 7, shown)
+        pdf.set_font(pdf.report_font, '', 10)
+        pdf.cell(0, 7, _text(pdf, level), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(3)
+
+    _write(pdf, T['recommendation_header'], 13, 'B')
+    if recommendations:
+        labels = dict(CATEGORIES)
+        for rec_cat in recommendations:
+            pdf.ln(2)
+            _write(pdf, T[labels[rec_cat['risk_key']]], 11, 'B')
+            _write(pdf, T['recommendations_label'], 10, 'B')
+            for i, rec in enumerate(rec_cat['recommendations'], 1):
+                _write(pdf, f"{i}. {rec}")
+            product = rec_cat['product']
+            _write(pdf, T['recommended_product'], 10, 'B')
+            if os.path.exists(product['image']):
+                pdf.image(_product_image(product['image']), w=PRODUCT_IMAGE_MM)
+            _write(pdf, product['caption'], 9)
+            _write(pdf, T['check_promo'], 9, link=links[product['cta']])
+    else:
+        _write(pdf, T['low_risk_success'])
+        _write(pdf, T['general_maintenance'], 10, 'B')
+        for i, key in enumerate(['maintain_habits', 'regular_checkups', 'stay_active', 'monitor_changes'], 1):
+            _write(pdf, f"{i}. {T[key]}")
+    pdf.ln(3)
+
+    _write(pdf, T['take_action_header'], 13, 'B')
+    _write(pdf, T['promo_button'], 10, link=links['promo'])
+    _write(pdf, T['inquiry_button'], 10, link=links['inquiry'])
+    return bytes(pdf.output())
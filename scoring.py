@@ -0,0 +1,385 @@
+"""Risk scoring: questionnaire answers -> numerical features -> risk scores.
+
+Kept free of Streamlit so the same code serves the UI, batch jobs and
+services. ``calculate_risk_scores_batch`` is the NumPy twin of
+``calculate_risk_scores`` for scoring many feature vectors in one call.
+Weights and thresholds come from a versioned ``ScoringModel``
+(``model_registry.py``); every function defaults to the active version.
+"""
+import bisect
+import math
+
+import numpy as np
+
+from model_registry import active_model
+
+
+def process_questionnaire_data(data):
+    """Process questionnaire responses into numerical features"""
+    features = {}
+    
+    # Process demographic features
+    features['age'] = data['personal']['age']
+    features['bmi'] = data['personal']['weight'] / ((data['personal']['height']/100) ** 2)
+    features['gender_male'] = 1 if data['personal']['sex'] in MALE_VALUES else 0
+    features['waist_circumference'] = data['personal']['waist_circumference']
+    
+    # Process activity features
+    features['met_hours'] = calculate_met_hours(data['activity'])
+    
+    # Process lifestyle features
+    features['sleep_score'] = calculate_sleep_score(data['lifestyle'])
+    features['stress_score'] = calculate_stress_score(data['lifestyle'])
+    features['smoking_risk'] = calculate_smoking_risk(data['lifestyle'])
+    features['alcohol_risk'] = 1 if data['lifestyle']['alcohol'] == 'Yes' else 0
+    features['total_cholesterol'] = map_cholesterol_level(data['lifestyle']['total_cholesterol'])
+    features['bp_medication'] = map_bp_medication(data['lifestyle']['blood_pressure_medication'])
+    # features['hba1c'] = map_hba1c_level(data['lifestyle']['hba1c'])  # Removed from calculations
+    features['fasting_glucose'] = map_fasting_glucose_level(data['lifestyle']['fasting_glucose'])
+    features['diabetes_symptoms'] = calculate_diabetes_symptoms(data['lifestyle'])
+    
+    # Process health features
+    features['health_condition_score'] = calculate_health_condition_score(data['health'])
+    features['symptom_severity'] = calculate_symptom_severity(data['health'])
+    features['diabetes_family_history'] = map_family_history(data['health']['diabetes_history'])
+    features['cancer_family_history'] = map_family_history(data['health']['cancer_history'])
+    features['cvd_family_history'] = map_family_history(data['health']['cvd_history'])
+    
+    # Current conditions flags
+    features['has_diabetes'] = 'Diabetes' in data['health']['conditions']
+    features['has_cvd'] = 'Cardiovascular disease' in data['health']['conditions']
+    features['has_cancer'] = 'Cancer' in data['health']['conditions']
+    
+    return features
+
+# Answer -> value tables of the feature extraction below. Module-level data so
+# the static calculator (build_static.py) can export them unchanged.
+INTENSITY_MET = {
+    'Light': 2.5,
+    'Medium': 4.5,
+    'Vigorous': 7.0,
+    'Very vigorous': 10.0
+}
+EXERCISE_TIMES_PER_WEEK = {
+    'Never': 0,
+    '1-2 times per week': 1.5,
+    '3-4 times per week': 3.5,
+    '5+ times per week': 5.5
+}
+DURATION_HOURS = {
+    '<15 minutes': 0.25,
+    '15-30 minutes': 0.375,
+    '30-45 minutes': 0.625,
+    '45-60 minutes': 0.875,
+    '60+ minutes': 1.25
+}
+SLEEP_SCORES = {
+    '< 5 hours (insufficient)': 0.2,
+    '5-7 hours (below optimal)': 0.6,
+    '7-9 hours (optimal)': 1.0,
+    '9+ hours (excessive)': 0.6
+}
+STRESS_SCORES = {
+    'Low': 0.2,
+    'Moderate': 0.4,
+    'High': 0.7,
+    'Very high': 1.0
+}
+SMOKING_RISK = {
+    'Non-smoker': 0.0,
+    'Passive smoker': 0.3,
+    'Active smoker': 1.0
+}
+CHOLESTEROL_MG_DL = {
+    'Low (<200 mg/dL)': 180,
+    'Medium (200-239 mg/dL)': 220,
+    'High (≥240 mg/dL)': 260,
+    'Unknown': 200  # Use average value
+}
+BP_MEDICATION = {
+    'No': 0,
+    'Not routine': 0.5,
+    'Yes routinely': 1
+}
+# HBA1C = {'<5.7% (normal)': 5.4, '5.7-6.4% (prediabetes)': 6.0, '>6.5% (diabetes)': 7.5, 'Unknown': 5.7}
+# DISABLED: HbA1c is collected but not used in calculations
+FASTING_GLUCOSE_MG_DL = {
+    'Normal: <100 mg/dL (5.6 mmol/L)': 90,  # Average normal
+    'Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)': 112,  # Midpoint
+    'Diabetes: ≥126 mg/dL (7.0 mmol/L)': 140,  # Typical diabetic
+    'Unknown': 100  # Use threshold value
+}
+SYMPTOM_SCORES = {  # diabetes symptoms and general symptom severity
+    'Never': 0,
+    'Sometimes': 0.5,
+    'Often': 0.75,
+    'Always': 1.0
+}
+FAMILY_HISTORY_SCORES = {
+    'None': 0,
+    'Grandparent': 1,
+    'Parent': 2,
+    'Sibling': 3
+}
+CONDITION_WEIGHTS = {
+    'Hypertension': 0.7,
+    'High cholesterol': 0.6,
+    'Diabetes': 0.8,
+    'Cardiovascular disease': 0.9,
+    'Cancer': 0.9,
+    'Autoimmune condition': 0.7,
+    'Inflammatory condition': 0.6,
+    'Digestive disorders': 0.5,
+    'Skin conditions': 0.4
+}
+NO_CONDITION_SCORE = 0.1
+MALE_VALUES = ['Male', 'Laki-laki']
+
+def calculate_met_hours(activity_data):
+    """Calculate MET hours based on exercise frequency, duration and intensity"""
+    met_value = INTENSITY_MET[activity_data['intensity']]
+    exercise_times = EXERCISE_TIMES_PER_WEEK[activity_data['exercise_frequency']]
+    hours = DURATION_HOURS[activity_data['duration']]
+    
+    return met_value * exercise_times * hours
+
+def calculate_sleep_score(lifestyle_data):
+    """Calculate sleep score (0-1)"""
+    return SLEEP_SCORES[lifestyle_data['sleep_hours']]
+
+def calculate_stress_score(lifestyle_data):
+    """Calculate stress score (0-1, higher is worse)"""
+    return STRESS_SCORES[lifestyle_data['stress_level']]
+
+def calculate_smoking_risk(lifestyle_data):
+    """Calculate smoking risk score (0-1)"""
+    return SMOKING_RISK[lifestyle_data['smoking']]
+
+def map_cholesterol_level(cholesterol_str):
+    """Map cholesterol level to numerical value"""
+    return CHOLESTEROL_MG_DL[cholesterol_str]
+
+def map_bp_medication(bp_med_str):
+    """Map BP medication to numerical value"""
+    return BP_MEDICATION[bp_med_str]
+
+def map_fasting_glucose_level(glucose_str):
+    """Map fasting glucose dropdown to numerical value"""
+    return FASTING_GLUCOSE_MG_DL[glucose_str]
+
+def calculate_diabetes_symptoms(lifestyle_data):
+    """Calculate diabetes symptoms score"""
+    hunger_score = SYMPTOM_SCORES[lifestyle_data['frequent_hunger']]
+    thirst_score = SYMPTOM_SCORES[lifestyle_data['frequent_thirst']]
+    urination_score = SYMPTOM_SCORES[lifestyle_data['frequent_urination']]
+    
+    return (hunger_score + thirst_score + urination_score) / 3
+
+def map_family_history(history_str):
+    """Map family history to weighted score"""
+    return FAMILY_HISTORY_SCORES[history_str]
+
+def calculate_health_condition_score(health_data):
+    """Calculate health condition risk score (0-1)"""
+    if 'None' in health_data['conditions']:
+        return NO_CONDITION_SCORE
+    
+    total_weight = sum(CONDITION_WEIGHTS[c] for c in health_data['conditions'] if c != 'None')
+    return min(total_weight / 3, 1.0)
+
+def calculate_symptom_severity(health_data):
+    """Calculate symptom severity score (0-1)"""
+    symptoms = health_data['symptoms']
+    total_severity = sum(SYMPTOM_SCORES[v] for v in symptoms.values())
+    return total_severity / len(symptoms)
+
+def calculate_framingham_risk_score(features, model=None):
+    """Simplified Framingham 10-year CVD risk (no SBP/HDL; BP meds used as a proxy)"""
+    model = model or active_model()
+    age = features['age']
+    total_chol = features['total_cholesterol']
+    treated_bp = features['bp_medication'] > 0  # Treated if on meds (routine or not)
+    smoking = features['smoking_risk'] > 0.5  # Active smoker
+    diabetes = (features['fasting_glucose'] >= model.diabetes_glucose or features['has_diabetes'])
+
+    # Age points (male/female specific): bin 0 is "age < 35", later bins close on the right ("age <= 39", ...)
+    age_bin = 0 if age < model.age_edges[0] else bisect.bisect_left(model.age_edges, age, 1)
+    points = (model.age_points_male if features['gender_male'] else model.age_points_female)[age_bin]
+
+    # Total cholesterol points, adjusted down for older age
+    chol_points = model.chol_points[bisect.bisect_right(model.chol_edges, total_chol)]
+    if age >= model.older_age:
+        chol_points += model.older_chol_adjustment
+    points += chol_points
+
+    if treated_bp:
+        points += model.bp_medication_points
+    if smoking:
+        points += model.smoking_points
+    if diabetes:
+        points += model.diabetes_points
+
+    # Convert points to approximate 10-year risk % (exponential approximation)
+    risk = 1 - math.exp(-model.rate * (points + model.points_offset))
+    return max(model.score_min, min(risk, model.score_max))  # Ensure no 0% or 100%
+
+def calculate_risk_scores(features, model=None):
+    """Calculate risk scores for different health aspects with the parameters of ``model``"""
+    model = model or active_model()
+    low, high = model.score_min, model.score_max
+    risk_scores = {}
+    bmi_term = max(0, (features['bmi'] - model.bmi_min) / model.bmi_span)
+    inactivity = 1 - min(features['met_hours'] / model.met_hours_cap, 1)
+
+    # Metabolic and Lifestyle Risk
+    w = model.metabolic_weights
+    metabolic_risk = (
+        w['bmi'] * bmi_term +
+        w['inactivity'] * inactivity +
+        w['stress'] * features['stress_score'] +
+        w['smoking'] * features['smoking_risk'] +
+        w['alcohol'] * features['alcohol_risk'] +
+        w['poor_sleep'] * (1 - features['sleep_score'])
+    )
+    metabolic_risk = min(metabolic_risk * model.metabolic_multiplier, 1.0)
+    risk_scores['metabolic_lifestyle'] = max(low, min(high, metabolic_risk))  # Avoid extremes
+    
+    # CVD & Stroke Risk (Framingham-based without SBP) plus family history
+    if not features['has_cvd']:
+        cvd_risk = calculate_framingham_risk_score(features, model)
+        cvd_risk += features['cvd_family_history'] * model.cvd_family_history_weight
+        cvd_risk = min(cvd_risk * model.cvd_multiplier, 1.0)
+        risk_scores['cvd_stroke'] = max(low, min(high, cvd_risk))
+    
+    if not features['has_diabetes']:
+        # Adjust waist circumference if zero
+        waist_adj = features['waist_circumference'] if features['waist_circumference'] > 0 else model.default_waist
+        w = model.diabetes_weights
+        diabetes_risk = (
+            w['bmi'] * bmi_term +
+            w['waist'] * max(0, (waist_adj - model.waist_min) / model.waist_span) +
+            w['glucose'] * min(max((features['fasting_glucose'] - model.glucose_min) / model.glucose_span, 0), 1) +
+            w['inactivity'] * inactivity +
+            w['family_history'] * features['diabetes_family_history'] +
+            w['symptoms'] * features['diabetes_symptoms']
+        )
+        diabetes_risk = min(diabetes_risk * model.diabetes_multiplier, 1.0)
+        risk_scores['diabetes'] = max(low, min(high, diabetes_risk))
+    
+    if not features['has_cancer']:
+        w = model.cancer_weights
+        cancer_risk = (
+            w['age'] * (features['age'] - model.cancer_age_min) / model.cancer_age_span +
+            w['smoking'] * features['smoking_risk'] +
+            w['alcohol'] * features['alcohol_risk'] +
+            w['bmi'] * bmi_term +
+            w['family_history'] * features['cancer_family_history']
+        )
+        cancer_risk = min(cancer_risk * model.cancer_multiplier, 1.0)
+        risk_scores['cancer'] = max(low, min(high, cancer_risk))
+    
+    return risk_scores
+
+
+def calculate_framingham_risk_score_batch(features, model=None):
+    """Vectorized calculate_framingham_risk_score over arrays of features"""
+    model = model or active_model()
+    age = np.asarray(features['age'], dtype=float)
+    is_male = np.asarray(features['gender_male'], dtype=bool)
+    total_chol = np.asarray(features['total_cholesterol'], dtype=float)
+    age_edges = np.asarray(model.age_edges)
+
+    # Bin 0 is "age < 35"; every later bin closes on the right like the scalar "age <= 39" chain
+    age_bin = (age >= age_edges[0]).astype(int)
+    age_bin += (age[..., None] > age_edges[1:]).sum(axis=-1)
+    points = np.where(is_male, np.asarray(model.age_points_male)[age_bin],
+                      np.asarray(model.age_points_female)[age_bin])
+
+    chol_points = np.asarray(model.chol_points)[np.searchsorted(model.chol_edges, total_chol, side='right')]
+    points = points + chol_points + model.older_chol_adjustment * (age >= model.older_age)
+
+    diabetes = ((np.asarray(features['fasting_glucose']) >= model.diabetes_glucose)
+                | np.asarray(features['has_diabetes'], dtype=bool))
+    points = points + model.bp_medication_points * (np.asarray(features['bp_medication']) > 0)
+    points = points + model.smoking_points * (np.asarray(features['smoking_risk']) > 0.5)
+    points = points + model.diabetes_points * diabetes
+
+    # Points are small integers: send each distinct value through math.exp like the scalar path
+    # (np.exp may differ from it in the last bit)
+    values, inverse = np.unique(points, return_inverse=True)
+    risk = 1 - np.array([math.exp(-model.rate * (p + model.points_offset)) for p in values.tolist()])
+    return np.clip(risk[inverse.reshape(np.shape(points))], model.score_min, model.score_max)
+
+
+def calculate_risk_scores_batch(features, model=None):
+    """Vectorized calculate_risk_scores.
+
+    ``features`` is a structured array of packed records (``records.py``) or
+    maps the same keys as ``process_questionnaire_data`` to arrays (or
+    scalars, which broadcast). Returns a dict of float arrays with NaN where a
+    category does not apply because the condition is present.
+    """
+    model = model or active_model()
+    low, high = model.score_min, model.score_max
+    if isinstance(features, np.ndarray):  # packed records (records.py): one column per field
+        f = {name: features[name].astype(float, copy=False) if features.dtype[name].kind == 'f' else features[name]
+             for name in features.dtype.names}
+    else:
+        f = {key: np.asarray(value) for key, value in features.items()}
+    shape = np.broadcast_shapes(*(value.shape for value in f.values()))
+    bmi_term = np.maximum(0, (f['bmi'] - model.bmi_min) / model.bmi_span)
+    inactivity = 1 - np.minimum(f['met_hours'] / model.met_hours_cap, 1)
+
+    w = model.metabolic_weights
+    metabolic_risk = (
+        w['bmi'] * bmi_term +
+        w['inactivity'] * inactivity +
+        w['stress'] * f['stress_score'] +
+        w['smoking'] * f['smoking_risk'] +
+        w['alcohol'] * f['alcohol_risk'] +
+        w['poor_sleep'] * (1 - f['sleep_score'])
+    )
+    metabolic_risk = np.clip(np.minimum(metabolic_risk * model.metabolic_multiplier, 1.0), low, high)
+
+    cvd_risk = calculate_framingham_risk_score_batch(f, model) + f['cvd_family_history'] * model.cvd_family_history_weight
+    cvd_risk = np.clip(np.minimum(cvd_risk * model.cvd_multiplier, 1.0), low, high)
+
+    w = model.diabetes_weights
+    waist_adj = np.where(f['waist_circumference'] > 0, f['waist_circumference'], model.default_waist)
+    diabetes_risk = (
+        w['bmi'] * bmi_term +
+        w['waist'] * np.maximum(0, (waist_adj - model.waist_min) / model.waist_span) +
+        w['glucose'] * np.clip((f['fasting_glucose'] - model.glucose_min) / model.glucose_span, 0, 1) +
+        w['inactivity'] * inactivity +
+        w['family_history'] * f['diabetes_family_history'] +
+        w['symptoms'] * f['diabetes_symptoms']
+    )
+    diabetes_risk = np.clip(np.minimum(diabetes_risk * model.diabetes_multiplier, 1.0), low, high)
+
+    w = model.cancer_weights
+    cancer_risk = (
+        w['age'] * (f['age'] - model.cancer_age_min) / model.cancer_age_span +
+        w['smoking'] * f['smoking_risk'] +
+        w['alcohol'] * f['alcohol_risk'] +
+        w['bmi'] * bmi_term +
+        w['family_history'] * f['cancer_family_history']
+    )
+    cancer_risk = np.clip(np.minimum(cancer_risk * model.cancer_multiplier, 1.0), low, high)
+
+    def broadcast(values, present=None):
+        values = np.broadcast_to(values, shape).astype(float)
+        if present is not None:
+            values = np.where(np.broadcast_to(present, shape).astype(bool), np.nan, values)
+        return values
+
+    return {
+        'metabolic_lifestyle': broadcast(metabolic_risk),
+        'cvd_stroke': broadcast(cvd_risk, f['has_cvd']),
+        'diabetes': broadcast(diabetes_risk, f['has_diabetes']),
+        'cancer': broadcast(cancer_risk, f['has_cancer']),
+    }
+
+
+def risk_scores_at(batch_scores, row):
+    """The ``calculate_risk_scores``-style dict for one row of a batch result"""
+    return {key: float(scores[row]) for key, scores in batch_scores.items() if not np.isnan(scores[row])}
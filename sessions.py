@@ -0,0 +1,137 @@
+"""Memory accounting and eviction of idle browser sessions.
+
+Streamlit keeps every session's ``st.session_state`` (the questionnaire
+answers, widget values, results) for as long as the browser tab stays open,
+and respondents often leave it open after reading their results. Each script
+run calls ``touch()``; a background thread measures every session's state
+every SWEEP_SECONDS and, for sessions idle longer than SESSION_TTL_SECONDS,
+drops everything except a few small keys (language and the compressed
+results), so a returning respondent still sees their results.
+
+Completed results are kept as a compressed JSON blob (``pack_results``) rather
+than the nested dict: a few hundred bytes instead of several kilobytes.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '1800'))
+SWEEP_SECONDS = 60
+KEEP_KEYS = {'lang', 'show_results', 'results', 'model_version'}  # survive eviction
+
+_lock = threading.Lock()
+_sessions = {}  # session id -> {'state', 'last_seen', 'bytes', 'evicted'}
+_totals = {'evictions': 0}
+_sweeper = []
+
+
+def pack_results(questionnaire_data):
+    """Compact, immutable form of a completed questionnaire for the session state"""
+    return zlib.compress(json.dumps(questionnaire_data, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_results(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by ``obj`` and everything it references"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if hasattr(obj, 'nbytes') and not isinstance(obj, type):  # NumPy arrays
+        return size + int(obj.nbytes)
+    if isinstance(obj, dict):
+        return size + sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        return size + deep_sizeof(vars(obj), seen)
+    return size
+
+
+def touch():
+    """Record activity of the current session (call at the start of every script run)"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    with _lock:
+        entry = _sessions.get(ctx.session_id)
+        if entry is None:
+            # The SessionState the session keeps for its lifetime (ctx.session_state is a
+            # per-run wrapper); dropped by sweep() once Streamlit closes the session
+            entry = _sessions[ctx.session_id] = {'state': ctx.session_state._state, 'bytes': 0}
+        entry['last_seen'] = time.monotonic()
+        entry['evicted'] = False
+        if not _sweeper:
+            thread = threading.Thread(target=_sweep_forever, name='session-sweeper', daemon=True)
+            _sweeper.append(thread)
+            thread.start()
+
+
+def _evict(state):
+    # Only sessions idle for SESSION_TTL_SECONDS get here, so no script run is using the state
+    for key in list(state.filtered_state):
+        if key not in KEEP_KEYS:
+            try:
+                del state[key]
+            except KeyError:
+                pass
+
+
+def sweep(now=None):
+    """Measure all sessions and evict the idle ones; returns the number evicted"""
+    now = now or time.monotonic()
+    with _lock:
+        entries = list(_sessions.items())
+    from streamlit.runtime import Runtime
+    runtime = Runtime.instance() if Runtime.exists() else None
+    evicted = 0
+    for session_id, entry in entries:
+        if runtime is not None and not runtime.is_active_session(session_id):  # tab closed
+            with _lock:
+                _sessions.pop(session_id, None)
+            continue
+        state = entry['state']
+        if not entry['evicted'] and now - entry['last_seen'] > SESSION_TTL_SECONDS:
+            _evict(state)
+            entry['evicted'] = True
+            evicted += 1
+        entry['bytes'] = deep_sizeof(state.filtered_state)
+    if evicted:
+        with _lock:
+            _totals['evictions'] += evicted
+        print(f"DEBUG: Evicted {evicted} idle session(s).")
+    return evicted
+
+
+def _sweep_forever():
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        try:
+            sweep()
+        except Exception as e:  # never let the sweeper die
+            print(f"DEBUG: Session sweep failed: {e}")
+
+
+def footprint():
+    """Gauge of session memory as of the last sweep: session counts and bytes of state"""
+    with _lock:
+        entries = list(_sessions.values())
+        evictions = _totals['evictions']
+    sizes = [entry['bytes'] for entry in entries]
+    return {
+        'sessions': len(entries),
+        'evicted': sum(entry['evicted'] for entry in entries),
+        'bytes': sum(sizes),
+        'largest_bytes': max(sizes, default=0),
+        'evictions': evictions,
+    }
@@ -0,0 +1,71 @@
+"""Shadow scoring: score live submissions with a candidate model off the request path.
+
+When ``scoring_models/registry.json`` names a ``shadow`` version, every stored
+submission is re-scored with it on a background thread and the two versions'
+scores are appended side by side to ``submissions/shadow_scores.csv``. Users
+only ever see (and wait for) the active model.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from model_registry import shadow_model
+from records import featurize
+from scoring import calculate_risk_scores_batch
+from storage import SUBMISSIONS_DIR, append_csv_rows
+
+SHADOW_CSV_PATH = os.path.join(SUBMISSIONS_DIR, 'shadow_scores.csv')
+MAX_PENDING = 10000  # submissions; beyond this shadow scoring is skipped rather than queued
+
+RISK_KEYS = ['metabolic_lifestyle', 'cvd_stroke', 'diabetes', 'cancer']
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-scoring')
+_pending_lock = threading.Lock()
+_pending = {'count': 0, 'skipped': 0}
+
+
+def _pct(value):
+    return 'N/A' if value is None or np.isnan(value) else round(float(value) * 100, 1)
+
+
+def _score_and_log(submissions, active_version, model):
+    try:
+        features = featurize((questionnaire_data for questionnaire_data, _ in submissions), len(submissions))
+        shadow_scores = calculate_risk_scores_batch(features, model)
+        rows = []
+        for i, (questionnaire_data, risk_scores) in enumerate(submissions):
+            row = {
+                'timestamp': questionnaire_data['timestamp'],
+                'active_version': active_version,
+                'shadow_version': model.version,
+            }
+            for key in RISK_KEYS:
+                row[f'{key}_active'] = _pct(risk_scores.get(key))
+                row[f'{key}_shadow'] = _pct(shadow_scores[key][i])
+            rows.append(row)
+        append_csv_rows(SHADOW_CSV_PATH, rows)
+    except Exception as e:
+        print(f"DEBUG: Shadow scoring with {model.version} failed: {e}")
+    finally:
+        with _pending_lock:
+            _pending['count'] -= len(submissions)
+
+
+def submit(submissions, active_version):
+    """Queue ``(questionnaire_data, risk_scores)`` pairs for shadow scoring; returns immediately"""
+    try:
+        model = shadow_model()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"DEBUG: Shadow model unavailable: {e}")
+        return
+    if model is None or model.version == active_version or not submissions:
+        return
+    with _pending_lock:
+        if _pending['count'] + len(submissions) > MAX_PENDING:
+            _pending['skipped'] += len(submissions)
+            print(f"DEBUG: Shadow scoring backlog full, skipped {len(submissions)} submission(s).")
+            return
+        _pending['count'] += len(submissions)
+    _executor.submit(_score_and_log, list(submissions), active_version, model)
@@ -0,0 +1,75 @@
+"""Signed, self-contained links to a results page.
+
+A link carries everything the results page needs, so opening it reads no
+storage and replays no form: the respondent's scoring features (the same
+fields as ``records.FEATURE_FIELDS``, packed to about 100 bytes) and the
+scoring-model version, followed by a truncated HMAC-SHA256 signature and
+encoded as unpadded base64url (``/?r=<token>``). Name and phone number are
+never part of a link.
+
+Set ``SHARE_LINK_SECRET`` (the same value for every replica). Without it, a
+random secret is generated once and kept in ``submissions/share_secret``.
+Changing the secret invalidates every link handed out so far.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import secrets
+
+import numpy as np
+
+from records import FEATURE_FIELDS
+from storage import SUBMISSIONS_DIR, file_lock
+
+SECRET_PATH = os.path.join(SUBMISSIONS_DIR, 'share_secret')
+FORMAT = 1  # first byte of every payload; bump when SHARE_DTYPE changes
+SIGNATURE_BYTES = 12
+
+# Little-endian and full precision, so a shared page shows exactly the scores of the original one
+SHARE_DTYPE = np.dtype([(name, '<' + code) for name, code in FEATURE_FIELDS])
+
+_secret = {}
+
+
+def _get_secret():
+    if 'value' not in _secret:
+        secret = os.getenv('SHARE_LINK_SECRET', '')
+        if not secret:
+            with file_lock(SECRET_PATH):
+                if not os.path.exists(SECRET_PATH):
+                    with open(SECRET_PATH, 'w') as f:
+                        f.write(secrets.token_hex(32))
+                with open(SECRET_PATH) as f:
+                    secret = f.read().strip()
+        _secret['value'] = secret.encode()
+    return _secret['value']
+
+
+def _sign(payload):
+    return hmac.new(_get_secret(), payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def encode(features, model_version):
+    """URL-safe token for a ``process_questionnaire_data`` feature dict scored with ``model_version``"""
+    version = str(model_version).encode('utf-8')
+    record = np.array(tuple(features[name] for name, _ in FEATURE_FIELDS), dtype=SHARE_DTYPE)
+    payload = bytes([FORMAT, len(version)]) + version + record.tobytes()
+    return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b'=').decode('ascii')
+
+
+def decode(token):
+    """``(features, model_version)`` of a token; raises ValueError if it is malformed or not ours"""
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise ValueError("not a base64url token")
+    payload, signature = data[:-SIGNATURE_BYTES], data[-SIGNATURE_BYTES:]
+    if len(payload) < 2 or not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("bad signature")
+    if payload[0] != FORMAT or len(payload) != 2 + payload[1] + SHARE_DTYPE.itemsize:
+        raise ValueError("unsupported link format")
+    version = payload[2:2 + payload[1]].decode('utf-8')
+    record = np.frombuffer(payload, dtype=SHARE_DTYPE, offset=2 + payload[1])[0]
+    return dict(zip(SHARE_DTYPE.names, record.item())), version
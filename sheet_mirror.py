@@ -0,0 +1,221 @@
+"""Incremental local mirror of each clinic's Google Sheet.
+
+Ops staff edit and annotate rows directly in the sheet, so reports that must
+reflect those edits read the sheet, not the local archive. Pulling the whole
+sheet on every read is slow and eats into the API quota; instead the worker
+(``worker.py``) keeps ``submissions/sheet_mirror/<clinic>.csv`` up to date
+and readers (the admin export page, ``export.py --archive``) use that file.
+
+A cursor next to the mirror records the sheet's revision (the Drive
+``modifiedTime``) and how many rows are mirrored. A sync costs one metadata
+call when nothing changed. Otherwise a single batched read fetches:
+
+- the header row,
+- rows appended after the cursor (in pages of PAGE_ROWS),
+- the last RECENT_ROWS mirrored rows, where ops edits mostly happen,
+- a rolling block of RESCAN_ROWS older rows, so edits anywhere are picked up
+  within ``rows / RESCAN_ROWS`` syncs.
+
+A changed header or a sheet that got shorter (deleted rows) triggers a full
+re-read, also in pages. Cells beyond the header's width are not mirrored.
+
+    python sheet_mirror.py [--clinic klinik-sehat] [--full]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+
+import tenants
+from storage import SUBMISSIONS_DIR, file_lock, fsync_dir, fsync_file, tombstone_csv_submissions, write_json_atomic
+
+MIRROR_DIR = os.path.join(SUBMISSIONS_DIR, 'sheet_mirror')
+PAGE_ROWS = 1000  # rows per range of a batched read
+TAIL_PAGES = 5  # pages of new rows requested per batched read
+RECENT_ROWS = 500
+RESCAN_ROWS = 2000
+
+
+def mirror_path(tenant_id=tenants.DEFAULT_TENANT):
+    return os.path.join(MIRROR_DIR, f'{tenant_id}.csv')
+
+
+def read_cursor(path):
+    """Sync state of a mirror: revision, rows, columns, scan_row, synced_at"""
+    try:
+        with open(path + '.cursor.json', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'revision': None, 'rows': 0, 'columns': [], 'scan_row': 0, 'synced_at': None}
+
+
+def _rows_range(start, end):
+    """A1 range of data rows [start, end) (0-based; the header is sheet row 1)"""
+    return f'{start + 2}:{end + 1}'
+
+
+def _fit(values, width):
+    return (list(values) + [''] * width)[:width]
+
+
+def _fetch(worksheet, ranges):
+    """Values of ``ranges`` in one API call"""
+    return [list(value_range) for value_range in worksheet.batch_get(ranges)]
+
+
+def _fetch_tail(worksheet, start, first_ranges=()):
+    """Batched reads of ``first_ranges`` plus every row from ``start`` on; returns (first values, tail rows, reads)"""
+    first, tail, reads = None, [], 0
+    while True:
+        pages = [_rows_range(start + i * PAGE_ROWS, start + (i + 1) * PAGE_ROWS) for i in range(TAIL_PAGES)]
+        values = _fetch(worksheet, [*first_ranges, *pages] if first is None else pages)
+        reads += 1
+        if first is None:
+            first, values = values[:len(first_ranges)], values[len(first_ranges):]
+        if len(values[-1]) < PAGE_ROWS:
+            # Pages come back without their trailing blank rows; pad all but the last
+            for page in values:
+                tail.extend(page + [[]] * (PAGE_ROWS - len(page)))
+            while tail and not any(tail[-1]):
+                tail.pop()
+            return first, tail, reads
+        for page in values:
+            tail.extend(page + [[]] * (PAGE_ROWS - len(page)))
+        start += TAIL_PAGES * PAGE_ROWS
+
+
+def _write_rows(out, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    out.write(buffer.getvalue())  # one write, so readers never see half a batch
+
+
+def _full_sync(worksheet, path, revision):
+    (header,), rows, reads = _fetch_tail(worksheet, 0, ['1:1'])
+    columns = header[0] if header else []
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        _write_rows(f, [columns, *(_fit(row, len(columns)) for row in rows)])
+        fsync_file(f)
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(path))
+    return {'revision': revision, 'rows': len(rows), 'columns': columns, 'scan_row': 0}, \
+        {'new': len(rows), 'changed': 0, 'reads': reads, 'full': True}
+
+
+def _incremental_sync(worksheet, path, cursor, revision):
+    columns, n = cursor['columns'], cursor['rows']
+    recent_start = max(0, n - RECENT_ROWS)
+    scan_start = cursor['scan_row'] if cursor['scan_row'] < recent_start else 0
+    scan_end = min(scan_start + RESCAN_ROWS, recent_start)
+    blocks = [block for block in ((scan_start, scan_end), (recent_start, n)) if block[1] > block[0]]
+    first, new_rows, reads = _fetch_tail(worksheet, n, ['1:1', *(_rows_range(*block) for block in blocks)])
+    header = first[0][0] if first[0] else []
+    if header != columns or (n and len(first[-1]) < n - recent_start):
+        return None  # columns changed or rows were deleted: positions no longer line up
+
+    fetched = {}
+    for (start, end), values in zip(blocks, first[1:]):
+        for index in range(start, end):
+            fetched[index] = _fit(values[index - start] if index - start < len(values) else [], len(columns))
+    changed = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for index, row in enumerate(reader):
+            if index in fetched and row != fetched[index]:
+                changed[index] = fetched[index]
+    new_rows = [_fit(row, len(columns)) for row in new_rows]
+
+    if changed:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(path, newline='', encoding='utf-8') as src, open(tmp_path, 'w', newline='', encoding='utf-8') as out:
+            reader = csv.reader(src)
+            _write_rows(out, [next(reader)])
+            _write_rows(out, (changed.get(index, row) for index, row in enumerate(reader)))
+            _write_rows(out, new_rows)
+            fsync_file(out)
+        os.replace(tmp_path, path)
+        fsync_dir(os.path.dirname(path))
+    elif new_rows:
+        with open(path, 'a', newline='', encoding='utf-8') as out:
+            _write_rows(out, new_rows)
+            fsync_file(out)
+    next_scan = scan_end if scan_end < recent_start else 0
+    return {'revision': revision, 'rows': n + len(new_rows), 'columns': columns, 'scan_row': next_scan}, \
+        {'new': len(new_rows), 'changed': len(changed), 'reads': reads, 'full': False}
+
+
+def sync(worksheet, path, full=False):
+    """Bring the mirror at ``path`` up to date with ``worksheet``; returns counts of new/changed rows and reads"""
+    with file_lock(path):
+        cursor = read_cursor(path)
+        revision = worksheet.spreadsheet.get_lastUpdateTime()
+        has_mirror = os.path.isfile(path) and cursor['columns']
+        if not full and has_mirror and revision == cursor['revision']:
+            return {'new': 0, 'changed': 0, 'reads': 0, 'full': False}
+        result = None if full or not has_mirror else _incremental_sync(worksheet, path, cursor, revision)
+        if result is None:
+            result = _full_sync(worksheet, path, revision)
+        cursor, stats = result
+        cursor['synced_at'] = time.time()
+        write_json_atomic(path + '.cursor.json', cursor)
+    return stats
+
+
+def tombstone_rows(tenant_id, submissions):
+    """Erase the mirrored rows of the submission ids ``submissions`` in place (right to erasure); returns the number erased.
+
+    Positions stay as they are, so the next sync only sees the rows as changed.
+    """
+    return len(tombstone_csv_submissions(mirror_path(tenant_id), set(submissions)))
+
+
+def invalidate(tenant_id):
+    """Make the next sync of a clinic's mirror a full re-read (after rows were deleted from the sheet)"""
+    path = mirror_path(tenant_id)
+    with file_lock(path):
+        try:
+            os.remove(path + '.cursor.json')
+        except FileNotFoundError:
+            pass
+
+
+def targets():
+    """``(clinic id, sheet id, credentials path)`` of every clinic with a Google Sheet"""
+    for tenant_id in tenants.ids():
+        tenant = tenants.get(tenant_id)
+        sheet_id = tenants.sheet_id(tenant)
+        if sheet_id:
+            yield tenant_id, sheet_id, tenant.get('credentials')
+
+
+def sync_all(clinic=None, full=False):
+    """Sync the mirror of every clinic (or of ``clinic``); errors are logged per clinic"""
+    import sheets
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    for tenant_id, sheet_id, credentials in targets():
+        if clinic and tenant_id != clinic:
+            continue
+        try:
+            stats = sync(sheets.get_worksheet(sheet_id, tenant_id, credentials), mirror_path(tenant_id), full)
+        except Exception as e:  # one clinic's sheet must not stop the others
+            print(f"DEBUG: Sheet mirror of {tenant_id} failed: {e}")
+            continue
+        if stats['reads']:
+            print(f"DEBUG: Mirrored sheet of {tenant_id}: {stats['new']} new, {stats['changed']} changed "
+                  f"row(s) in {stats['reads']} read(s){' (full)' if stats['full'] else ''}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the local mirrors of the clinics' Google Sheets")
+    parser.add_argument('--clinic', help="only this clinic (default: all with a sheet)")
+    parser.add_argument('--full', action='store_true', help="re-read the whole sheet")
+    args = parser.parse_args(argv)
+    sync_all(args.clinic, args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Google Sheets sink for stored submissions."""
+import functools
+import os
+import re
+
+import gspread
+import streamlit as st
+from oauth2client.service_account import ServiceAccountCredentials
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+
+
+def load_credentials(path=None):
+    """Service-account credentials from ``path``, 'dnacare.json' (local) or Streamlit secrets (deployment)"""
+    if path:
+        return ServiceAccountCredentials.from_json_keyfile_name(path, SCOPES)
+    # Check for local credentials file FIRST
+    if os.path.exists('dnacare.json'):
+        print("DEBUG: Using local file 'dnacare.json' for credentials.")
+        return ServiceAccountCredentials.from_json_keyfile_name('dnacare.json', SCOPES)
+    # If no local file, check for Streamlit secrets (for deployment)
+    if 'GOOGLE_CREDENTIALS' in st.secrets:
+        print("DEBUG: Using Streamlit secrets for credentials.")
+        return ServiceAccountCredentials.from_json_keyfile_dict(st.secrets['GOOGLE_CREDENTIALS'], SCOPES)
+    # If neither is found, raise an error
+    raise FileNotFoundError("Could not find 'dnacare.json' for local development or GOOGLE_CREDENTIALS secret for deployment.")
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(tenant_id=None, credentials_path=None):
+    """Authorize once per clinic: each gets its own client and HTTP connection pool"""
+    client = gspread.authorize(load_credentials(credentials_path))
+    print(f"DEBUG: Authentication successful ({tenant_id or 'default'}).")
+    return client
+
+
+@functools.lru_cache(maxsize=None)
+def get_worksheet(sheet_id, tenant_id=None, credentials_path=None):
+    """The first worksheet of ``sheet_id``, opened with the clinic's client"""
+    worksheet = get_client(tenant_id, credentials_path).open_by_key(sheet_id).sheet1
+    print(f"DEBUG: Opened worksheet '{worksheet.title}'.")
+    return worksheet
+
+
+def append_rows(sheet_id, rows, tenant_id=None, credentials_path=None):
+    """Append flat submission dicts in a single API call, adding the header to an empty sheet.
+
+    A header from before newer columns (e.g. ``submission_id``) were added is
+    extended, so those columns are named and mirrored too. Returns the sheet
+    row number of the first appended submission (None if unknown).
+    """
+    if not rows:
+        return None
+    worksheet = get_worksheet(sheet_id, tenant_id, credentials_path)
+    values = [list(row.values()) for row in rows]
+    columns = list(rows[0].keys())
+    header = worksheet.row_values(1)
+    if not header:
+        values.insert(0, columns)
+        print("DEBUG: Adding header row to empty sheet.")
+    elif len(header) < len(columns) and columns[:len(header)] == header:
+        worksheet.update([columns], '1:1')
+        print(f"DEBUG: Extended the sheet header by {len(columns) - len(header)} column(s).")
+    response = worksheet.append_rows(values)
+    print(f"DEBUG: Appended {len(rows)} row(s) to Google Sheet.")
+    match = re.search(r'![A-Z]+(\d+)', (response or {}).get('updates', {}).get('updatedRange', ''))
+    if match is None:
+        return None
+    return int(match.group(1)) + len(values) - len(rows)
@@ -0,0 +1,64 @@
+"""Every store a scored submission is written to.
+
+Shared by the Streamlit form, bulk intake and the scoring API's submission
+endpoint (used by the static calculator), so a submission is stored the same
+way whichever way it arrives.
+"""
+import functools
+
+import aggregates
+import erasure
+import history
+import outbox
+import percentiles
+import shadow
+import tenants
+from storage import save_submissions
+
+
+@functools.lru_cache(maxsize=None)
+def percentile_store():
+    """Population percentile sketches shared by all sessions of this process"""
+    return percentiles.PercentileStore()
+
+
+def store_submissions(submissions, tenant):
+    """Write scored ``(questionnaire_data, flat_data, risk_scores)`` submissions of a clinic to every sink.
+
+    Returns once the archive, the JSON files and the Google Sheets outbox entry
+    are on disk. The secondary stores after that can all be rebuilt from the
+    archive, so their failures are logged rather than raised.
+    """
+    # CSV and JSON under a cross-process lock (safe with several replicas)
+    locations = save_submissions([(questionnaire_data, flat_data) for questionnaire_data, flat_data, _ in submissions])
+    # Google Sheets: committed to the clinic's local outbox queue, delivered by the worker service
+    sheet_id = tenants.sheet_id(tenant)
+    if sheet_id:
+        outbox.enqueue('sheets', {'tenant': tenant['id'], 'sheet_id': sheet_id,
+                                  'rows': [flat_data for _, flat_data, _ in submissions]}, queue=tenant['id'])
+    secondary = {
+        # Where each copy went, by hashed phone number and name (right to erasure; erasure.py --rebuild-index)
+        'erasure index': lambda: erasure.index_submissions(submissions, locations, tenant),
+        'aggregates': lambda: aggregates.record_submissions([
+            (questionnaire_data['timestamp'], questionnaire_data['personal']['age'],
+             questionnaire_data['personal']['sex'], risk_scores)
+            for questionnaire_data, _, risk_scores in submissions
+        ]),
+        'percentiles': lambda: [percentile_store().record(questionnaire_data['personal']['age'], risk_scores)
+                                for questionnaire_data, _, risk_scores in submissions],
+        'history': lambda: history.record_submissions([
+            (questionnaire_data['personal']['phone'], questionnaire_data['personal']['name'],
+             questionnaire_data['submission_id'],
+             questionnaire_data['timestamp'], risk_scores, flat_data['model_version'])
+            for questionnaire_data, flat_data, risk_scores in submissions
+        ]),
+        # Compare against the candidate scoring model, if any, on a background thread
+        'shadow scores': lambda: shadow.submit([(questionnaire_data, risk_scores)
+                                                for questionnaire_data, _, risk_scores in submissions],
+                                               submissions[0][1]['model_version']),
+    }
+    for name, write in secondary.items():
+        try:
+            write()
+        except Exception as e:  # stored already; rebuildable from the archive
+            print(f"DEBUG: Could not update the {name} for {len(submissions)} submission(s): {e}")
@@ -0,0 +1,412 @@
+"""Local submission storage shared by every app replica.
+
+Several Streamlit processes (see ``docker-compose.yml``) write into the same
+``submissions/`` volume, so every write goes through an exclusive advisory
+lock and JSON documents are replaced atomically. Files are fsynced before a
+write returns, so a stored submission survives a container or host crash.
+
+Every submission carries a random ``submission_id``; timestamps are not
+unique (bulk intake, same-second submissions). Rows stored before ids existed
+are identified by their timestamp instead (``submission_id``).
+
+Erased rows (``erasure.py``) are overwritten in place by a tombstone line of
+the same length until they are compacted away; readers skip them with
+``is_tombstone``.
+"""
+import csv
+import glob
+import io
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines only ever run a single process
+    fcntl = None
+
+SUBMISSIONS_DIR = os.getenv('SUBMISSIONS_DIR', 'submissions')
+CSV_PATH = os.path.join(SUBMISSIONS_DIR, 'submissions.csv')
+TOMBSTONE = 'erased'  # first field of an erased row
+ROTATION_STAMP = '%Y%m%dT%H%M%S'  # suffix of a CSV rotated aside by append_csv_rows
+ROTATED_SUFFIX = r'_(\d{8}T\d{6})(?:-(\d+))?'  # -1, -2, ... for more rotations within one second
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on ``<path>.lock`` for the duration of the block"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def fsync_file(f):
+    """Flush a file object all the way to disk"""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def fsync_dir(path):
+    """Persist the directory entries (new or renamed files) of ``path``"""
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json_atomic(path, data, indent=None):
+    """Write ``data`` to ``path`` so readers never see a half-written file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # sessions are threads of one process
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+        fsync_file(f)
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(path))
+
+
+def write_json_exclusive(path, data, indent=None):
+    """Atomically create a new JSON file next to ``path`` without overwriting existing ones.
+
+    If ``path`` is taken (e.g. two submissions with the same timestamp), a
+    ``-1``, ``-2``, ... suffix is added. Returns the path actually written.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+        fsync_file(f)
+    root, ext = os.path.splitext(path)
+    candidate, n = path, 0
+    try:
+        while True:
+            try:
+                os.link(tmp_path, candidate)  # fails instead of replacing an existing file
+                fsync_dir(os.path.dirname(path))
+                return candidate
+            except FileExistsError:
+                n += 1
+                candidate = f"{root}-{n}{ext}"
+    finally:
+        os.remove(tmp_path)
+
+
+def _read_header(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+
+def _rotate(path):
+    """Move ``path`` aside to ``<root>_<stamp><ext>``, or ``<root>_<stamp>-<n><ext>`` if that is taken.
+
+    Called under the file's lock, so no other writer rotates it between the
+    check and the rename; rotations within one second (e.g. replicas with
+    different layouts during a rolling deploy) never replace each other.
+    """
+    root, ext = os.path.splitext(path)
+    stamp = datetime.now().strftime(ROTATION_STAMP)
+    candidate, n = f"{root}_{stamp}{ext}", 0
+    while os.path.exists(candidate):
+        n += 1
+        candidate = f"{root}_{stamp}-{n}{ext}"
+    os.rename(path, candidate)
+    fsync_dir(os.path.dirname(path))
+
+
+def append_csv_rows(path, rows):
+    """Append dict rows to a CSV file, writing the header only for a new file.
+
+    The existence check and the append happen under the same lock, so two
+    replicas can never both write a header. If the columns changed since the
+    file was started, the old file is rotated aside instead of mixing layouts
+    (see ``_rotate``). Returns the ``(offset, length)`` in bytes of every appended row.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    fieldnames = list(rows[0].keys())
+    with file_lock(path):
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            if _read_header(path) != fieldnames:
+                _rotate(path)
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        if size == 0:
+            writer.writeheader()
+        chunks = [buffer.getvalue().encode('utf-8')]
+        offset = size + len(chunks[0])
+        spans = []
+        for row in rows:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(row)
+            chunks.append(buffer.getvalue().encode('utf-8'))
+            spans.append((offset, len(chunks[-1])))
+            offset += len(chunks[-1])
+        with open(path, 'ab') as csvfile:
+            csvfile.write(b''.join(chunks))
+            fsync_file(csvfile)
+    return spans
+
+
+def archive_paths(csv_path=CSV_PATH):
+    """Files ``csv_path`` was rotated into (oldest first) followed by ``csv_path`` itself.
+
+    Only the exact rotation suffix matches, so ``klinik.csv`` never picks up
+    ``klinik_sehat.csv``.
+    """
+    root, ext = os.path.splitext(csv_path)
+    rotated = re.compile(re.escape(os.path.basename(root)) + ROTATED_SUFFIX + re.escape(ext))
+    matches = ((rotated.fullmatch(os.path.basename(path)), path) for path in glob.glob(f'{glob.escape(root)}_*{ext}'))
+    paths = [path for _, path in sorted(((match.group(1), int(match.group(2) or 0)), path)
+                                        for match, path in matches if match)]
+    if os.path.isfile(csv_path):
+        paths.append(csv_path)
+    return paths
+
+
+def is_tombstone(row):
+    """Whether a CSV row (dict or list of fields) was erased"""
+    first = row.get('timestamp') if isinstance(row, dict) else (row[0] if row else None)
+    return first is not None and first.rstrip() == TOMBSTONE
+
+
+def submission_id(record):
+    """Id of a submission (questionnaire dict or flat row): ``submission_id``, or the timestamp of one stored before ids"""
+    return record.get('submission_id') or record.get('timestamp', '')
+
+
+def id_column(header):
+    """Index of the ``submission_id`` column in a CSV or sheet header, or None for a layout from before ids"""
+    return header.index('submission_id') if header and 'submission_id' in header else None
+
+
+def row_submission_id(fields, column):
+    """``submission_id`` of a CSV row given as a list of fields (``column`` from ``id_column``)"""
+    value = fields[column] if column is not None and column < len(fields) else ''
+    return value or (fields[0] if fields else '')
+
+
+def iter_csv_spans(f):
+    """Yield ``(offset, length, fields)`` for every row (header included) of a CSV file opened in binary mode"""
+    position = [0]
+
+    def lines():
+        for line in f:
+            position[0] += len(line)
+            yield line.decode('utf-8')
+
+    start = 0
+    for fields in csv.reader(lines()):
+        yield start, position[0] - start, fields
+        start = position[0]
+
+
+def _tombstone_at(f, offset, length, submission, column):
+    f.seek(offset)
+    original = f.read(length)
+    try:
+        fields = next(csv.reader(io.StringIO(original.decode('utf-8'), newline='')), [])
+    except (UnicodeDecodeError, csv.Error):
+        return False
+    if len(original) != length or not fields or \
+            (row_submission_id(fields, column) != submission and not is_tombstone(fields)):
+        return False
+    if is_tombstone(fields):
+        return True
+    terminator = b'\r\n' if original.endswith(b'\r\n') else b'\n' if original.endswith(b'\n') else b''
+    size = length - len(terminator)
+    commas = min(len(fields) - 1, size - len(TOMBSTONE))
+    line = TOMBSTONE + ' ' * (size - len(TOMBSTONE) - commas) + ',' * commas
+    f.seek(offset)
+    f.write(line.encode('utf-8') + terminator)
+    return True
+
+
+def tombstone_csv_row(path, offset, length, submission):
+    """Overwrite the row at ``offset`` with a same-length tombstone if it is the row of submission id ``submission``.
+
+    Returns False if the file holds a different row there (e.g. it was
+    compacted or rotated since the offset was recorded).
+    """
+    with file_lock(path):
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            return False
+        with f:
+            column = id_column(next(iter_csv_spans(f), (0, 0, []))[2])
+            erased = _tombstone_at(f, offset, length, submission, column)
+            fsync_file(f)
+    return erased
+
+
+def tombstone_csv_submissions(path, submissions):
+    """Tombstone every row of ``path`` whose submission id is in ``submissions`` (a full scan); returns the spans"""
+    with file_lock(path):
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            return []
+        with f:
+            spans = iter_csv_spans(f)
+            column = id_column(next(spans, (0, 0, []))[2])
+            matches = [(offset, length, row_submission_id(fields, column)) for offset, length, fields in spans
+                       if fields and row_submission_id(fields, column) in submissions]
+            matches = [span for span in matches if _tombstone_at(f, *span, column)]
+            fsync_file(f)
+    return matches
+
+
+def flatten_submission(questionnaire_data, risk_scores, model_version='', clinic=''):
+    """Flatten a nested questionnaire and its risk scores into one CSV row.
+
+    ``model_version`` records which scoring-model version produced the scores
+    and ``clinic`` the partner clinic (tenant) the respondent came through.
+    """
+    personal = questionnaire_data['personal']
+    activity = questionnaire_data['activity']
+    lifestyle = questionnaire_data['lifestyle']
+    health = questionnaire_data['health']
+    symptoms = health['symptoms']
+    genetic = questionnaire_data['genetic']
+
+    def risk_pct(key):
+        # N/A if not calculated, e.g., due to existing condition
+        return round(risk_scores[key] * 100, 1) if key in risk_scores else 'N/A'
+
+    return {
+        'timestamp': questionnaire_data['timestamp'],
+        # Personal section
+        'name': personal['name'],
+        'phone': personal['phone'],
+        'age': personal['age'],
+        'sex': personal['sex'],
+        'height': personal['height'],
+        'weight': personal['weight'],
+        'occupation': personal['occupation'],
+        'activity_level': personal['activity_level'],
+        'waist_circumference': personal['waist_circumference'],
+        # Activity section
+        'exercise_frequency': activity['exercise_frequency'],
+        'duration': activity['duration'],
+        'intensity': activity['intensity'],
+        # Lifestyle section
+        'sleep_hours': lifestyle['sleep_hours'],
+        'stress_level': lifestyle['stress_level'],
+        'smoking': lifestyle['smoking'],
+        'alcohol': lifestyle['alcohol'],
+        'total_cholesterol': lifestyle['total_cholesterol'],
+        'blood_pressure_medication': lifestyle['blood_pressure_medication'],
+        'fasting_glucose': lifestyle['fasting_glucose'],
+        'frequent_hunger': lifestyle['frequent_hunger'],
+        'frequent_thirst': lifestyle['frequent_thirst'],
+        'frequent_urination': lifestyle['frequent_urination'],
+        # Health section
+        'conditions': ','.join(health['conditions']),  # Join list as comma-separated string
+        'medications': health['medications'],
+        'diabetes_history': health['diabetes_history'],
+        'cancer_history': health['cancer_history'],
+        'cvd_history': health['cvd_history'],
+        # Symptoms (flattened from dict)
+        'symptom_fatigue': symptoms['fatigue'],
+        'symptom_joint_pain': symptoms['joint_pain'],
+        'symptom_digestive': symptoms['digestive'],
+        'symptom_skin_issues': symptoms['skin_issues'],
+        'symptom_headaches': symptoms['headaches'],
+        'symptom_mood': symptoms['mood'],
+        'symptom_cognitive': symptoms['cognitive'],
+        'symptom_sleep_issues': symptoms['sleep_issues'],
+        # Genetic section
+        'had_testing': genetic['had_testing'],
+        'findings': genetic['findings'],
+        # Calculated BMI
+        'bmi': personal['weight'] / ((personal['height'] / 100) ** 2) if personal['height'] > 0 else 0,
+        # Risk scores as percentages
+        'metabolic_risk': risk_pct('metabolic_lifestyle'),
+        'cvd_risk': risk_pct('cvd_stroke'),
+        'diabetes_risk': risk_pct('diabetes'),
+        'cancer_risk': risk_pct('cancer'),
+        'model_version': model_version,
+        'clinic': clinic,
+        'submission_id': questionnaire_data.get('submission_id', ''),
+        'form_date': questionnaire_data.get('form_date', ''),
+    }
+
+
+def unflatten_submission(flat_data):
+    """Rebuild the nested questionnaire dict from a flat CSV row (inverse of flatten_submission)"""
+    return {
+        'personal': {
+            'name': flat_data['name'],
+            'phone': flat_data['phone'],
+            'age': flat_data['age'],
+            'sex': flat_data['sex'],
+            'height': flat_data['height'],
+            'weight': flat_data['weight'],
+            'occupation': flat_data['occupation'],
+            'activity_level': flat_data['activity_level'],
+            'waist_circumference': flat_data['waist_circumference'],
+        },
+        'activity': {
+            'exercise_frequency': flat_data['exercise_frequency'],
+            'duration': flat_data['duration'],
+            'intensity': flat_data['intensity'],
+        },
+        'lifestyle': {
+            key: flat_data[key] for key in (
+                'sleep_hours', 'stress_level', 'smoking', 'alcohol', 'total_cholesterol',
+                'blood_pressure_medication', 'fasting_glucose',
+                'frequent_hunger', 'frequent_thirst', 'frequent_urination',
+            )
+        },
+        'health': {
+            'conditions': [c for c in flat_data['conditions'].split(',') if c],
+            'medications': flat_data['medications'],
+            'diabetes_history': flat_data['diabetes_history'],
+            'cancer_history': flat_data['cancer_history'],
+            'cvd_history': flat_data['cvd_history'],
+            'symptoms': {
+                key: flat_data[f'symptom_{key}'] for key in (
+                    'fatigue', 'joint_pain', 'digestive', 'skin_issues',
+                    'headaches', 'mood', 'cognitive', 'sleep_issues',
+                )
+            },
+        },
+        'genetic': {
+            'had_testing': flat_data['had_testing'],
+            'findings': flat_data['findings'],
+        },
+        'timestamp': flat_data['timestamp'],
+        'form_date': flat_data.get('form_date', ''),
+    }
+
+
+def save_submissions(submissions):
+    """Store ``(questionnaire_data, flat_data)`` pairs: one locked CSV append plus a JSON file each.
+
+    Returns where each submission went, ``(csv offset, csv length, json path)``.
+    """
+    spans = append_csv_rows(CSV_PATH, [flat_data for _, flat_data in submissions])
+    locations = []
+    for (questionnaire_data, _), (offset, length) in zip(submissions, spans):
+        json_name = f'submission_{questionnaire_data["timestamp"].replace(":", "-")}.json'
+        json_path = write_json_exclusive(os.path.join(SUBMISSIONS_DIR, json_name), questionnaire_data, indent=4)
+        locations.append((offset, length, json_path))
+    return locations
+
+
+def save_submission(questionnaire_data, flat_data):
+    """Store one submission as a CSV row plus a per-submission JSON file"""
+    return save_submissions([(questionnaire_data, flat_data)])[0]
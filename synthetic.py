@@ -0,0 +1,269 @@
+"""Synthetic respondents for scale testing without real patient data.
+
+Questionnaires are sampled from the real option maps (every option answer
+is a valid internal key) with configurable marginals and a fixed seed, so
+the same arguments always produce the same cohort. Sampling is vectorized:
+each field is drawn for a whole chunk with NumPy and only then zipped into
+the nested ``questionnaire_data`` dicts or flat ``flat_data`` rows (with risk
+scores from the batch scorer) that the rest of the app stores. Fields are
+sampled independently of each other; there are no correlations beyond
+height/weight/waist following sex and BMI.
+
+    python synthetic.py -n 1000000 --seed 7 -o synthetic.csv
+    python synthetic.py -n 10000 --format jsonl -o synthetic.jsonl
+    python synthetic.py -n 1000000 --marginals smokers.json -o smokers.csv
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from options import (
+    sleep_map, stress_map, cholesterol_map, bp_map, smoking_map, alcohol_map,
+    hba1c_map, glucose_map, symptom_scale, health_conditions_map, family_history_map,
+    genetic_test_map, exercise_freq_map, duration_map, intensity_map,
+    SEX_VALUES, ACTIVITY_LEVEL_VALUES
+)
+from model_registry import active_model
+from records import featurize
+from scoring import calculate_risk_scores_batch, risk_scores_at
+from storage import flatten_submission
+
+CHUNK_SIZE = 50000
+
+# Option field (flat_data name) -> the map its values come from
+OPTION_FIELDS = {
+    'exercise_frequency': exercise_freq_map,
+    'duration': duration_map,
+    'intensity': intensity_map,
+    'sleep_hours': sleep_map,
+    'stress_level': stress_map,
+    'smoking': smoking_map,
+    'alcohol': alcohol_map,
+    'total_cholesterol': cholesterol_map,
+    'blood_pressure_medication': bp_map,
+    'hba1c': hba1c_map,
+    'fasting_glucose': glucose_map,
+    'frequent_hunger': symptom_scale,
+    'frequent_thirst': symptom_scale,
+    'frequent_urination': symptom_scale,
+    'diabetes_history': family_history_map,
+    'cancer_history': family_history_map,
+    'cvd_history': family_history_map,
+    'symptom_fatigue': symptom_scale,
+    'symptom_joint_pain': symptom_scale,
+    'symptom_digestive': symptom_scale,
+    'symptom_skin_issues': symptom_scale,
+    'symptom_headaches': symptom_scale,
+    'symptom_mood': symptom_scale,
+    'symptom_cognitive': symptom_scale,
+    'symptom_sleep_issues': symptom_scale,
+    'had_testing': genetic_test_map,
+}
+SYMPTOM_KEYS = ['fatigue', 'joint_pain', 'digestive', 'skin_issues', 'headaches', 'mood', 'cognitive', 'sleep_issues']
+
+_SYMPTOMS = {'Never': 0.45, 'Sometimes': 0.35, 'Often': 0.15, 'Always': 0.05}
+_FAMILY_HISTORY = {'None': 0.6, 'Grandparent': 0.15, 'Parent': 0.2, 'Sibling': 0.05}
+
+# Relative weights per option (missing options are never drawn), the
+# prevalence of each condition, and the numeric distributions. Override any
+# field with --marginals; fields not listed keep these defaults.
+DEFAULT_MARGINALS = {
+    'sex': {'Male': 0.48, 'Female': 0.52},
+    'activity_level': {'Sedentary': 0.35, 'Lightly active': 0.35, 'Moderately active': 0.22, 'Very active': 0.08},
+    'exercise_frequency': {'Never': 0.3, '1-2 times per week': 0.4, '3-4 times per week': 0.2, '5+ times per week': 0.1},
+    'duration': {'<15 minutes': 0.2, '15-30 minutes': 0.35, '30-45 minutes': 0.25, '45-60 minutes': 0.12, '60+ minutes': 0.08},
+    'intensity': {'Light': 0.45, 'Medium': 0.35, 'Vigorous': 0.15, 'Very vigorous': 0.05},
+    'sleep_hours': {'< 5 hours (insufficient)': 0.12, '5-7 hours (below optimal)': 0.45,
+                    '7-9 hours (optimal)': 0.38, '9+ hours (excessive)': 0.05},
+    'stress_level': {'Low': 0.25, 'Moderate': 0.45, 'High': 0.22, 'Very high': 0.08},
+    'smoking': {'Non-smoker': 0.55, 'Passive smoker': 0.2, 'Active smoker': 0.25},
+    'alcohol': {'No': 0.85, 'Yes': 0.15},
+    'total_cholesterol': {'Low (<200 mg/dL)': 0.35, 'Medium (200-239 mg/dL)': 0.2,
+                          'High (≥240 mg/dL)': 0.1, 'Unknown': 0.35},
+    'blood_pressure_medication': {'No': 0.8, 'Not routine': 0.1, 'Yes routinely': 0.1},
+    'hba1c': {'<5.7% (normal)': 0.2, '5.7-6.4% (prediabetes)': 0.08, '>6.5% (diabetes)': 0.04, 'Unknown': 0.68},
+    'fasting_glucose': {'Normal: <100 mg/dL (5.6 mmol/L)': 0.4, 'Prediabetes: 100-125 mg/dL (5.6-6.9 mmol/L)': 0.12,
+                        'Diabetes: ≥126 mg/dL (7.0 mmol/L)': 0.05, 'Unknown': 0.43},
+    'frequent_hunger': _SYMPTOMS,
+    'frequent_thirst': _SYMPTOMS,
+    'frequent_urination': _SYMPTOMS,
+    'diabetes_history': _FAMILY_HISTORY,
+    'cancer_history': {'None': 0.75, 'Grandparent': 0.1, 'Parent': 0.12, 'Sibling': 0.03},
+    'cvd_history': _FAMILY_HISTORY,
+    **{f'symptom_{key}': _SYMPTOMS for key in SYMPTOM_KEYS},
+    'had_testing': {'No': 0.95, 'Yes': 0.05},
+    'conditions': {'Hypertension': 0.12, 'High cholesterol': 0.1, 'Diabetes': 0.06, 'Cardiovascular disease': 0.03,
+                   'Cancer': 0.01, 'Autoimmune condition': 0.01, 'Inflammatory condition': 0.02,
+                   'Digestive disorders': 0.05, 'Skin conditions': 0.04},
+    'age': {'mean': 40, 'sd': 13, 'min': 18, 'max': 85},
+    'bmi': {'mean': 24.5, 'sd': 4.5, 'min': 15, 'max': 50},
+    'height_male': {'mean': 166, 'sd': 7, 'min': 140, 'max': 200},
+    'height_female': {'mean': 154, 'sd': 6, 'min': 130, 'max': 190},
+    'waist_per_bmi': {'mean': 3.4, 'sd': 0.25, 'min': 2.5, 'max': 4.5},  # waist (cm) / BMI
+    'phone_share': 0.7,
+    'start': '2025-01-01',
+    'days': 365,
+}
+_NUMERIC = ('age', 'bmi', 'height_male', 'height_female', 'waist_per_bmi')
+
+
+def load_marginals(path=None):
+    """DEFAULT_MARGINALS with the fields of a JSON file (if given) replaced, after validation"""
+    marginals = dict(DEFAULT_MARGINALS)
+    if path:
+        with open(path, encoding='utf-8') as f:
+            marginals.update(json.load(f))
+    allowed = {'sex': SEX_VALUES, 'activity_level': ACTIVITY_LEVEL_VALUES, 'conditions': [c for c in health_conditions_map['en'] if c != 'None']}
+    allowed.update({field: options_map['en'] for field, options_map in OPTION_FIELDS.items()})
+    for field, weights in marginals.items():
+        if field in allowed:
+            unknown = set(weights) - set(allowed[field])
+            if unknown:
+                raise ValueError(f"{field}: unknown option(s) {sorted(unknown)}")
+            if any(w < 0 for w in weights.values()) or (field != 'conditions' and not sum(weights.values())):
+                raise ValueError(f"{field}: weights must be non-negative with a positive total")
+        elif field not in _NUMERIC and field not in ('phone_share', 'start', 'days'):
+            raise ValueError(f"unknown marginal {field!r}")
+    return marginals
+
+
+def _choice(rng, weights, n):
+    options = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return options[rng.choice(len(options), size=n, p=p / p.sum())]
+
+
+def _normal(rng, spec, n):
+    return np.clip(rng.normal(spec['mean'], spec['sd'], n), spec['min'], spec['max'])
+
+
+def _conditions(rng, prevalence, n):
+    """Comma-joined condition lists: each condition drawn independently, 'None' when none is"""
+    names = list(prevalence)
+    has = rng.random((n, len(names))) < np.array([prevalence[name] for name in names])
+    masks = has @ (1 << np.arange(len(names)))
+    # At most 2**len(names) distinct lists; build each string once
+    table = np.array([','.join(name for bit, name in enumerate(names) if mask >> bit & 1) or 'None'
+                      for mask in range(1 << len(names))], dtype=object)
+    return table[masks]
+
+
+def sample_columns(n, rng, marginals=DEFAULT_MARGINALS, offset=0, total=None):
+    """Draw respondents ``offset`` .. ``offset + n - 1`` of ``total`` as flat_data field -> NumPy array"""
+    cols = {field: _choice(rng, marginals[field], n) for field in ('sex', 'activity_level', *OPTION_FIELDS)}
+    cols['conditions'] = _conditions(rng, marginals['conditions'], n)
+
+    male = np.isin(cols['sex'], ['Male', 'Laki-laki'])
+    height = np.where(male, _normal(rng, marginals['height_male'], n), _normal(rng, marginals['height_female'], n))
+    bmi = _normal(rng, marginals['bmi'], n)
+    cols['age'] = np.rint(_normal(rng, marginals['age'], n)).astype(int)
+    cols['height'] = np.rint(height).astype(int)
+    cols['weight'] = np.maximum(np.rint(bmi * (cols['height'] / 100) ** 2), 1).astype(int)
+    cols['waist_circumference'] = np.rint(bmi * _normal(rng, marginals['waist_per_bmi'], n)).astype(int)
+
+    ids = np.arange(offset, offset + n)
+    cols['name'] = np.char.add('Synthetic ', ids.astype(str)).astype(object)
+    numbers = np.char.add('0812', rng.integers(0, 10 ** 8, n).astype(str).astype('U8')).astype(object)
+    cols['phone'] = np.where(rng.random(n) < marginals['phone_share'], numbers, '')
+
+    # Respondent i of ``total`` falls in the i-th equal slot of the period:
+    # timestamps increase across chunks and never collide (they name the JSON files)
+    total = total or n
+    slot = marginals['days'] * 86400 * 10 ** 6 / total
+    microseconds = ((ids + rng.random(n)) * slot).astype('timedelta64[us]')
+    cols['timestamp'] = np.datetime_as_string(np.datetime64(marginals['start'], 'us') + microseconds, unit='us').astype(object)
+    for field in ('occupation', 'medications', 'findings'):
+        cols[field] = np.full(n, '', dtype=object)
+    return cols
+
+
+def _to_questionnaires(cols, n):
+    c = {field: values.tolist() for field, values in cols.items()}
+    symptom_columns = [c[f'symptom_{key}'] for key in SYMPTOM_KEYS]
+    return [
+        {
+            'personal': {
+                'name': c['name'][i], 'phone': c['phone'][i], 'age': c['age'][i], 'sex': c['sex'][i],
+                'height': c['height'][i], 'weight': c['weight'][i], 'occupation': c['occupation'][i],
+                'activity_level': c['activity_level'][i], 'waist_circumference': c['waist_circumference'][i],
+            },
+            'activity': {
+                'exercise_frequency': c['exercise_frequency'][i], 'duration': c['duration'][i],
+                'intensity': c['intensity'][i],
+            },
+            'lifestyle': {
+                'sleep_hours': c['sleep_hours'][i], 'stress_level': c['stress_level'][i],
+                'smoking': c['smoking'][i], 'alcohol': c['alcohol'][i],
+                'total_cholesterol': c['total_cholesterol'][i],
+                'blood_pressure_medication': c['blood_pressure_medication'][i], 'hba1c': c['hba1c'][i],
+                'fasting_glucose': c['fasting_glucose'][i], 'frequent_hunger': c['frequent_hunger'][i],
+                'frequent_thirst': c['frequent_thirst'][i], 'frequent_urination': c['frequent_urination'][i],
+            },
+            'health': {
+                'conditions': c['conditions'][i].split(','), 'medications': c['medications'][i],
+                'diabetes_history': c['diabetes_history'][i], 'cancer_history': c['cancer_history'][i],
+                'cvd_history': c['cvd_history'][i],
+                'symptoms': dict(zip(SYMPTOM_KEYS, [column[i] for column in symptom_columns])),
+            },
+            'genetic': {'had_testing': c['had_testing'][i], 'findings': c['findings'][i]},
+            'timestamp': c['timestamp'][i],
+        }
+        for i in range(n)
+    ]
+
+
+def iter_questionnaires(n, seed=0, marginals=DEFAULT_MARGINALS, chunk_size=CHUNK_SIZE):
+    """Yield lists of up to ``chunk_size`` nested questionnaire dicts, ``n`` in total"""
+    rng = np.random.default_rng(seed)
+    for offset in range(0, n, chunk_size):
+        size = min(chunk_size, n - offset)
+        yield _to_questionnaires(sample_columns(size, rng, marginals, offset, n), size)
+
+
+def iter_submissions(n, seed=0, marginals=DEFAULT_MARGINALS, chunk_size=CHUNK_SIZE, model=None):
+    """Yield lists of ``(questionnaire_data, flat_data)`` pairs scored with the batch scorer"""
+    model = model or active_model()
+    for questionnaires in iter_questionnaires(n, seed, marginals, chunk_size):
+        scores = calculate_risk_scores_batch(featurize(questionnaires, len(questionnaires)), model)
+        yield [
+            (questionnaire_data, flatten_submission(questionnaire_data, risk_scores_at(scores, i), model.version))
+            for i, questionnaire_data in enumerate(questionnaires)
+        ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic questionnaires for scale testing")
+    parser.add_argument('-n', type=int, default=10000, help="number of respondents")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--marginals', help="JSON file overriding fields of DEFAULT_MARGINALS")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help="csv: scored flat_data rows; jsonl: nested questionnaires (default: from -o)")
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args(argv)
+    try:
+        marginals = load_marginals(args.marginals)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    fmt = args.format or ('jsonl' if args.output.lower().endswith(('.jsonl', '.json')) else 'csv')
+    started = datetime.now()
+    with open(args.output, 'w', newline='', encoding='utf-8') as out:
+        if fmt == 'jsonl':
+            for questionnaires in iter_questionnaires(args.n, args.seed, marginals):
+                out.writelines(json.dumps(q, ensure_ascii=False) + '\n' for q in questionnaires)
+        else:
+            writer = None
+            for submissions in iter_submissions(args.n, args.seed, marginals):
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(submissions[0][1]))
+                    writer.writeheader()
+                writer.writerows(flat_data for _, flat_data in submissions)
+    elapsed = (datetime.now() - started) / timedelta(seconds=1)
+    print(f"Wrote {args.n} synthetic respondent(s) to {args.output} in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
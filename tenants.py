@@ -0,0 +1,89 @@
+"""Partner clinics (tenants) served by one deployment.
+
+A respondent's clinic comes from the URL (``/?clinic=<id>``). ``tenants.json``
+maps each clinic id to its settings; anything a clinic leaves out is taken
+from ``default``:
+
+    {
+      "default": {"name": "DNA CARE"},
+      "klinik-sehat": {
+        "name": "Klinik Sehat",
+        "sheet_id": "1AbC...",
+        "credentials": "secrets/klinik-sehat.json",
+        "whatsapp_links": {"metabolic": "https://api.whatsapp.com/send?phone=62...", ...}
+      }
+    }
+
+``sheet_id`` is the clinic's own spreadsheet and ``credentials`` an optional
+service-account key file for it; these two are never inherited from
+``default`` (whose sheet falls back to ``GOOGLE_SHEET_ID``). ``whatsapp_links``
+overrides entries of ``recommendations.WHATSAPP_LINKS``. The file is re-read
+when it changes.
+"""
+import json
+import os
+import re
+import threading
+
+from recommendations import WHATSAPP_LINKS
+
+TENANTS_PATH = os.getenv('TENANTS_PATH', 'tenants.json')
+DEFAULT_TENANT = 'default'
+OWN_SETTINGS = {'sheet_id', 'credentials'}  # never inherited from the default tenant
+TENANT_ID = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')  # also names the clinic's outbox queue
+
+_lock = threading.Lock()
+_cache = {'mtime': None, 'tenants': {}}
+
+
+def _load():
+    try:
+        mtime = os.path.getmtime(TENANTS_PATH)
+    except OSError:
+        return {}
+    if mtime != _cache['mtime']:
+        with _lock:
+            try:
+                with open(TENANTS_PATH, encoding='utf-8') as f:
+                    config = json.load(f)
+                bad = [tenant_id for tenant_id in config if not TENANT_ID.match(tenant_id)]
+                if bad:
+                    raise ValueError(f"invalid clinic id(s) {bad}")
+            except (OSError, ValueError) as e:
+                # Keep serving the last good configuration
+                print(f"DEBUG: Could not load {TENANTS_PATH}: {e}")
+                return _cache['tenants']
+            _cache['mtime'], _cache['tenants'] = mtime, config
+            print(f"DEBUG: Loaded {len(config)} clinic(s) from {TENANTS_PATH}.")
+    return _cache['tenants']
+
+
+def get(tenant_id=None):
+    """Settings of a clinic (the default tenant for unknown or missing ids)"""
+    config = _load()
+    if tenant_id not in config:
+        tenant_id = DEFAULT_TENANT
+    default = {key: value for key, value in config.get(DEFAULT_TENANT, {}).items() if key not in OWN_SETTINGS}
+    tenant = {**default, **config.get(tenant_id, {})}
+    tenant['id'] = tenant_id
+    tenant['whatsapp_links'] = {**WHATSAPP_LINKS, **default.get('whatsapp_links', {}),
+                                **config.get(tenant_id, {}).get('whatsapp_links', {})}
+    return tenant
+
+
+def sheet_id(tenant):
+    """The clinic's spreadsheet; the default tenant's is ``GOOGLE_SHEET_ID`` (environment or Streamlit secrets)"""
+    if tenant.get('sheet_id') or tenant['id'] != DEFAULT_TENANT:
+        return tenant.get('sheet_id', '')
+    if os.getenv('GOOGLE_SHEET_ID'):
+        return os.getenv('GOOGLE_SHEET_ID')
+    try:
+        import streamlit as st
+        return st.secrets.get('GOOGLE_SHEET_ID', '')
+    except (FileNotFoundError, KeyError):
+        return ''
+
+
+def ids():
+    """Configured clinic ids"""
+    return list(_load()) or [DEFAULT_TENANT]
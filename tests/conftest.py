@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Modules read these at import: point them at a scratch directory, never at real submissions
+os.environ['SUBMISSIONS_DIR'] = tempfile.mkdtemp(prefix='submissions-')
+os.environ['HISTORY_SALT'] = 'test'
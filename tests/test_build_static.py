@@ -0,0 +1,29 @@
+"""The static calculator (calculator.js under node) must score exactly like ``calculate_risk_scores``."""
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_ROOT
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason="node is not installed")
+
+
+@pytest.fixture
+def build_static(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)  # the script reads calculator/, assets/ and the catalogs relative to the repo
+    import build_static
+    return build_static
+
+
+def test_bundle_inlines_data_and_script(build_static, tmp_path):
+    path = build_static.build(str(tmp_path / 'calculator'))
+    with open(path, encoding='utf-8') as f:
+        page = f.read()
+    assert '/*CALCULATOR_DATA*/' not in page and '/*CALCULATOR_JS*/' not in page
+    assert 'processQuestionnaireData' in page
+    assert os.path.isdir(tmp_path / 'calculator' / 'assets')
+
+
+def test_scores_and_recommendations_match_python(build_static):
+    assert build_static.check(n=3000, seed=0) == 0
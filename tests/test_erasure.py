@@ -0,0 +1,154 @@
+"""Erasing one respondent never touches another's submission, even with the same timestamp."""
+import csv
+import os
+import shutil
+
+import pytest
+
+import erasure
+import history
+import storage
+from synthetic import iter_questionnaires
+
+TIMESTAMP = '2025-03-01T00:00:00'  # one screening event: every paper form has the form's date
+TENANT = {'id': 'klinik', 'sheet_id': 'sheet'}
+
+
+@pytest.fixture(autouse=True)
+def submissions_dir():
+    shutil.rmtree(storage.SUBMISSIONS_DIR, ignore_errors=True)
+    os.makedirs(storage.SUBMISSIONS_DIR)
+
+
+def store(phones, submission_ids, timestamp=TIMESTAMP):
+    """Store one submission per phone number, all at ``timestamp``"""
+    questionnaires = next(iter_questionnaires(len(phones), seed=1))
+    submissions = []
+    for questionnaire_data, phone, submission in zip(questionnaires, phones, submission_ids):
+        questionnaire_data['personal']['phone'] = phone
+        questionnaire_data.update(timestamp=timestamp, submission_id=submission)
+        risk_scores = {'metabolic_lifestyle': 0.2}
+        submissions.append((questionnaire_data, storage.flatten_submission(questionnaire_data, risk_scores), risk_scores))
+    locations = storage.save_submissions([(q, flat_data) for q, flat_data, _ in submissions])
+    erasure.index_submissions(submissions, locations, TENANT)
+    history.record_submissions([
+        (q['personal']['phone'], q['personal']['name'], q['submission_id'], q['timestamp'], risk_scores, '')
+        for q, _, risk_scores in submissions
+    ])
+    return submissions
+
+
+def rotate():
+    """Change the archive's columns, as a new release does: the file is rotated aside"""
+    row = dict(store(['081300000003'], ['c'])[0][1], extra='')
+    storage.append_csv_rows(storage.CSV_PATH, [row])
+
+
+def archived():
+    """Submission ids of the rows left in the archive files"""
+    ids = []
+    for path in storage.archive_paths():
+        with open(path, newline='', encoding='utf-8') as f:
+            ids.extend(row['submission_id'] for row in csv.DictReader(f) if not storage.is_tombstone(row))
+    return ids
+
+
+@pytest.mark.parametrize('rotated', [False, True])
+def test_erases_only_the_respondents_submission(rotated):
+    submissions = store(['081300000001', '081300000002'], ['a', 'b'])
+    if rotated:
+        rotate()
+        assert len(storage.archive_paths()) == 2
+
+    counts = erasure.erase(phone='081300000001')
+
+    assert counts['submissions'] == 1 and counts['csv'] == 1 and counts['json'] == 1 and counts['missing'] == 0
+    assert 'a' not in archived() and 'b' in archived()
+    names = {q['submission_id']: q['personal']['name'] for q, _, _ in submissions}
+    assert [entry['submission_id'] for entry in history.lookup('081300000002', names['b'])] == ['b']
+    assert history.lookup('081300000001', names['a']) == []
+    assert list(erasure.find(phone='081300000002')) == ['b']
+
+
+def test_compaction_keeps_the_other_submission_erasable():
+    store(['081300000001', '081300000002'], ['a', 'b'])
+    erasure.erase(phone='081300000001')
+    erasure.compact()
+    assert archived() == ['b']
+    assert erasure.erase(phone='081300000002')['csv'] == 1
+    assert archived() == []
+
+
+def test_sheet_rows_are_recorded_per_submission():
+    store(['081300000001', '081300000002'], ['a', 'b'])
+    erasure.index_sheet_rows('klinik', 'sheet', 5, ['a', 'b'])
+    conn = erasure.connect()
+    try:
+        rows = conn.execute("SELECT DISTINCT submission_id, position FROM locations WHERE store = 'sheet'").fetchall()
+    finally:
+        conn.close()
+    assert sorted(rows) == [('a', 5), ('b', 6)]
+
+
+class FakeWorksheet:
+    """The few gspread calls ``erase_sheet_rows`` makes, over a list of rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def batch_get(self, ranges):
+        from gspread.utils import column_letter_to_index
+        values = []
+        for a1 in ranges:
+            start = a1.split(':')[0]
+            if start.isdigit():
+                values.append([self.rows[int(start) - 1]])
+            else:
+                column = column_letter_to_index(start) - 1
+                values.append([[row[column]] if column < len(row) else [] for row in self.rows])
+        return values
+
+    def batch_update(self, updates):
+        for update in updates:
+            row = int(update['range'].split(':')[0][1:])
+            self.rows[row - 1] = update['values'][0]
+
+
+def test_sheet_erasure_tombstones_only_the_respondents_row(monkeypatch):
+    import sheets
+    import sheet_mirror
+    submissions = store(['081300000001', '081300000002'], ['a', 'b'])
+    worksheet = FakeWorksheet([list(submissions[0][1])] + [list(flat_data.values()) for _, flat_data, _ in submissions])
+    monkeypatch.setattr(sheets, 'get_worksheet', lambda *args: worksheet)
+    monkeypatch.setattr(erasure.tenants, 'get', lambda tenant_id: {'id': tenant_id})
+    monkeypatch.setattr(sheet_mirror, 'tombstone_rows', lambda tenant_id, submissions: 0)
+    erasure.erase(phone='081300000001')  # queued before delivery: the row is looked up by id
+    erasure.erase_sheet_rows('klinik', 'sheet', ['a'])
+    assert [row[0] for row in worksheet.rows[1:]] == [storage.TOMBSTONE, TIMESTAMP]
+    assert worksheet.rows[2][worksheet.rows[0].index('submission_id')] == 'b'
+
+
+def test_mirror_tombstones_only_the_erased_submission(tmp_path):
+    path = str(tmp_path / 'mirror.csv')
+    flat = [flat_data for _, flat_data, _ in store(['081300000001', '081300000002'], ['a', 'b'])]
+    storage.append_csv_rows(path, flat)
+    assert len(storage.tombstone_csv_submissions(path, {'a'})) == 1
+    with open(path, newline='', encoding='utf-8') as f:
+        assert [row['submission_id'] for row in csv.DictReader(f) if not storage.is_tombstone(row)] == ['b']
+
+
+def test_legacy_index_is_migrated(tmp_path):
+    path = str(tmp_path / 'erasure.db')
+    conn = erasure.sqlite3.connect(path)
+    conn.executescript("CREATE TABLE locations (key TEXT, store TEXT, path TEXT, position INTEGER, length INTEGER, "
+                       "timestamp TEXT NOT NULL);"
+                       "CREATE TABLE tombstones (store TEXT, path TEXT, position INTEGER, timestamp TEXT NOT NULL);"
+                       f"INSERT INTO locations VALUES ('k', 'json', 'x.json', 0, 0, '{TIMESTAMP}');")
+    conn.commit()
+    conn.close()
+    conn = erasure.connect(path)
+    try:
+        assert conn.execute("SELECT timestamp, submission_id FROM locations").fetchall() == [(TIMESTAMP, TIMESTAMP)]
+        assert [row[1] for row in conn.execute("PRAGMA table_info(tombstones)")][-1] == 'submission_id'
+    finally:
+        conn.close()
@@ -0,0 +1,16 @@
+"""A phone number alone does not reveal anyone's risk history."""
+import history
+
+
+def record(phone, name, submission):
+    history.record_submissions([(phone, name, submission, f'2025-03-0{submission}T00:00:00',
+                                 {'diabetes': 0.1}, 'v1')])
+
+
+def test_lookup_needs_the_matching_name():
+    record('0813-1111-2222', 'Budi Santoso', '1')
+    record('+62 813 1111 2222', 'budi  santoso', '2')
+    record('081311112222', 'Someone Else', '3')  # typed someone else's number
+    assert [entry['submission_id'] for entry in history.lookup('081311112222', 'BUDI SANTOSO')] == ['1', '2']
+    assert [entry['submission_id'] for entry in history.lookup('081311112222', 'Someone Else')] == ['3']
+    assert history.lookup('081311112222', '') == []
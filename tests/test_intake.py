@@ -0,0 +1,13 @@
+"""Paper forms of one screening event share a date, but never a stored timestamp or id."""
+import intake
+from synthetic import iter_submissions
+
+
+def test_form_date_is_kept_apart_from_the_stored_timestamp():
+    rows = [dict(flat_data, timestamp='2025-03-01T00:00:00') for _, flat_data in next(iter_submissions(50))]
+    accepted = [item for chunk, rejected, _ in intake.score_chunks(rows, chunk_size=20) for item in chunk]
+    assert len(accepted) == 50
+    assert {flat_data['form_date'] for _, flat_data, _ in accepted} == {'2025-03-01T00:00:00'}
+    timestamps = [flat_data['timestamp'] for _, flat_data, _ in accepted]
+    assert timestamps == sorted(set(timestamps))
+    assert len({flat_data['submission_id'] for _, flat_data, _ in accepted}) == 50
@@ -0,0 +1,16 @@
+"""Archive rotation never loses rows, however often the columns change."""
+import csv
+
+import storage
+
+
+def test_rotations_within_one_second_keep_every_file(tmp_path):
+    path = str(tmp_path / 'submissions.csv')
+    for i in range(4):  # e.g. old and new replicas interleaving writes during a rolling deploy
+        storage.append_csv_rows(path, [{'timestamp': str(i), f'layout_{i % 2}': ''}])
+    (tmp_path / 'submissions_sehat.csv').write_text('timestamp\nother\n')  # another file, not a rotation
+    rows = []
+    for archive_path in storage.archive_paths(path):
+        with open(archive_path, newline='', encoding='utf-8') as f:
+            rows.extend(row['timestamp'] for row in csv.DictReader(f))
+    assert rows == ['0', '1', '2', '3']
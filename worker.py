@@ -0,0 +1,97 @@
+"""Outbox worker: delivers queued remote writes (see ``outbox.py``).
+
+Runs as its own service (``docker-compose.yml``) next to the app replicas,
+sharing the ``submissions/`` volume. Each clinic's queue is drained by its
+own thread with its own backoff, so one slow or failing spreadsheet never
+delays the others. Any number of workers can run at once; each entry is
+claimed by exactly one of them.
+
+Every SHEET_MIRROR_SECONDS (0 disables) a further thread brings the local
+mirrors of the clinics' sheets up to date (``sheet_mirror.py``), and every
+ERASURE_COMPACT_SECONDS (0 disables) another removes the rows tombstoned by
+erasures from the archive and the sheets (``erasure.py``).
+
+    python worker.py
+"""
+import os
+import signal
+import threading
+
+import erasure
+import outbox
+import sheet_mirror
+
+POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '1.0'))
+MAX_BACKOFF_SECONDS = 300
+DISCOVER_SECONDS = 10  # how often to look for queues of newly added clinics
+SHEET_MIRROR_SECONDS = float(os.getenv('SHEET_MIRROR_SECONDS', '300'))
+ERASURE_COMPACT_SECONDS = float(os.getenv('ERASURE_COMPACT_SECONDS', '3600'))
+
+_stopping = threading.Event()
+
+
+def _stop(signum, frame):
+    _stopping.set()
+
+
+def drain_queue(queue):
+    """Drain one queue until stopped, backing off while its deliveries fail"""
+    backoff = POLL_SECONDS
+    while not _stopping.is_set():
+        try:
+            delivered, failed = outbox.drain(queue)
+        except OSError as e:
+            print(f"DEBUG: Outbox drain of {queue} failed: {e}")
+            delivered, failed = 0, 1
+        if delivered:
+            print(f"DEBUG: Delivered {delivered} outbox entries of {queue}.")
+        if failed:
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+        elif delivered:
+            backoff = POLL_SECONDS
+            continue  # more may be waiting
+        else:
+            backoff = POLL_SECONDS
+        _stopping.wait(backoff)
+
+
+def mirror_sheets():
+    """Sync the sheet mirrors until stopped"""
+    while not _stopping.is_set():
+        sheet_mirror.sync_all()
+        _stopping.wait(SHEET_MIRROR_SECONDS)
+
+
+def compact_erasures():
+    """Compact erased rows away until stopped"""
+    while not _stopping.wait(ERASURE_COMPACT_SECONDS):
+        erasure.compact()
+
+
+def run():
+    """Start a drain thread per queue (and per queue that appears later) until SIGTERM/SIGINT"""
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(f"DEBUG: Outbox worker started on {outbox.OUTBOX_DIR}.")
+    threads = {}
+    mirror = threading.Thread(target=mirror_sheets, name='sheet-mirror')
+    if SHEET_MIRROR_SECONDS > 0:
+        mirror.start()
+    compaction = threading.Thread(target=compact_erasures, name='erasure-compaction')
+    if ERASURE_COMPACT_SECONDS > 0:
+        compaction.start()
+    while not _stopping.is_set():
+        for queue in set(outbox.queues()) - set(threads):
+            threads[queue] = threading.Thread(target=drain_queue, args=(queue,), name=f'outbox-{queue}')
+            threads[queue].start()
+        _stopping.wait(DISCOVER_SECONDS)
+    for thread in threads.values():
+        thread.join()
+    for thread in (mirror, compaction):
+        if thread.is_alive():
+            thread.join()
+    print("DEBUG: Outbox worker stopped.")
+
+
+if __name__ == "__main__":
+    run()